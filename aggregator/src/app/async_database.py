@@ -0,0 +1,83 @@
+"""
+Async variant of app.database (SQLAlchemy AsyncEngine + asyncpg).
+Dipakai saat DB_MODE=async agar handler FastAPI tidak memblokir event loop.
+Engine dibuat lazy sehingga jalur sync tidak membutuhkan driver asyncpg.
+"""
+import os
+import logging
+from typing import AsyncGenerator, Optional
+from contextlib import asynccontextmanager
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from app.database import DATABASE_URL, POOL_SIZE, POOL_MAX_OVERFLOW, STATS_UPDATE_SQL, stats_params
+from app.profiling import stage
+
+logger = logging.getLogger(__name__)
+
+
+def to_async_url(url: str) -> str:
+    """Ubah URL psycopg2 menjadi URL driver asyncpg."""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Buat AsyncEngine pada pemakaian pertama (terikat ke event loop yang aktif)."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_size=POOL_SIZE,
+            max_overflow=POOL_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            isolation_level="READ COMMITTED"
+        )
+        _async_sessionmaker = async_sessionmaker(
+            bind=_async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+def started_async_engine() -> Optional[AsyncEngine]:
+    """Engine async bila sudah dibuat (tanpa membuatnya)."""
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """Session async baru dari engine lazy."""
+    get_async_engine()
+    return _async_sessionmaker()
+
+
+async def dispose_async_engine():
+    """Tutup pool async; pemakaian berikutnya membuat engine baru."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_sessionmaker = None
+
+@asynccontextmanager
+async def get_async_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """Context manager async untuk transaksi manual ACID."""
+    session = AsyncSessionLocal()
+    try:
+        yield session
+        with stage("commit"):
+            await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+async def update_stats_atomic_async(db: AsyncSession, received: int = 0, unique: int = 0, duplicate: int = 0):
+    """BAB 9: Atomic Increment (versi async)."""
+    await db.execute(STATS_UPDATE_SQL, stats_params(received, unique, duplicate))
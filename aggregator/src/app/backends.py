@@ -0,0 +1,208 @@
+"""
+Storage backend untuk IdempotentConsumer: SQL dedup-insert per dialect.
+
+Kontrak process_batch sama untuk semua backend: insert_rows menerima baris
+yang sudah unik dan terurut per (topic, event_id) dan mengembalikan key yang
+benar-benar baru ditulis dalam transaksi pemanggil.
+
+- PostgresBackend: multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING, atau
+  klaim lewat key store terpisah (app.key_store) pada layout partisi/hashed.
+- SQLiteBackend (edge, satu node): INSERT OR IGNORE lewat executemany yang
+  di-batch SQLAlchemy (insertmanyvalues) dengan RETURNING pada SQLite >= 3.35.
+  Versi lebih lama memakai SELECT key yang sudah ada lalu INSERT OR IGNORE;
+  aman karena transaksi SQLite dibuka dengan BEGIN IMMEDIATE (satu penulis).
+
+minute_counts_statement dan topic_stats_statement mengembalikan (statement,
+parameter) upsert rollup topic_minute_counts (app.rollups) dan counter
+topic_stats (app.topic_stats) untuk transaksi yang sama.
+"""
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import ProcessedEvent, Topic, TopicMinuteCount, TopicStats, SEPARATE_KEY_STORE
+from app.key_store import claim_statement, claimed_keys
+
+Key = Tuple[str, str]
+
+# RETURNING tersedia sejak SQLite 3.35
+SQLITE_RETURNING = sqlite3.sqlite_version_info >= (3, 35)
+
+
+def _claimed_rows(rows: List[Dict[str, Any]], keys: Set[Key]) -> List[Dict[str, Any]]:
+    return [row for row in rows if (row["topic"], row["event_id"]) in keys]
+
+
+# Upsert rollup app.rollups: satu parameter array per kolom sehingga teks SQL
+# konstan (tanpa compile ulang per jumlah baris seperti multi-row VALUES)
+MINUTE_COUNTS_SQL = text("""
+    INSERT INTO topic_minute_counts (topic, source, bucket, count)
+    SELECT * FROM unnest(CAST(:topics AS varchar[]), CAST(:sources AS varchar[]),
+                         CAST(:buckets AS timestamptz[]), CAST(:counts AS bigint[]))
+    ON CONFLICT (topic, bucket, source) DO UPDATE
+    SET count = topic_minute_counts.count + EXCLUDED.count
+""")
+
+# Counter per topic app.topic_stats, juga satu parameter array per kolom
+TOPIC_STATS_SQL = text("""
+    INSERT INTO topic_stats (topic, shard, received, unique_processed, duplicate_dropped, last_event_at)
+    SELECT * FROM unnest(CAST(:topics AS varchar[]), CAST(:shards AS integer[]), CAST(:received AS bigint[]),
+                         CAST(:unique AS bigint[]), CAST(:duplicate AS bigint[]),
+                         CAST(:last_event_at AS timestamptz[]))
+    ON CONFLICT (topic, shard) DO UPDATE
+    SET received = topic_stats.received + EXCLUDED.received,
+        unique_processed = topic_stats.unique_processed + EXCLUDED.unique_processed,
+        duplicate_dropped = topic_stats.duplicate_dropped + EXCLUDED.duplicate_dropped,
+        last_event_at = GREATEST(topic_stats.last_event_at, EXCLUDED.last_event_at)
+""")
+
+
+class PostgresBackend:
+    """Dedup lewat uq_topic_event_id atau key store terpisah (SEPARATE_KEY_STORE)."""
+
+    name = "postgresql"
+
+    @staticmethod
+    def events_statement(rows: List[Dict[str, Any]]):
+        """INSERT processed_events; tanpa key store terpisah sekaligus dedup + RETURNING."""
+        stmt = postgresql.insert(ProcessedEvent).values(rows)
+        if SEPARATE_KEY_STORE:
+            return stmt
+        return stmt.on_conflict_do_nothing(constraint='uq_topic_event_id') \
+            .returning(ProcessedEvent.topic, ProcessedEvent.event_id)
+
+    def insert_rows(self, db: Session, rows: List[Dict[str, Any]]) -> Set[Key]:
+        if not SEPARATE_KEY_STORE:
+            return {(topic, event_id) for topic, event_id in db.execute(self.events_statement(rows))}
+        # Key store terpisah (app.key_store) yang menentukan event baru
+        claim, lookup = claim_statement(rows)
+        keys = claimed_keys(db.execute(claim), lookup)
+        if keys:
+            db.execute(self.events_statement(_claimed_rows(rows, keys)))
+        return keys
+
+    async def insert_rows_async(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> Set[Key]:
+        if not SEPARATE_KEY_STORE:
+            result = await db.execute(self.events_statement(rows))
+            return {(topic, event_id) for topic, event_id in result}
+        claim, lookup = claim_statement(rows)
+        keys = claimed_keys(await db.execute(claim), lookup)
+        if keys:
+            await db.execute(self.events_statement(_claimed_rows(rows, keys)))
+        return keys
+
+    @staticmethod
+    def topics_statement(names: Iterable[str]):
+        return postgresql.insert(Topic).values([{"name": name} for name in names]) \
+            .on_conflict_do_nothing(index_elements=[Topic.name])
+
+    @staticmethod
+    def minute_counts_statement(rows: List[Dict[str, Any]]):
+        """(statement, parameter) upsert rollup per menit."""
+        return MINUTE_COUNTS_SQL, {
+            "topics": [row["topic"] for row in rows],
+            "sources": [row["source"] for row in rows],
+            "buckets": [row["bucket"] for row in rows],
+            "counts": [row["count"] for row in rows]
+        }
+
+    @staticmethod
+    def topic_stats_statement(rows: List[Dict[str, Any]]):
+        """(statement, parameter) upsert counter per topic."""
+        return TOPIC_STATS_SQL, {
+            "topics": [row["topic"] for row in rows],
+            "shards": [row["shard"] for row in rows],
+            "received": [row["received"] for row in rows],
+            "unique": [row["unique_processed"] for row in rows],
+            "duplicate": [row["duplicate_dropped"] for row in rows],
+            "last_event_at": [row["last_event_at"] for row in rows]
+        }
+
+
+class SQLiteBackend:
+    """Dedup lewat uq_topic_event_id dengan INSERT OR IGNORE."""
+
+    name = "sqlite"
+
+    def __init__(self, returning: bool = SQLITE_RETURNING):
+        self.returning = returning
+
+    @staticmethod
+    def _sqlite_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        SQLite menyimpan DateTime sebagai teks tanpa offset: timestamp dinormalisasi
+        ke UTC dan processed_at diisi di sini (presisi mikrodetik, format sama
+        dengan nilai cursor) alih-alih CURRENT_TIMESTAMP yang hanya per detik.
+        """
+        processed_at = datetime.now(timezone.utc)
+        return [
+            {
+                **row,
+                "timestamp": row["timestamp"].astimezone(timezone.utc)
+                if row["timestamp"].tzinfo is not None else row["timestamp"],
+                "processed_at": processed_at
+            }
+            for row in rows
+        ]
+
+    def insert_rows(self, db: Session, rows: List[Dict[str, Any]]) -> Set[Key]:
+        rows = self._sqlite_rows(rows)
+        stmt = sqlite.insert(ProcessedEvent.__table__).prefix_with("OR IGNORE")
+        if self.returning:
+            result = db.execute(stmt.returning(ProcessedEvent.topic, ProcessedEvent.event_id), rows)
+            return {(topic, event_id) for topic, event_id in result}
+        existing = set(db.execute(
+            select(ProcessedEvent.topic, ProcessedEvent.event_id).where(
+                tuple_(ProcessedEvent.topic, ProcessedEvent.event_id).in_(
+                    [(row["topic"], row["event_id"]) for row in rows]
+                )
+            )
+        ).tuples())
+        new_rows = [row for row in rows if (row["topic"], row["event_id"]) not in existing]
+        if new_rows:
+            db.execute(stmt, new_rows)
+        return {(row["topic"], row["event_id"]) for row in new_rows}
+
+    async def insert_rows_async(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> Set[Key]:
+        raise NotImplementedError("DB_MODE=async requires PostgreSQL")
+
+    @staticmethod
+    def topics_statement(names: Iterable[str]):
+        return sqlite.insert(Topic).values([{"name": name} for name in names]) \
+            .on_conflict_do_nothing(index_elements=[Topic.name])
+
+    @staticmethod
+    def minute_counts_statement(rows: List[Dict[str, Any]]):
+        """(statement, parameter) upsert rollup per menit lewat executemany."""
+        stmt = sqlite.insert(TopicMinuteCount)
+        return stmt.on_conflict_do_update(
+            index_elements=[TopicMinuteCount.topic, TopicMinuteCount.bucket, TopicMinuteCount.source],
+            set_={"count": TopicMinuteCount.count + stmt.excluded["count"]}
+        ), rows
+
+    @staticmethod
+    def topic_stats_statement(rows: List[Dict[str, Any]]):
+        """(statement, parameter) upsert counter per topic lewat executemany."""
+        stmt = sqlite.insert(TopicStats)
+        return stmt.on_conflict_do_update(
+            index_elements=[TopicStats.topic, TopicStats.shard],
+            set_={
+                "received": TopicStats.received + stmt.excluded.received,
+                "unique_processed": TopicStats.unique_processed + stmt.excluded.unique_processed,
+                "duplicate_dropped": TopicStats.duplicate_dropped + stmt.excluded.duplicate_dropped,
+                # max() skalar SQLite; DateTime disimpan sebagai teks UTC yang terurut
+                "last_event_at": func.max(TopicStats.last_event_at, stmt.excluded.last_event_at)
+            }
+        ), rows
+
+
+def backend_for(dialect: str):
+    """Backend untuk nama dialect SQLAlchemy (lihat DB_DIALECT)."""
+    if dialect == "sqlite":
+        return SQLiteBackend()
+    return PostgresBackend()
@@ -0,0 +1,34 @@
+"""
+Cache in-process sederhana untuk hasil yang boleh sedikit basi.
+"""
+import time
+import threading
+from typing import Any, Callable, Optional
+
+
+class TTLValue:
+    """Satu nilai ter-cache dengan batas staleness `ttl` detik (0 = nonaktif)."""
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.value: Any = None
+        self.expires_at = 0.0
+
+    def get(self) -> Optional[Any]:
+        """Nilai ter-cache, None bila kosong, kedaluwarsa, atau cache nonaktif."""
+        with self.lock:
+            if self.ttl > 0 and self.value is not None and self.clock() < self.expires_at:
+                return self.value
+            return None
+
+    def set(self, value: Any):
+        with self.lock:
+            self.value = value
+            self.expires_at = self.clock() + self.ttl
+
+    def clear(self):
+        with self.lock:
+            self.value = None
+            self.expires_at = 0.0
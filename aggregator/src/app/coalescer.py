@@ -0,0 +1,85 @@
+"""
+Write-behind micro-batching untuk /publish (COALESCE_MAX_WAIT_MS > 0).
+
+Batch dari request yang datang bersamaan dikumpulkan paling lama
+COALESCE_MAX_WAIT_MS atau sampai COALESCE_MAX_EVENTS event, lalu di-commit
+dalam satu transaksi lewat IdempotentConsumer.process_batches. Setiap
+pemanggil menunggu future miliknya yang baru di-resolve SETELAH commit,
+sehingga durabilitas sama dengan jalur langsung.
+"""
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 0 = coalescing nonaktif (setiap request menjadi transaksi sendiri)
+COALESCE_MAX_WAIT_MS = float(os.getenv("COALESCE_MAX_WAIT_MS", "0"))
+COALESCE_MAX_EVENTS = int(os.getenv("COALESCE_MAX_EVENTS", "1000"))
+
+FlushFn = Callable[[List[List[Any]]], Awaitable[List[Dict[str, Any]]]]
+
+
+class Coalescer:
+    """Pengumpul batch per event loop; flush(batches) harus mengembalikan hasil per batch."""
+
+    def __init__(self, flush: FlushFn, max_wait_ms: float = COALESCE_MAX_WAIT_MS,
+                 max_events: int = COALESCE_MAX_EVENTS):
+        self.flush = flush
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_events = max_events
+        self.pending: List[Tuple[List[Any], asyncio.Future]] = []
+        self.pending_events = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.in_flight: Set[asyncio.Task] = set()
+        self.flushes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_wait > 0
+
+    async def submit(self, events: List[Any]) -> Dict[str, Any]:
+        """Antrekan batch dan tunggu sampai commit; kembalikan hasil batch ini."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((events, future))
+        self.pending_events += len(events)
+        if self.pending_events >= self.max_events:
+            self._flush_pending()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait, self._flush_pending)
+        return await future
+
+    def _flush_pending(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        group, self.pending, self.pending_events = self.pending, [], 0
+        task = asyncio.get_running_loop().create_task(self._commit(group))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def _commit(self, group: List[Tuple[List[Any], asyncio.Future]]):
+        self.flushes += 1
+        try:
+            results = await self.flush([events for events, _ in group])
+        except Exception as e:
+            # Satu transaksi gagal = semua pemanggil di grup gagal (tidak ada yang ter-commit)
+            logger.error(f"Coalesced commit of {len(group)} batches failed: {e}")
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(group, results):
+            # Pemanggil yang sudah dibatalkan (client putus) tetap ter-commit
+            if not future.done():
+                future.set_result(result)
+
+    async def drain(self):
+        """Flush batch yang tersisa dan tunggu semua commit selesai (saat shutdown)."""
+        self._flush_pending()
+        if self.in_flight:
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
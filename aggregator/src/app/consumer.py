@@ -1,51 +1,228 @@
+import os
+import time
 import logging
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Set, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy.dialects.postgresql import insert
-from app.models import ProcessedEvent, EventModel
-from app.database import get_db_session, update_stats_atomic
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import EventModel, parse_timestamp
+from app.backends import backend_for
+from app.validation import EventRecord
+from app.database import DB_DIALECT, get_db_session, update_stats_atomic
+from app.async_database import get_async_db_session, update_stats_atomic_async
+from app.dedup_filter import DEDUP_PREFILTER, DedupPreFilter
+from app.metrics import observe_transaction
+from app.live import NOTIFY_SQL, live_tail
+from app.rollups import MinuteCounts
+from app.topic_stats import TopicCounts
+from app.profiling import stage
 
 logger = logging.getLogger(__name__)
 
+# Jumlah baris maksimum per statement multi-row INSERT
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
+
+
+def event_time(event) -> datetime:
+    """Waktu event; EventRecord (fast path) sudah membawa datetime hasil parse."""
+    if isinstance(event, EventRecord):
+        return event.event_time
+    return parse_timestamp(event.timestamp)
+
+
 class IdempotentConsumer:
-    def __init__(self):
+    def __init__(self, prefilter: Optional[DedupPreFilter] = None, backend=None):
+        self.prefilter = prefilter
+        # SQL dedup-insert per dialect (app.backends)
+        self.backend = backend or backend_for(DB_DIALECT)
+        # Penerima key event baru untuk GET /events/stream (app.live)
+        self.live_tail = live_tail
+        # Topic yang sudah pasti ada di tabel topics (hanya diisi setelah commit)
+        self.known_topics: Set[str] = set()
         logger.info("IdempotentConsumer initialized")
 
+    def reset_caches(self):
+        """Kosongkan state in-process (mis. setelah tabel di-truncate)."""
+        self.known_topics.clear()
+        if self.prefilter is not None:
+            self.prefilter.clear()
+
+    def _new_topics_statement(self, inserted: Set[Tuple[str, str]]):
+        """INSERT topic baru ke registry, None bila semua topic sudah dikenal."""
+        new_topics = sorted({topic for topic, _ in inserted} - self.known_topics)
+        if not new_topics:
+            return None, new_topics
+        return self.backend.topics_statement(new_topics), new_topics
+
+    def _prefilter_split(self, events: List[EventModel]) -> Tuple[List[EventModel], int]:
+        """Lewati duplikat yang dikonfirmasi pre-filter; sisanya tetap ke database."""
+        if self.prefilter is None:
+            return events, 0
+        return self.prefilter.split(events)
+
+    def _prefilter_remember(self, events: List[EventModel]):
+        """Setelah commit, semua key kandidat pasti ada di database (baru atau lama)."""
+        if self.prefilter is not None:
+            self.prefilter.remember((event.topic, event.event_id) for event in events)
+
     def process_event(self, event: EventModel, db: Session) -> bool:
-        """Memproses satu event dengan PostgreSQL ON CONFLICT."""
-        dt_str = event.timestamp.replace('Z', '+00:00')
-        event_timestamp = datetime.fromisoformat(dt_str)
-
-        stmt = insert(ProcessedEvent).values(
-            topic=event.topic,
-            event_id=event.event_id,
-            timestamp=event_timestamp,
-            source=event.source,
-            payload=event.payload
-        ).on_conflict_do_nothing(constraint='uq_topic_event_id')
-        
-        result = db.execute(stmt)
-        return result.rowcount > 0
+        """Memproses satu event; True bila event baru ditulis."""
+        return bool(self.insert_bulk([event], db))
 
-    def process_batch(self, events: List[EventModel]) -> Dict[str, Any]:
-        processed_count = 0
-        duplicate_count = 0
-        
-        with get_db_session() as db:
+    def _bulk_chunks(self, events: List[EventModel]):
+        """
+        BAB 9: Set-based idempotent upsert.
+        Baris untuk dedup-insert backend (ON CONFLICT DO NOTHING / INSERT OR IGNORE), per chunk.
+        Duplikat di dalam batch yang sama dibuang lebih dulu (event pertama
+        menang), lalu baris diurutkan per (topic, event_id) agar batch konkuren
+        mengunci key dengan urutan yang sama (tanpa deadlock).
+        """
+        rows = []
+        seen = set()
+        with stage("prepare_rows"):
+            for event in events:
+                key = (event.topic, event.event_id)
+                if key in seen:
+                    continue
+                seen.add(key)
+                rows.append({
+                    "topic": event.topic,
+                    "event_id": event.event_id,
+                    "timestamp": event_time(event),
+                    "source": event.source,
+                    "payload": event.payload
+                })
+            rows.sort(key=lambda row: (row["topic"], row["event_id"]))
+
+        for i in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+            yield rows[i:i + BULK_INSERT_CHUNK_SIZE]
+
+    def insert_bulk(self, events: List[EventModel], db: Session,
+                    counts: Optional[MinuteCounts] = None) -> Set[Tuple[str, str]]:
+        """
+        Jalankan bulk upsert, kembalikan key (topic, event_id) yang baru ditulis.
+        Event baru ikut dijumlahkan ke `counts` (rollup per menit) bila diberikan.
+        """
+        inserted = set()
+        for rows in self._bulk_chunks(events):
+            with stage("insert"):
+                keys = self.backend.insert_rows(db, rows)
+            inserted.update(keys)
+            if counts is not None:
+                counts.add(rows, keys)
+        return inserted
+
+    async def insert_bulk_async(self, events: List[EventModel], db: AsyncSession,
+                                counts: Optional[MinuteCounts] = None) -> Set[Tuple[str, str]]:
+        """Versi async dari insert_bulk."""
+        inserted = set()
+        for rows in self._bulk_chunks(events):
+            with stage("insert"):
+                keys = await self.backend.insert_rows_async(db, rows)
+            inserted.update(keys)
+            if counts is not None:
+                counts.add(rows, keys)
+        return inserted
+
+    @staticmethod
+    def _attribute(batches: List[List[EventModel]], inserted: Set[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Hitung hasil per batch pemanggil. Key baru dikreditkan ke kemunculan
+        pertamanya (urutan batch lalu urutan event), sisanya duplikat.
+        """
+        credited = set()
+        results = []
+        for events in batches:
+            processed_count = 0
             for event in events:
-                if self.process_event(event, db):
+                key = (event.topic, event.event_id)
+                if key in inserted and key not in credited:
+                    credited.add(key)
                     processed_count += 1
-                else:
-                    duplicate_count += 1
-            
-            update_stats_atomic(db, len(events), processed_count, duplicate_count)
-
-        return {
-            "received": len(events),
-            "processed": processed_count,
-            "duplicates": duplicate_count,
-            "errors": 0
-        }
-
-consumer = IdempotentConsumer()
\ No newline at end of file
+            results.append({
+                "received": len(events),
+                "processed": processed_count,
+                "duplicates": len(events) - processed_count,
+                "errors": 0
+            })
+        return results
+
+    def process_batches(self, batches: List[List[EventModel]]) -> List[Dict[str, Any]]:
+        """
+        Memproses beberapa batch (mis. dari coalescer) dalam SATU transaksi
+        bulk upsert + satu update stats, hasil dihitung per batch.
+        """
+        events = [event for batch in batches for event in batch]
+        candidates, _ = self._prefilter_split(events)
+        started = time.perf_counter()
+        with stage("process_batch"), get_db_session() as db:
+            with stage("checkout"):
+                db.connection()  # checkout pool di sini agar waktu tunggunya terukur
+            connected = time.perf_counter()
+            counts = MinuteCounts()
+            inserted = self.insert_bulk(candidates, db, counts) if candidates else set()
+            topics_stmt, new_topics = self._new_topics_statement(inserted)
+            if topics_stmt is not None:
+                with stage("topics"):
+                    db.execute(topics_stmt)
+            if counts:
+                with stage("rollup"):
+                    db.execute(*self.backend.minute_counts_statement(counts.rows()))
+            topic_counts = TopicCounts(events, inserted)
+            if topic_counts:
+                with stage("topic_stats"):
+                    db.execute(*self.backend.topic_stats_statement(topic_counts.rows()))
+            with stage("stats_update"):
+                update_stats_atomic(db, len(events), len(inserted), len(events) - len(inserted))
+            relay = self.live_tail.notify_params(inserted)
+            if relay is not None:
+                db.execute(NOTIFY_SQL, relay)
+        observe_transaction(len(events), len(inserted), started, connected)
+        self._prefilter_remember(candidates)
+        self.known_topics.update(new_topics)
+        self.live_tail.committed(inserted)
+        return self._attribute(batches, inserted)
+
+    async def process_batches_async(self, batches: List[List[EventModel]]) -> List[Dict[str, Any]]:
+        """Versi async dari process_batches (DB_MODE=async)."""
+        events = [event for batch in batches for event in batch]
+        candidates, _ = self._prefilter_split(events)
+        started = time.perf_counter()
+        with stage("process_batch"):
+            async with get_async_db_session() as db:
+                with stage("checkout"):
+                    await db.connection()
+                connected = time.perf_counter()
+                counts = MinuteCounts()
+                inserted = await self.insert_bulk_async(candidates, db, counts) if candidates else set()
+                topics_stmt, new_topics = self._new_topics_statement(inserted)
+                if topics_stmt is not None:
+                    with stage("topics"):
+                        await db.execute(topics_stmt)
+                if counts:
+                    with stage("rollup"):
+                        await db.execute(*self.backend.minute_counts_statement(counts.rows()))
+                topic_counts = TopicCounts(events, inserted)
+                if topic_counts:
+                    with stage("topic_stats"):
+                        await db.execute(*self.backend.topic_stats_statement(topic_counts.rows()))
+                with stage("stats_update"):
+                    await update_stats_atomic_async(db, len(events), len(inserted), len(events) - len(inserted))
+                relay = self.live_tail.notify_params(inserted)
+                if relay is not None:
+                    await db.execute(NOTIFY_SQL, relay)
+        observe_transaction(len(events), len(inserted), started, connected)
+        self._prefilter_remember(candidates)
+        self.known_topics.update(new_topics)
+        self.live_tail.committed(inserted)
+        return self._attribute(batches, inserted)
+
+    def process_batch(self, events: List[EventModel]) -> Dict[str, Any]:
+        """Memproses batch dalam satu transaksi dengan bulk upsert."""
+        return self.process_batches([events])[0]
+
+    async def process_batch_async(self, events: List[EventModel]) -> Dict[str, Any]:
+        """Versi async dari process_batch (DB_MODE=async)."""
+        return (await self.process_batches_async([events]))[0]
+
+consumer = IdempotentConsumer(prefilter=DedupPreFilter() if DEDUP_PREFILTER else None)
\ No newline at end of file
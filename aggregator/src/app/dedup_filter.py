@@ -0,0 +1,187 @@
+"""
+In-process dedup pre-filter di depan constraint uq_topic_event_id.
+
+Kombinasi scalable Bloom filter (cek negatif murah) dan LRU berisi key
+(topic, event_id) yang SUDAH di-commit. Event hanya dilewati tanpa INSERT
+bila Bloom positif DAN LRU mengonfirmasi key secara eksak, sehingga filter
+tidak pernah menyebabkan false drop. Constraint database tetap sumber kebenaran.
+"""
+import os
+import math
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import ProcessedEvent
+
+logger = logging.getLogger(__name__)
+
+DEDUP_PREFILTER = os.getenv("DEDUP_PREFILTER", "false").lower() == "true"
+DEDUP_LRU_SIZE = int(os.getenv("DEDUP_LRU_SIZE", "100000"))
+DEDUP_BLOOM_CAPACITY = int(os.getenv("DEDUP_BLOOM_CAPACITY", "100000"))
+DEDUP_BLOOM_ERROR_RATE = float(os.getenv("DEDUP_BLOOM_ERROR_RATE", "0.01"))
+# Jumlah key terbaru dari processed_events yang dimuat saat startup
+DEDUP_WARM_LIMIT = int(os.getenv("DEDUP_WARM_LIMIT", str(DEDUP_LRU_SIZE)))
+
+Key = Tuple[str, str]
+
+
+def _key_bytes(key: Key) -> bytes:
+    return f"{key[0]}\x00{key[1]}".encode()
+
+
+class BloomFilter:
+    """Bloom filter klasik dengan double hashing di atas blake2b."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: Key):
+        digest = hashlib.blake2b(_key_bytes(key), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: Key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: Key) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class ScalableBloomFilter:
+    """
+    Scalable Bloom filter (Almeida et al.): saat filter aktif penuh, tambahkan
+    filter baru dengan kapasitas lebih besar dan error rate lebih ketat.
+    """
+
+    def __init__(self, initial_capacity: int, error_rate: float, growth: int = 2, tightening: float = 0.5):
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters: List[BloomFilter] = [BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def add(self, key: Key):
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(
+                current.capacity * self.growth,
+                self.error_rate * (1 - self.tightening) * (self.tightening ** len(self.filters))
+            )
+            self.filters.append(current)
+        current.add(key)
+
+    def __contains__(self, key: Key) -> bool:
+        return any(key in bloom for bloom in reversed(self.filters))
+
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
+
+class RecentKeyCache:
+    """LRU terbatas berisi key yang sudah di-commit."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.keys: "OrderedDict[Key, None]" = OrderedDict()
+
+    def add(self, key: Key):
+        self.keys[key] = None
+        self.keys.move_to_end(key)
+        if len(self.keys) > self.maxsize:
+            self.keys.popitem(last=False)
+
+    def confirm(self, key: Key) -> bool:
+        if key in self.keys:
+            self.keys.move_to_end(key)
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+class DedupPreFilter:
+    """Pre-filter thread-safe yang dipakai IdempotentConsumer."""
+
+    def __init__(self, lru_size: int = DEDUP_LRU_SIZE, bloom_capacity: int = DEDUP_BLOOM_CAPACITY,
+                 error_rate: float = DEDUP_BLOOM_ERROR_RATE):
+        self.lru_size = lru_size
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Kosongkan filter dan counter (mis. setelah tabel di-truncate)."""
+        with self.lock:
+            self.bloom = ScalableBloomFilter(self.bloom_capacity, self.error_rate)
+            self.recent = RecentKeyCache(self.lru_size)
+            self.hits = 0
+            self.misses = 0
+            self.bloom_unconfirmed = 0
+
+    def split(self, events: List[Any]) -> Tuple[List[Any], int]:
+        """
+        Pisahkan event yang pasti duplikat (terkonfirmasi LRU) dari kandidat INSERT.
+        Returns:
+            (kandidat yang tetap dikirim ke database, jumlah duplikat yang dilewati)
+        """
+        candidates = []
+        skipped = 0
+        with self.lock:
+            for event in events:
+                key = (event.topic, event.event_id)
+                if key in self.bloom:
+                    if self.recent.confirm(key):
+                        self.hits += 1
+                        skipped += 1
+                        continue
+                    # Bloom positif tapi tidak ada di LRU: false positive atau sudah ter-evict
+                    self.bloom_unconfirmed += 1
+                self.misses += 1
+                candidates.append(event)
+        return candidates, skipped
+
+    def remember(self, keys: Iterable[Key]):
+        """Catat key yang sudah ada di database. Panggil hanya SETELAH commit."""
+        with self.lock:
+            for key in keys:
+                if key not in self.bloom:
+                    self.bloom.add(key)
+                self.recent.add(key)
+
+    def warm(self, db: Session, limit: int = DEDUP_WARM_LIMIT) -> int:
+        """Muat key terbaru dari processed_events saat startup."""
+        rows = db.execute(
+            select(ProcessedEvent.topic, ProcessedEvent.event_id)
+            .order_by(ProcessedEvent.id.desc())
+            .limit(limit)
+        ).all()
+        # Urutan lama -> baru agar key terbaru paling lama bertahan di LRU
+        self.remember((topic, event_id) for topic, event_id in reversed(rows))
+        logger.info(f"Dedup pre-filter warmed with {len(rows)} keys")
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bloom_unconfirmed": self.bloom_unconfirmed,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "lru_keys": len(self.recent),
+                "bloom_keys": len(self.bloom)
+            }
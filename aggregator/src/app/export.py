@@ -0,0 +1,222 @@
+"""
+Bulk export GET /events/export: NDJSON, CSV atau Parquet dengan memori konstan.
+
+Baris dibaca lewat server-side cursor (stream_results + yield_per
+EXPORT_BATCH_ROWS; named cursor psycopg2 / cursor asyncpg) dan setiap partisi
+langsung di-encode ke respons, jadi memori worker hanya sebesar satu partisi
+berapa pun jumlah barisnya. Parquet menulis satu row group per partisi.
+NDJSON/CSV bisa dikompres gzip secara inkremental (?compress=gzip).
+
+Export memakai satu transaksi baca sepanjang stream; pada SQLite transaksi ini
+tidak mengambil lock tulis (read_only, snapshot WAL) sehingga ingest tetap jalan.
+"""
+import io
+import os
+import csv
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from app.models import ProcessedEvent
+from app.database import engine
+from app.queries import as_utc
+
+# Baris per fetch dari server-side cursor (dan per row group Parquet)
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+EXPORT_PARQUET_COMPRESSION = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+
+COLUMNS = ("id", "topic", "event_id", "timestamp", "source", "payload", "processed_at")
+
+
+def export_query(topic: Optional[str], start: Optional[datetime], end: Optional[datetime]):
+    """
+    Kolom event dengan processed_at di [start, end), urut (processed_at, id).
+    Batas tanpa offset dianggap UTC (SQLite membandingkan teks UTC).
+    """
+    query = select(*(getattr(ProcessedEvent, column) for column in COLUMNS))
+    if topic:
+        query = query.where(ProcessedEvent.topic == topic)
+    if start is not None:
+        query = query.where(ProcessedEvent.processed_at >= as_utc(start).astimezone(timezone.utc))
+    if end is not None:
+        query = query.where(ProcessedEvent.processed_at < as_utc(end).astimezone(timezone.utc))
+    return query.order_by(ProcessedEvent.processed_at, ProcessedEvent.id)
+
+
+class NDJSONEncoder:
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence[Any]) -> bytes:
+        return "".join(
+            json.dumps({
+                "id": row.id,
+                "topic": row.topic,
+                "event_id": row.event_id,
+                "timestamp": as_utc(row.timestamp).isoformat(),
+                "source": row.source,
+                "payload": row.payload,
+                "processed_at": as_utc(row.processed_at).isoformat()
+            }, separators=(",", ":")) + "\n"
+            for row in rows
+        ).encode()
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class CSVEncoder:
+    """Satu baris per event; payload sebagai teks JSON."""
+    media_type = "text/csv"
+    extension = "csv"
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def _drain(self) -> bytes:
+        data = self.buffer.getvalue().encode()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def header(self) -> bytes:
+        self.writer.writerow(COLUMNS)
+        return self._drain()
+
+    def encode(self, rows: Sequence[Any]) -> bytes:
+        self.writer.writerows(
+            (row.id, row.topic, row.event_id, as_utc(row.timestamp).isoformat(), row.source,
+             json.dumps(row.payload, separators=(",", ":")), as_utc(row.processed_at).isoformat())
+            for row in rows
+        )
+        return self._drain()
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """File tujuan ParquetWriter yang bytes-nya diambil (dan dibuang) setelah tiap row group."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    """Satu row group per partisi cursor; payload sebagai kolom string JSON."""
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def __init__(self, compression: str = EXPORT_PARQUET_COMPRESSION):
+        # pyarrow hanya di-import bila format parquet diminta
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ("id", pa.int64()),
+            ("topic", pa.string()),
+            ("event_id", pa.string()),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("source", pa.string()),
+            ("payload", pa.string()),
+            ("processed_at", pa.timestamp("us", tz="UTC")),
+        ])
+        self.sink = _ChunkSink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema, compression=compression)
+
+    def header(self) -> bytes:
+        return self.sink.take()
+
+    def encode(self, rows: Sequence[Any]) -> bytes:
+        table = self.pa.Table.from_pydict({
+            "id": [row.id for row in rows],
+            "topic": [row.topic for row in rows],
+            "event_id": [row.event_id for row in rows],
+            "timestamp": [as_utc(row.timestamp) for row in rows],
+            "source": [row.source for row in rows],
+            "payload": [json.dumps(row.payload, separators=(",", ":")) for row in rows],
+            "processed_at": [as_utc(row.processed_at) for row in rows],
+        }, schema=self.schema)
+        self.writer.write_table(table)
+        return self.sink.take()
+
+    def finish(self) -> bytes:
+        self.writer.close()
+        return self.sink.take()
+
+
+ENCODERS = {"ndjson": NDJSONEncoder, "csv": CSVEncoder, "parquet": ParquetEncoder}
+
+
+class ExportStream:
+    """Encoder + gzip inkremental opsional; tiap langkah mengembalikan bytes siap kirim."""
+
+    def __init__(self, encoder, compress: bool = False):
+        self.encoder = encoder
+        self.compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def _out(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) if self.compressor is not None else data
+
+    def begin(self) -> bytes:
+        return self._out(self.encoder.header())
+
+    def chunk(self, rows: Sequence[Any]) -> bytes:
+        return self._out(self.encoder.encode(rows))
+
+    def end(self) -> bytes:
+        data = self._out(self.encoder.finish())
+        if self.compressor is not None:
+            data += self.compressor.flush()
+        return data
+
+
+def stream_export(stream: ExportStream, query, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    """Body export pada jalur sync (StreamingResponse menjalankannya di threadpool)."""
+    yield stream.begin()
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=batch_rows, read_only=True)
+        for rows in conn.execute(query).partitions():
+            data = stream.chunk(rows)
+            if data:
+                yield data
+    yield stream.end()
+
+
+async def stream_export_async(stream: ExportStream, query, batch_rows: int = EXPORT_BATCH_ROWS) -> AsyncIterator[bytes]:
+    """Body export pada jalur DB_MODE=async (cursor asyncpg)."""
+    from app.async_database import get_async_engine
+
+    yield stream.begin()
+    async with get_async_engine().connect() as conn:
+        result = await conn.stream(query.execution_options(yield_per=batch_rows))
+        async for rows in result.partitions():
+            data = stream.chunk(rows)
+            if data:
+                yield data
+    yield stream.end()
@@ -0,0 +1,201 @@
+"""
+Cache hasil /publish per header Idempotency-Key.
+
+Publisher mengulang batch utuh bila request gagal, termasuk timeout padahal
+server sudah commit. Dengan Idempotency-Key, respons batch yang berhasil
+disimpan (status + body) selama IDEMPOTENCY_TTL detik; retry dengan key dan
+body yang sama langsung menerima respons asli (header Idempotent-Replayed)
+tanpa validasi, tanpa query database, dan tanpa menambah counter `received`.
+
+- IDEMPOTENCY_STORE=memory: LRU in-process (IDEMPOTENCY_CACHE_SIZE entry) per worker.
+- IDEMPOTENCY_STORE=redis: dibagi semua worker/replika lewat Redis (BROKER_URL).
+  Request pertama memasang penanda "pending" (SET NX); request lain dengan key
+  yang sama selama penanda itu ada menerima 409 dan bisa mencoba lagi.
+
+Retry yang tiba saat request asli masih diproses di worker yang sama menunggu
+hasil request asli. Key yang dipakai ulang dengan body berbeda ditolak (422).
+Respons error tidak disimpan: retry setelah kegagalan diproses ulang.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE", "memory").lower()
+if IDEMPOTENCY_STORE not in ("memory", "redis"):
+    raise ValueError(f"IDEMPOTENCY_STORE must be 'memory' or 'redis', got {IDEMPOTENCY_STORE!r}")
+# Jumlah respons yang disimpan per worker (store memory); 0 = fitur nonaktif
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "3600"))
+# Umur maksimum penanda pending di Redis (worker yang mati tidak mengunci key selamanya)
+IDEMPOTENCY_PENDING_TTL = int(os.getenv("IDEMPOTENCY_PENDING_TTL", "60"))
+
+MAX_KEY_LENGTH = 255
+REDIS_PREFIX = "aggregator:idempotency:"
+
+Entry = Dict[str, Any]
+
+
+class IdempotencyKeyReused(Exception):
+    """Key yang sama dikirim dengan body berbeda."""
+
+
+class IdempotencyKeyInProgress(Exception):
+    """Request lain dengan key yang sama masih diproses (di worker lain)."""
+
+
+def fingerprint(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class MemoryStore:
+    """LRU + TTL in-process (thread-safe)."""
+
+    def __init__(self, size: int = IDEMPOTENCY_CACHE_SIZE, ttl: float = IDEMPOTENCY_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, Tuple[float, Entry]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if self.clock() >= expires_at:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def claim(self, key: str) -> bool:
+        # Request bersamaan di worker ini sudah digabung oleh IdempotencyKeys
+        return True
+
+    def put(self, key: str, entry: Entry):
+        with self.lock:
+            self.entries[key] = (self.clock() + self.ttl, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def release(self, key: str):
+        pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class RedisStore:
+    """Entry JSON di Redis dengan TTL, dibagi semua worker."""
+
+    def __init__(self, client=None, ttl: float = IDEMPOTENCY_TTL, pending_ttl: int = IDEMPOTENCY_PENDING_TTL):
+        self._client = client
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+
+    @property
+    def client(self):
+        if self._client is None:
+            from app.queue import get_redis
+            self._client = get_redis()
+        return self._client
+
+    def get(self, key: str) -> Optional[Entry]:
+        value = self.client.get(REDIS_PREFIX + key)
+        return json.loads(value) if value is not None else None
+
+    def claim(self, key: str) -> bool:
+        return bool(self.client.set(REDIS_PREFIX + key, json.dumps({"pending": True}),
+                                    nx=True, ex=self.pending_ttl))
+
+    def put(self, key: str, entry: Entry):
+        self.client.set(REDIS_PREFIX + key, json.dumps(entry), px=int(self.ttl * 1000))
+
+    def release(self, key: str):
+        self.client.delete(REDIS_PREFIX + key)
+
+    def clear(self):
+        for name in self.client.scan_iter(REDIS_PREFIX + "*"):
+            self.client.delete(name)
+
+
+class IdempotencyKeys:
+    """
+    Jalankan handler sekali per Idempotency-Key. Entry berisi fingerprint body,
+    status dan body respons; request dengan key yang sama menerima entry itu.
+    """
+
+    def __init__(self, store, enabled: bool = IDEMPOTENCY_CACHE_SIZE > 0):
+        self.store = store
+        self.enabled = enabled
+        # Key yang sedang diproses di worker ini -> Future berisi entry
+        self.in_flight: Dict[str, asyncio.Future] = {}
+
+    async def _call(self, fn, *args):
+        # Store Redis memakai client sync (sama seperti enqueue_batch)
+        if isinstance(self.store, MemoryStore):
+            return fn(*args)
+        return await run_in_threadpool(fn, *args)
+
+    @staticmethod
+    def _replay(entry: Entry, body_fingerprint: str) -> Entry:
+        if entry["fingerprint"] != body_fingerprint:
+            raise IdempotencyKeyReused("Idempotency-Key was already used with a different request body")
+        return entry
+
+    async def execute(self, key: str, body: bytes,
+                      handler: Callable[[], Awaitable[Tuple[int, bytes]]]) -> Tuple[Entry, bool]:
+        """
+        (entry, replayed). `handler` dipanggil hanya bila key belum punya hasil
+        dan mengembalikan (status_code, body) yang disimpan bila berhasil (< 400).
+        Raises IdempotencyKeyReused / IdempotencyKeyInProgress.
+        """
+        body_fingerprint = fingerprint(body)
+        pending = self.in_flight.get(key)
+        if pending is not None:
+            return self._replay(await asyncio.shield(pending), body_fingerprint), True
+
+        entry = await self._call(self.store.get, key)
+        if entry is not None:
+            if entry.get("pending"):
+                raise IdempotencyKeyInProgress("A request with this Idempotency-Key is still being processed")
+            return self._replay(entry, body_fingerprint), True
+        if not await self._call(self.store.claim, key):
+            raise IdempotencyKeyInProgress("A request with this Idempotency-Key is still being processed")
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            status_code, content = await handler()
+            entry = {"fingerprint": body_fingerprint, "status": status_code, "body": content.decode()}
+            if status_code < 400:
+                await self._call(self.store.put, key, entry)
+            else:
+                await self._call(self.store.release, key)
+            future.set_result(entry)
+            return entry, False
+        except BaseException as e:
+            await self._call(self.store.release, key)
+            future.set_exception(e)
+            # Tandai exception sudah diambil bila tidak ada request lain yang menunggu
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[key]
+
+
+idempotency_keys = IdempotencyKeys(RedisStore() if IDEMPOTENCY_STORE == "redis" else MemoryStore())
@@ -0,0 +1,63 @@
+"""
+Launcher produksi: `python -m app.launcher`.
+
+Proses induk menjalankan init_db sekali (di bawah advisory lock, lihat
+app.database.init_db), lalu uvicorn men-spawn WORKERS proses worker yang
+masing-masing punya pool sendiri (DB_CONNECTION_BUDGET dibagi rata). Worker
+melewati init_db karena AGGREGATOR_SCHEMA_READY=1 diwarisi dari induk.
+
+SIGTERM ke induk diteruskan ke semua worker: socket berhenti menerima koneksi,
+request yang sedang berjalan diselesaikan (maks. GRACEFUL_SHUTDOWN_TIMEOUT
+detik), lalu lifespan shutdown men-drain coalescer dan worker pool.
+"""
+import os
+import shutil
+import logging
+
+import uvicorn
+
+from app.database import WORKERS, POOL_SIZE, POOL_MAX_OVERFLOW, engine, init_db
+
+logger = logging.getLogger(__name__)
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8080"))
+# Batas waktu menunggu request yang sedang berjalan saat shutdown
+GRACEFUL_SHUTDOWN_TIMEOUT = float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+SCHEMA_READY_ENV = "AGGREGATOR_SCHEMA_READY"
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def schema_ready() -> bool:
+    """True di worker yang di-spawn launcher (init_db sudah dijalankan induk)."""
+    return os.getenv(SCHEMA_READY_ENV) == "1"
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        # Nilai metrik dari run sebelumnya tidak boleh ikut dijumlahkan
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir)
+    init_db()
+    # Koneksi induk tidak dipakai lagi; jangan ikut memakan budget
+    engine.dispose()
+    os.environ[SCHEMA_READY_ENV] = "1"
+    logger.info(f"Starting {WORKERS} worker(s) on {HOST}:{PORT}, "
+                f"pool {POOL_SIZE}+{POOL_MAX_OVERFLOW} per worker")
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        app_dir=APP_DIR,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT
+    )
+
+
+if __name__ == "__main__":
+    main()
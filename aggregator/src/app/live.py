@@ -0,0 +1,352 @@
+"""
+Live tail GET /events/stream (Server-Sent Events) tanpa polling database per subscriber.
+
+IdempotentConsumer memanggil LiveTail.committed(keys) SETELAH commit dengan key
+event yang baru ditulis. Bila ada subscriber untuk topic-nya, key diantrekan ke
+satu task per worker yang mengambil barisnya sekali (satu query per batch, bukan
+per subscriber), merender frame SSE sekali, lalu menyalinnya ke buffer tiap
+subscriber. Subscriber idle hanya berupa asyncio.Event + deque kosong.
+
+Buffer per subscriber dibatasi LIVE_TAIL_BUFFER event. Subscriber lambat:
+- disconnect (default): stream ditutup dengan event `overflow`; klien menyambung
+  ulang dengan Last-Event-ID dan event yang terlewat di-replay dari database.
+- drop_oldest: event tertua dibuang dan klien menerima event `gap` berisi jumlahnya.
+
+Id setiap event SSE adalah cursor (processed_at, id) yang sama dengan GET /events.
+Resume (Last-Event-ID atau ?cursor=) me-replay event sesudah cursor, urut naik,
+maksimal LIVE_TAIL_REPLAY_LIMIT event, sebelum beralih ke event live.
+
+Commit di worker lain tidak terlihat in-process; LIVE_TAIL_RELAY=notify mengirim
+key lewat PostgreSQL NOTIFY di dalam transaksi (terkirim hanya bila commit) ke
+listener di setiap worker. auto = notify bila WORKERS > 1 pada PostgreSQL.
+"""
+import os
+import json
+import select
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.database import IS_SQLITE, WORKERS
+from app.queries import encode_cursor, serialize_event
+
+logger = logging.getLogger(__name__)
+
+# Event maksimum yang menunggu dikirim per subscriber
+LIVE_TAIL_BUFFER = int(os.getenv("LIVE_TAIL_BUFFER", "1000"))
+LIVE_TAIL_SLOW_POLICY = os.getenv("LIVE_TAIL_SLOW_POLICY", "disconnect").lower()
+if LIVE_TAIL_SLOW_POLICY not in ("disconnect", "drop_oldest"):
+    raise ValueError(f"LIVE_TAIL_SLOW_POLICY must be 'disconnect' or 'drop_oldest', got {LIVE_TAIL_SLOW_POLICY!r}")
+LIVE_TAIL_MAX_SUBSCRIBERS = int(os.getenv("LIVE_TAIL_MAX_SUBSCRIBERS", "10000"))
+# Interval komentar keep-alive (detik) agar proxy tidak menutup stream idle
+LIVE_TAIL_HEARTBEAT = float(os.getenv("LIVE_TAIL_HEARTBEAT", "15"))
+LIVE_TAIL_REPLAY_LIMIT = int(os.getenv("LIVE_TAIL_REPLAY_LIMIT", "10000"))
+
+LIVE_TAIL_RELAY = os.getenv("LIVE_TAIL_RELAY", "auto").lower()
+if LIVE_TAIL_RELAY not in ("auto", "local", "notify"):
+    raise ValueError(f"LIVE_TAIL_RELAY must be 'auto', 'local' or 'notify', got {LIVE_TAIL_RELAY!r}")
+if LIVE_TAIL_RELAY == "notify" and IS_SQLITE:
+    raise ValueError("LIVE_TAIL_RELAY=notify requires PostgreSQL")
+RELAY_NOTIFY = LIVE_TAIL_RELAY == "notify" or (LIVE_TAIL_RELAY == "auto" and WORKERS > 1 and not IS_SQLITE)
+
+NOTIFY_CHANNEL = "aggregator_live"
+# Batas payload NOTIFY PostgreSQL 8000 byte
+NOTIFY_PAYLOAD_BYTES = 7900
+NOTIFY_SQL = text(f"SELECT pg_notify('{NOTIFY_CHANNEL}', payload) FROM unnest(CAST(:payloads AS text[])) AS payload")
+
+Key = Tuple[str, str]
+FetchFn = Callable[[List[Key]], Awaitable[List[Any]]]
+
+
+class LiveEvent(NamedTuple):
+    """Event yang sudah dirender sekali untuk semua subscriber."""
+    topic: str
+    pk: int
+    frame: str
+
+
+def render_event(row) -> LiveEvent:
+    """Frame SSE untuk satu baris ProcessedEvent; id = cursor (processed_at, id)."""
+    data = json.dumps(serialize_event(row), separators=(",", ":"))
+    return LiveEvent(row.topic, row.id, f"id: {encode_cursor(row.processed_at, row.id)}\nevent: event\ndata: {data}\n\n")
+
+
+def control_frame(event: str, **data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def notify_payloads(keys: Iterable[Key]) -> List[str]:
+    """Key dipecah menjadi payload JSON NOTIFY yang masing-masing di bawah batas ukuran."""
+    payloads, chunk, size = [], [], 2
+    for key in keys:
+        encoded = json.dumps(key)
+        if chunk and size + len(encoded.encode()) + 1 > NOTIFY_PAYLOAD_BYTES:
+            payloads.append("[" + ",".join(chunk) + "]")
+            chunk, size = [], 2
+        chunk.append(encoded)
+        size += len(encoded.encode()) + 1
+    if chunk:
+        payloads.append("[" + ",".join(chunk) + "]")
+    return payloads
+
+
+class LiveTailFull(Exception):
+    """Jumlah subscriber sudah mencapai LIVE_TAIL_MAX_SUBSCRIBERS."""
+
+
+class Subscriber:
+    """Buffer terbatas satu stream; hanya diakses dari thread event loop."""
+
+    def __init__(self, topic: Optional[str], buffer_size: int, policy: str):
+        self.topic = topic
+        self.buffer_size = buffer_size
+        self.policy = policy
+        self.buffer: Deque[LiveEvent] = deque()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.overflowed = False
+        self.closed = False
+
+    def offer(self, event: LiveEvent):
+        if self.overflowed:
+            return
+        if len(self.buffer) >= self.buffer_size:
+            if self.policy == "disconnect":
+                self.overflowed = True
+                self.buffer.clear()
+                self.ready.set()
+                return
+            self.buffer.popleft()
+            self.dropped += 1
+        self.buffer.append(event)
+        self.ready.set()
+
+    async def take(self, timeout: float) -> Tuple[List[LiveEvent], int]:
+        """Event yang menunggu (kosong bila timeout) dan jumlah yang dibuang sejak take terakhir."""
+        if not self.buffer and not self.overflowed and not self.closed:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self.ready.clear()
+        events = list(self.buffer)
+        self.buffer.clear()
+        dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+
+class NotifyListener:
+    """Thread LISTEN pada koneksi psycopg2 khusus; key yang diterima diteruskan ke on_keys."""
+
+    def __init__(self, engine: Engine, on_keys: Callable[[List[Key]], None], channel: str = NOTIFY_CHANNEL):
+        self.engine = engine
+        self.on_keys = on_keys
+        self.channel = channel
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.listening = threading.Event()
+
+    def _listen(self):
+        raw = self.engine.raw_connection()
+        conn = raw.driver_connection
+        raw.detach()  # koneksi dipegang selamanya, jangan kembali ke pool
+        try:
+            conn.rollback()
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            self.listening.set()
+            while not self.stop_event.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self.on_keys([tuple(key) for key in json.loads(notify.payload)])
+        finally:
+            self.listening.clear()
+            conn.close()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                # Notifikasi selama putus hilang; klien bisa resume dari cursor
+                logger.error(f"Live tail listener failed: {e}")
+                self.stop_event.wait(1.0)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="live-tail-listener", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+
+class LiveTail:
+    """Fan-out event yang baru di-commit ke subscriber GET /events/stream di worker ini."""
+
+    def __init__(self, buffer_size: int = LIVE_TAIL_BUFFER, policy: str = LIVE_TAIL_SLOW_POLICY,
+                 max_subscribers: int = LIVE_TAIL_MAX_SUBSCRIBERS, heartbeat: float = LIVE_TAIL_HEARTBEAT,
+                 replay_limit: int = LIVE_TAIL_REPLAY_LIMIT, relay: bool = RELAY_NOTIFY):
+        self.buffer_size = buffer_size
+        self.policy = policy
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.replay_limit = replay_limit
+        self.relay = relay
+        # topic -> subscriber; key None = semua topic
+        self.by_topic: Dict[Optional[str], Set[Subscriber]] = {}
+        self.subscribers = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.fetch: Optional[FetchFn] = None
+        self.listener: Optional[NotifyListener] = None
+        self.fetches = 0
+
+    def start(self, fetch: FetchFn, engine: Optional[Engine] = None):
+        """Dipanggil dari lifespan; fetch(keys) mengembalikan baris ProcessedEvent urut (processed_at, id)."""
+        self.loop = asyncio.get_running_loop()
+        self.fetch = fetch
+        self.queue = asyncio.Queue()
+        self.task = self.loop.create_task(self._run())
+        if self.relay:
+            self.listener = NotifyListener(engine, self._deliver)
+            self.listener.start()
+            # Worker baru menerima request setelah LISTEN aktif
+            if not self.listener.listening.wait(10):
+                logger.warning("Live tail listener is not listening yet")
+
+    async def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self.loop = None
+        for subscribers in self.by_topic.values():
+            for subscriber in subscribers:
+                subscriber.close()
+
+    def subscribe(self, topic: Optional[str]) -> Subscriber:
+        if self.subscribers >= self.max_subscribers:
+            raise LiveTailFull(f"live tail is limited to {self.max_subscribers} subscribers")
+        subscriber = Subscriber(topic, self.buffer_size, self.policy)
+        self.by_topic.setdefault(topic, set()).add(subscriber)
+        self.subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self.by_topic.get(subscriber.topic)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        self.subscribers -= 1
+        if not subscribers:
+            del self.by_topic[subscriber.topic]
+
+    def notify_params(self, keys: Set[Key]) -> Optional[Dict[str, Any]]:
+        """Parameter NOTIFY_SQL untuk transaksi consumer, None bila relay nonaktif."""
+        if not self.relay or not keys:
+            return None
+        return {"payloads": notify_payloads(sorted(keys))}
+
+    def committed(self, keys: Set[Key]):
+        """Dipanggil consumer setelah commit (thread mana pun). Pada mode relay key datang lewat NOTIFY."""
+        if not self.relay:
+            self._deliver(keys)
+
+    def _deliver(self, keys: Iterable[Key]):
+        loop = self.loop
+        if loop is None or not self.by_topic:
+            return
+        # Hanya key dengan subscriber yang diambil dari database
+        wanted = list(keys) if None in self.by_topic else [key for key in keys if key[0] in self.by_topic]
+        if not wanted:
+            return
+        try:
+            loop.call_soon_threadsafe(self.queue.put_nowait, wanted)
+        except RuntimeError:
+            pass  # event loop sudah ditutup (shutdown)
+
+    async def _run(self):
+        while True:
+            keys = await self.queue.get()
+            # Batch yang menumpuk selama fetch sebelumnya digabung menjadi satu query
+            while not self.queue.empty():
+                keys.extend(self.queue.get_nowait())
+            try:
+                self.fetches += 1
+                rows = await self.fetch(keys)
+            except Exception as e:
+                logger.error(f"Live tail fetch failed: {e}")
+                continue
+            self.publish([render_event(row) for row in rows])
+
+    def publish(self, events: List[LiveEvent]):
+        everyone = self.by_topic.get(None, ())
+        for event in events:
+            for subscriber in everyone:
+                subscriber.offer(event)
+            for subscriber in self.by_topic.get(event.topic, ()):
+                subscriber.offer(event)
+
+    async def stream(self, subscriber: Subscriber,
+                     replay: Optional[AsyncIterator[List[Any]]] = None) -> AsyncIterator[str]:
+        """
+        Body SSE untuk satu subscriber (sudah terdaftar sebelum replay agar tidak ada celah).
+        Event replay yang juga tiba lewat jalur live dikirim sekali saja.
+        """
+        replayed: Set[int] = set()
+        try:
+            yield ": connected\n\n"
+            if replay is not None:
+                async for rows in replay:
+                    for row in rows:
+                        if len(replayed) >= self.replay_limit:
+                            yield control_frame("truncated", limit=self.replay_limit)
+                            break
+                        event = render_event(row)
+                        replayed.add(event.pk)
+                        yield event.frame
+                    else:
+                        continue
+                    break
+            while not subscriber.closed:
+                events, dropped = await subscriber.take(self.heartbeat)
+                if subscriber.overflowed:
+                    yield control_frame("overflow", buffer=self.buffer_size)
+                    return
+                if dropped:
+                    yield control_frame("gap", dropped=dropped)
+                if not events and not dropped:
+                    yield ": keepalive\n\n"
+                for event in events:
+                    if event.pk not in replayed:
+                        yield event.frame
+        finally:
+            self.unsubscribe(subscriber)
+            if replay is not None:
+                await replay.aclose()
+
+
+live_tail = LiveTail()
@@ -0,0 +1,147 @@
+"""
+Metrik Prometheus untuk GET /metrics (METRICS_ENABLED).
+
+Hot path hanya melakukan beberapa observe/inc per request dan per transaksi:
+MetricsMiddleware mencatat latensi per route, IdempotentConsumer memanggil
+observe_transaction sekali per commit. Saturasi pool dibaca saat scrape oleh
+PoolCollector, bukan di hot path.
+
+Dengan WORKERS > 1 set PROMETHEUS_MULTIPROC_DIR agar /metrics menggabungkan
+nilai semua worker (app.launcher mengosongkan direktori itu saat start).
+"""
+import os
+import time
+from typing import Dict, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+BATCH_SIZE_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+RATIO_BUCKETS = (0, .1, .2, .3, .4, .5, .6, .7, .8, .9, 1)
+
+REQUEST_LATENCY = Histogram(
+    "aggregator_request_duration_seconds", "HTTP request latency per route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+BATCH_SIZE = Histogram(
+    "aggregator_batch_size_events", "Events per consumer transaction", buckets=BATCH_SIZE_BUCKETS
+)
+TRANSACTION_TIME = Histogram(
+    "aggregator_db_transaction_seconds", "Consumer transaction time (insert, stats, commit)",
+    buckets=LATENCY_BUCKETS
+)
+POOL_WAIT = Histogram(
+    "aggregator_db_pool_wait_seconds", "Time waiting for a pooled connection per consumer transaction",
+    buckets=LATENCY_BUCKETS
+)
+DEDUP_RATIO = Histogram(
+    "aggregator_dedup_hit_ratio", "Share of duplicates per consumer transaction", buckets=RATIO_BUCKETS
+)
+# Cermin tabel stats (sejak proses start, bukan total persisten)
+EVENTS_RECEIVED = Counter("aggregator_events_received", "Events received by the consumer")
+EVENTS_UNIQUE = Counter("aggregator_events_unique_processed", "Events inserted as new")
+EVENTS_DUPLICATE = Counter("aggregator_events_duplicate_dropped", "Events dropped as duplicates")
+IDEMPOTENT_REPLAYS = Counter(
+    "aggregator_idempotent_replays", "/publish requests answered from the Idempotency-Key cache"
+)
+
+
+def observe_transaction(received: int, unique: int, started: float, connected: float):
+    """Catat satu transaksi consumer yang sudah commit (timestamp dari time.perf_counter)."""
+    if not METRICS_ENABLED:
+        return
+    now = time.perf_counter()
+    BATCH_SIZE.observe(received)
+    TRANSACTION_TIME.observe(now - connected)
+    POOL_WAIT.observe(connected - started)
+    if received:
+        DEDUP_RATIO.observe((received - unique) / received)
+    EVENTS_RECEIVED.inc(received)
+    EVENTS_UNIQUE.inc(unique)
+    EVENTS_DUPLICATE.inc(received - unique)
+
+
+def observe_replay():
+    if METRICS_ENABLED:
+        IDEMPOTENT_REPLAYS.inc()
+
+
+class PoolCollector:
+    """Koneksi terpakai dan saturasi pool tiap engine, dibaca saat scrape."""
+
+    def collect(self):
+        from app.database import DB_MODE, POOL_SIZE, POOL_MAX_OVERFLOW, engine
+        from app.async_database import started_async_engine
+
+        pools = {"sync": (engine.pool, POOL_SIZE + POOL_MAX_OVERFLOW if DB_MODE == "sync" else 2)}
+        async_engine = started_async_engine()
+        if async_engine is not None:
+            pools["async"] = (async_engine.sync_engine.pool, POOL_SIZE + POOL_MAX_OVERFLOW)
+
+        checked_out = GaugeMetricFamily(
+            "aggregator_db_pool_checked_out", "Connections currently checked out", labels=["engine"]
+        )
+        saturation = GaugeMetricFamily(
+            "aggregator_db_pool_saturation", "Checked-out connections / (pool_size + max_overflow)",
+            labels=["engine"]
+        )
+        for name, (pool, capacity) in pools.items():
+            in_use = pool.checkedout()
+            checked_out.add_metric([name], in_use)
+            saturation.add_metric([name], in_use / capacity if capacity else 0)
+        yield checked_out
+        yield saturation
+
+
+REGISTRY.register(PoolCollector())
+
+
+def render_metrics():
+    """(body, content_type) untuk GET /metrics."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        registry.register(PoolCollector())
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware: latensi request per template route (bukan path mentah)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.routes: Optional[Dict] = None
+
+    def _route(self, scope) -> str:
+        if self.routes is None:
+            self.routes = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self.routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(scope["method"], self._route(scope), str(status_code)) \
+                .observe(time.perf_counter() - started)
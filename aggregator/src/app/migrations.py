@@ -0,0 +1,103 @@
+"""
+Migrasi skema idempoten yang dijalankan init_db setelah create_all.
+create_all hanya membuat tabel/index yang belum ada pada tabel BARU; langkah
+di sini membawa database lama ke skema terbaru. Setiap langkah harus aman
+dijalankan berulang kali.
+"""
+import os
+import logging
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# GIN jsonb_path_ops atas payload untuk filter ?where= di GET /events.
+# Konfigurasi ini otoritatif: false men-drop index bila ada (biaya tulis lebih kecil)
+PAYLOAD_GIN_INDEX = os.getenv("PAYLOAD_GIN_INDEX", "false").lower() == "true"
+
+# Langkah yang memakai fitur khusus PostgreSQL (jsonb, GIN, DO $$, date_trunc), dilewati pada SQLite
+POSTGRES_ONLY = {
+    "processed_events_payload_jsonb", "ix_processed_events_payload_gin", "backfill_topic_minute_counts"
+}
+# Padanan SQLite untuk langkah khusus PostgreSQL
+SQLITE_ONLY = {"backfill_topic_minute_counts_sqlite"}
+
+# Backfill rollup app.rollups sekali saat masih kosong; format bucket SQLite sama
+# dengan DateTime SQLAlchemy ("YYYY-MM-DD HH:MM:SS.ffffff", UTC)
+_BACKFILL_MINUTE_COUNTS = (
+    "INSERT INTO topic_minute_counts (topic, bucket, source, count) "
+    "SELECT topic, {bucket}, source, count(*) FROM processed_events "
+    "WHERE NOT EXISTS (SELECT 1 FROM topic_minute_counts) "
+    "GROUP BY 1, 2, 3 ON CONFLICT DO NOTHING"
+)
+
+# (nama, SQL) dijalankan berurutan
+MIGRATIONS: List[Tuple[str, str]] = [
+    (
+        "ix_processed_events_topic_processed_at_id",
+        "CREATE INDEX IF NOT EXISTS ix_processed_events_topic_processed_at_id "
+        "ON processed_events (topic, processed_at DESC, id DESC)"
+    ),
+    (
+        "ix_processed_events_processed_at_id",
+        "CREATE INDEX IF NOT EXISTS ix_processed_events_processed_at_id "
+        "ON processed_events (processed_at DESC, id DESC)"
+    ),
+    (
+        # Backfill sekali saat registry masih kosong
+        "backfill_topics",
+        "INSERT INTO topics (name) SELECT DISTINCT topic FROM processed_events "
+        "WHERE NOT EXISTS (SELECT 1 FROM topics) ON CONFLICT DO NOTHING"
+    ),
+    (
+        # Backfill counter per topic sekali saat masih kosong; riwayat duplikat
+        # tidak tersimpan di processed_events sehingga duplicate_dropped mulai dari 0
+        "backfill_topic_stats",
+        "INSERT INTO topic_stats (topic, shard, received, unique_processed, duplicate_dropped, last_event_at) "
+        "SELECT topic, 1, count(*), count(*), 0, max(processed_at) FROM processed_events "
+        "WHERE NOT EXISTS (SELECT 1 FROM topic_stats) "
+        "GROUP BY topic ON CONFLICT DO NOTHING"
+    ),
+    (
+        "backfill_topic_minute_counts",
+        _BACKFILL_MINUTE_COUNTS.format(bucket="date_trunc('minute', timestamp)")
+    ),
+    (
+        "backfill_topic_minute_counts_sqlite",
+        _BACKFILL_MINUTE_COUNTS.format(bucket="strftime('%Y-%m-%d %H:%M:00.000000', timestamp)")
+    ),
+    (
+        # Kolom payload lama bertipe json (teks) -> jsonb
+        "processed_events_payload_jsonb",
+        """
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                  AND table_name = 'processed_events' AND column_name = 'payload') = 'json' THEN
+                ALTER TABLE processed_events ALTER COLUMN payload TYPE jsonb USING payload::jsonb;
+            END IF;
+        END $$
+        """
+    ),
+    (
+        "ix_processed_events_payload_gin",
+        "CREATE INDEX IF NOT EXISTS ix_processed_events_payload_gin "
+        "ON processed_events USING gin (payload jsonb_path_ops)"
+        if PAYLOAD_GIN_INDEX else
+        "DROP INDEX IF EXISTS ix_processed_events_payload_gin"
+    ),
+]
+
+
+def run_migrations(engine: Engine):
+    """Jalankan semua migrasi dalam satu transaksi."""
+    with engine.begin() as conn:
+        for name, sql in MIGRATIONS:
+            if name in POSTGRES_ONLY and engine.dialect.name != "postgresql":
+                continue
+            if name in SQLITE_ONLY and engine.dialect.name != "sqlite":
+                continue
+            conn.execute(text(sql))
+            logger.info(f"Migration applied: {name}")
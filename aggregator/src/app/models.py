@@ -3,16 +3,26 @@ Data models for event schema and database tables.
 Defines both SQLAlchemy ORM models and Pydantic validation schemas.
 Updated for SQLAlchemy 2.0 and Pydantic V2 standards.
 """
+import os
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field, field_validator, ConfigDict
-from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint, BigInteger, JSON
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint, BigInteger, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
 
 # SQLAlchemy 2.0 standard for base class
 Base = declarative_base()
 
+TIMESTAMP_ERROR = 'timestamp must be valid ISO8601 format'
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse timestamp ISO8601 (mendukung suffix Z)."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
 # --- PYDANTIC MODELS (Validation & API) ---
 
 class EventModel(BaseModel):
@@ -32,9 +42,9 @@ class EventModel(BaseModel):
         """Validate ISO8601 timestamp format (Bab 5: Time and Ordering)."""
         try:
             # Handle Z suffix and convert to offset-aware datetime
-            datetime.fromisoformat(v.replace('Z', '+00:00'))
+            parse_timestamp(v)
         except ValueError:
-            raise ValueError('timestamp must be valid ISO8601 format')
+            raise ValueError(TIMESTAMP_ERROR)
         return v
 
     # Pydantic V2 configuration style
@@ -59,6 +69,38 @@ class BatchEventModel(BaseModel):
 
 # --- SQLALCHEMY MODELS (Database Persistence) ---
 
+# Layout processed_events: "none" = satu tabel dengan uq_topic_event_id,
+# "daily"/"hourly" = range partition per hari/jam atas processed_at (lihat app.partitions)
+PARTITIONING = os.getenv("PARTITIONING", "none").lower()
+if PARTITIONING not in ("none", "daily", "hourly"):
+    raise ValueError(f"PARTITIONING must be 'none', 'daily' or 'hourly', got {PARTITIONING!r}")
+PARTITIONED = PARTITIONING != "none"
+
+# Dedup key store: "columns" = (topic, event_id) apa adanya, "hashed" = hash 16 byte
+# di tabel event_key_hashes yang di-hash-partition menjadi DEDUP_KEY_PARTITIONS
+DEDUP_KEY_STORE = os.getenv("DEDUP_KEY_STORE", "columns").lower()
+if DEDUP_KEY_STORE not in ("columns", "hashed"):
+    raise ValueError(f"DEDUP_KEY_STORE must be 'columns' or 'hashed', got {DEDUP_KEY_STORE!r}")
+DEDUP_KEY_PARTITIONS = int(os.getenv("DEDUP_KEY_PARTITIONS", "16"))
+# Dedup lewat tabel key terpisah, processed_events menjadi tabel append-only tanpa uq_topic_event_id
+SEPARATE_KEY_STORE = PARTITIONED or DEDUP_KEY_STORE == "hashed"
+
+
+def _processed_events_table_args(topic, processed_at, id_column):
+    """Index bersama kedua layout + constraint/partisi khusus layout."""
+    indexes = (
+        Index('ix_processed_events_topic_processed_at_id', topic, processed_at.desc(), id_column.desc()),
+        Index('ix_processed_events_processed_at_id', processed_at.desc(), id_column.desc()),
+    )
+    if PARTITIONED:
+        # Unique constraint partisi wajib memuat kunci partisi, jadi dedup
+        # dipindah ke tabel key terpisah (EventKey / EventKeyHash)
+        return indexes + ({'postgresql_partition_by': 'RANGE (processed_at)'},)
+    if SEPARATE_KEY_STORE:
+        return indexes
+    return (UniqueConstraint('topic', 'event_id', name='uq_topic_event_id'),) + indexes
+
+
 class ProcessedEvent(Base):
     """
     Database model for processed events.
@@ -71,13 +113,72 @@ class ProcessedEvent(Base):
     event_id = Column(String(255), nullable=False, index=True)
     timestamp = Column(DateTime(timezone=True), nullable=False)
     source = Column(String(255), nullable=False)
-    payload = Column(JSON, nullable=False)
-    processed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # JSONB: tidak di-parse ulang saat dibaca dan bisa di-index (GIN jsonb_path_ops);
+    # teks JSON pada SQLite
+    payload = Column(JSONB().with_variant(JSON(), "sqlite"), nullable=False)
+    # Pada layout partisi, primary key = (id, processed_at)
+    processed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False,
+                          primary_key=PARTITIONED)
 
-    # BAB 9: Unique Constraint for strong deduplication.
-    __table_args__ = (
-        UniqueConstraint('topic', 'event_id', name='uq_topic_event_id'),
-    )
+    # BAB 9: Unique Constraint for strong deduplication (layout "none").
+    # Index komposit untuk keyset pagination GET /events (processed_at DESC, id).
+    __table_args__ = _processed_events_table_args(topic, processed_at, id)
+
+
+class EventKey(Base):
+    """
+    Dedup key store untuk layout partisi: INSERT ... ON CONFLICT DO NOTHING ke
+    tabel ini menentukan apakah event baru. Key lebih tua dari DEDUP_WINDOW_HOURS
+    dihapus oleh job retensi. Hanya dipakai bila PARTITIONING aktif dan
+    DEDUP_KEY_STORE=columns.
+    """
+    __tablename__ = 'event_keys'
+
+    topic = Column(String(255), primary_key=True)
+    event_id = Column(String(255), primary_key=True)
+    first_seen_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+
+class EventKeyHash(Base):
+    """
+    Dedup key store ringkas (DEDUP_KEY_STORE=hashed): primary key 16 byte hash
+    (topic, event_id) alih-alih B-tree atas dua String(255), di-hash-partition
+    sehingga tiap index partisi tetap kecil. Partisi dibuat oleh app.key_store.
+    """
+    __tablename__ = 'event_key_hashes'
+
+    key_hash = Column(UUID(as_uuid=True), primary_key=True)
+    first_seen_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    __table_args__ = {'postgresql_partition_by': 'HASH (key_hash)'}
+
+
+class Topic(Base):
+    """
+    Registry topic unik, diisi dalam transaksi yang sama dengan insert event.
+    Menggantikan count(DISTINCT topic) atas processed_events di GET /stats.
+    """
+    __tablename__ = 'topics'
+
+    name = Column(String(255), primary_key=True)
+    first_seen_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class TopicMinuteCount(Base):
+    """
+    Rollup jumlah event unik per (topic, source, menit event timestamp), di-upsert
+    dalam transaksi yang sama dengan insert event (lihat app.rollups).
+    GET /stats/timeseries membaca tabel ini, bukan GROUP BY atas processed_events.
+    """
+    __tablename__ = 'topic_minute_counts'
+
+    topic = Column(String(255), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    source = Column(String(255), primary_key=True)
+    count = Column(BigInteger, nullable=False)
+
+    # Primary key melayani ?topic= + rentang waktu; index ini untuk rentang tanpa topic
+    __table_args__ = (Index('ix_topic_minute_counts_bucket', bucket),)
 
 
 class Stats(Base):
@@ -94,6 +195,40 @@ class Stats(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
+class TopicStats(Base):
+    """
+    Counter per topic (app.topic_stats), di-shard seperti Stats: tiap transaksi
+    menambah satu slot acak per topic yang ada di batch-nya.
+    """
+    __tablename__ = 'topic_stats'
+
+    topic = Column(String(255), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    received = Column(BigInteger, default=0, nullable=False)
+    unique_processed = Column(BigInteger, default=0, nullable=False)
+    duplicate_dropped = Column(BigInteger, default=0, nullable=False)
+    # Waktu server saat event terakhir topic ini diterima
+    last_event_at = Column(DateTime(timezone=True), nullable=False)
+
+
+def key_store_model():
+    """Model tabel key dedup yang aktif; None bila dedup lewat uq_topic_event_id."""
+    if DEDUP_KEY_STORE == "hashed":
+        return EventKeyHash
+    if PARTITIONED:
+        return EventKey
+    return None
+
+
+def active_tables():
+    """Tabel untuk konfigurasi aktif (tabel key store yang tidak dipakai tidak dibuat)."""
+    key_model = key_store_model()
+    unused = {EventKey.__table__, EventKeyHash.__table__}
+    if key_model is not None:
+        unused.discard(key_model.__table__)
+    return [table for table in Base.metadata.sorted_tables if table not in unused]
+
+
 # --- RESPONSE MODELS ---
 
 class StatsResponse(BaseModel):
@@ -103,6 +238,33 @@ class StatsResponse(BaseModel):
     duplicate_dropped: int
     topics: int
     uptime: float
+    dedup_filter: Optional[Dict[str, Any]] = None
+
+
+class TopicStatsResponse(BaseModel):
+    """Satu topic di GET /stats/topics."""
+    topic: str
+    received: int
+    unique_processed: int
+    duplicate_dropped: int
+    duplicate_ratio: float
+    last_event_at: datetime
+
+
+class TimeseriesPoint(BaseModel):
+    """Satu bucket GET /stats/timeseries."""
+    bucket_start: datetime
+    topic: str
+    source: str
+    count: int
+
+
+class TimeseriesResponse(BaseModel):
+    """Response model for GET /stats/timeseries."""
+    bucket: str
+    start: datetime
+    end: datetime
+    points: List[TimeseriesPoint]
 
 
 class EventResponse(BaseModel):
@@ -0,0 +1,60 @@
+"""
+Parser NDJSON inkremental untuk POST /publish/stream.
+Body request dibaca per chunk (opsional gzip) dan dipecah per baris tanpa
+pernah menampung seluruh body di memori.
+"""
+import os
+import zlib
+from typing import AsyncIterator, Tuple
+
+# Baris lebih panjang dari ini ditolak (melindungi memori dari body tanpa newline)
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(1024 * 1024)))
+
+
+class LineTooLong(ValueError):
+    """Baris NDJSON melebihi STREAM_MAX_LINE_BYTES."""
+
+
+async def _decompressed(chunks: AsyncIterator[bytes], gzip: bool, max_piece: int) -> AsyncIterator[bytes]:
+    """Dekompresi bertahap; tiap potongan dibatasi max_piece byte (anti gzip bomb)."""
+    if not gzip:
+        async for chunk in chunks:
+            yield chunk
+        return
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = chunk
+        while data:
+            yield decompressor.decompress(data, max_piece)
+            data = decompressor.unconsumed_tail
+    yield decompressor.flush()
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], gzip: bool = False,
+                            max_line_bytes: int = STREAM_MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Hasilkan (nomor baris, isi baris) dari stream byte.
+    Raises:
+        zlib.error: body gzip rusak
+        LineTooLong: satu baris melebihi max_line_bytes
+    """
+    buffer = b""
+    line_no = 0
+
+    async for chunk in _decompressed(chunks, gzip, max_line_bytes):
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line_no += 1
+            yield line_no, buffer[start:end]
+            start = end + 1
+        buffer = buffer[start:]
+        if len(buffer) > max_line_bytes:
+            raise LineTooLong(f"line {line_no + 1} exceeds {max_line_bytes} bytes")
+
+    if buffer:
+        line_no += 1
+        yield line_no, buffer
@@ -0,0 +1,214 @@
+"""
+Manajemen partisi processed_events (PARTITIONING=daily|hourly).
+
+processed_events di-range-partition per periode atas processed_at. Job
+maintenance membuat partisi untuk periode berjalan + PARTITION_PREMAKE
+periode ke depan, men-DETACH lalu DROP partisi yang seluruhnya lebih tua dari
+EVENT_RETENTION_HOURS (tanpa DELETE besar dan vacuum churn), dan menghapus key
+dedup (event_keys / event_key_hashes) yang lebih tua dari DEDUP_WINDOW_HOURS. Deduplikasi dijamin untuk
+duplikat yang datang di dalam dedup window.
+"""
+import os
+import re
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+from app.models import PARTITIONING, PARTITIONED, key_store_model
+
+logger = logging.getLogger(__name__)
+
+# Jumlah partisi masa depan yang disiapkan di depan periode berjalan
+PARTITION_PREMAKE = int(os.getenv("PARTITION_PREMAKE", "3"))
+# Partisi yang seluruhnya lebih tua dari ini di-drop; 0 = simpan selamanya
+EVENT_RETENTION_HOURS = float(os.getenv("EVENT_RETENTION_HOURS", "0"))
+# Umur maksimum key di event_keys (duplikat setelah window ini diterima lagi)
+DEDUP_WINDOW_HOURS = float(os.getenv("DEDUP_WINDOW_HOURS", "168"))
+DEDUP_PURGE_BATCH = int(os.getenv("DEDUP_PURGE_BATCH", "10000"))
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "300"))
+# Hanya satu worker/replika per putaran yang menjalankan maintenance
+MAINTENANCE_LOCK_KEY = 0x61676773
+
+PARENT_TABLE = "processed_events"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+_PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_p(\d{{8}}|\d{{10}})$")
+
+
+def period_step(granularity: str = PARTITIONING) -> timedelta:
+    return timedelta(hours=1) if granularity == "hourly" else timedelta(days=1)
+
+
+def period_start(ts: datetime, granularity: str = PARTITIONING) -> datetime:
+    """Awal periode (UTC) yang memuat ts."""
+    ts = ts.astimezone(timezone.utc)
+    if granularity == "hourly":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(start: datetime, granularity: str = PARTITIONING) -> str:
+    fmt = "%Y%m%d%H" if granularity == "hourly" else "%Y%m%d"
+    return f"{PARENT_TABLE}_p{start.strftime(fmt)}"
+
+
+def partition_bounds(name: str) -> Optional[tuple]:
+    """(awal, akhir) periode dari nama partisi, None untuk partisi lain (mis. default)."""
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    digits = match.group(1)
+    if len(digits) == 10:
+        start = datetime.strptime(digits, "%Y%m%d%H").replace(tzinfo=timezone.utc)
+        return start, start + period_step("hourly")
+    start = datetime.strptime(digits, "%Y%m%d").replace(tzinfo=timezone.utc)
+    return start, start + period_step("daily")
+
+
+def is_partitioned(conn: Connection) -> Optional[bool]:
+    """True/False sesuai layout processed_events di database, None bila tabel belum ada."""
+    return conn.execute(text("""
+        SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = c.oid)
+        FROM pg_class c
+        WHERE c.relname = :name AND c.relkind IN ('r', 'p')
+          AND pg_table_is_visible(c.oid)
+    """), {"name": PARENT_TABLE}).scalar()
+
+
+def check_layout(conn: Connection):
+    """Tolak start bila layout tabel yang ada tidak cocok dengan PARTITIONING."""
+    existing = is_partitioned(conn)
+    if existing is not None and existing != PARTITIONED:
+        raise RuntimeError(
+            f"{PARENT_TABLE} is {'partitioned' if existing else 'not partitioned'} but "
+            f"PARTITIONING={PARTITIONING!r}; migrate the table or change PARTITIONING"
+        )
+
+
+def list_partitions(conn: Connection) -> List[str]:
+    return list(conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits i
+        JOIN pg_class child ON child.oid = i.inhrelid
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        WHERE parent.relname = :name
+        ORDER BY child.relname
+    """), {"name": PARENT_TABLE}).scalars())
+
+
+def ensure_partitions(conn: Connection, now: Optional[datetime] = None,
+                      premake: Optional[int] = None) -> List[str]:
+    """Buat partisi periode berjalan + `premake` periode ke depan (dan partisi default)."""
+    now = now or datetime.now(timezone.utc)
+    premake = PARTITION_PREMAKE if premake is None else premake
+    existing = set(list_partitions(conn))
+    created = []
+    if DEFAULT_PARTITION not in existing:
+        # Jaring pengaman bila maintenance tertinggal; normalnya tetap kosong
+        conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+        created.append(DEFAULT_PARTITION)
+    start = period_start(now)
+    for _ in range(premake + 1):
+        name = partition_name(start)
+        end = start + period_step()
+        if name not in existing:
+            try:
+                with conn.begin_nested():
+                    conn.execute(text(
+                        f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+                        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                    ))
+                created.append(name)
+            except DBAPIError as e:
+                # Mis. partisi default sudah berisi baris di rentang ini
+                logger.error(f"Cannot create partition {name}: {e}")
+        start = end
+    return created
+
+
+def drop_expired_partitions(conn: Connection, now: Optional[datetime] = None,
+                            retention_hours: Optional[float] = None) -> List[str]:
+    """DETACH + DROP partisi yang seluruh rentangnya lebih tua dari retensi."""
+    retention_hours = EVENT_RETENTION_HOURS if retention_hours is None else retention_hours
+    if retention_hours <= 0:
+        return []
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=retention_hours)
+    dropped = []
+    for name in list_partitions(conn):
+        bounds = partition_bounds(name)
+        if bounds is None or bounds[1] > cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+
+def purge_dedup_keys(conn: Connection, now: Optional[datetime] = None,
+                     window_hours: Optional[float] = None,
+                     batch_size: int = DEDUP_PURGE_BATCH) -> int:
+    """Hapus key yang keluar dari dedup window, per batch agar lock tetap pendek."""
+    window_hours = DEDUP_WINDOW_HOURS if window_hours is None else window_hours
+    if window_hours <= 0:
+        return 0
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=window_hours)
+    table = key_store_model().__tablename__
+    purged = 0
+    while True:
+        # tableoid ikut dicocokkan karena ctid hanya unik per partisi
+        deleted = conn.execute(text(f"""
+            DELETE FROM {table} WHERE (tableoid, ctid) IN (
+                SELECT tableoid, ctid FROM {table} WHERE first_seen_at < :cutoff LIMIT :batch
+            )
+        """), {"cutoff": cutoff, "batch": batch_size}).rowcount
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+
+
+def run_maintenance(engine: Engine, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Satu putaran maintenance; tiap langkah di transaksinya sendiri."""
+    with engine.begin() as conn:
+        created = ensure_partitions(conn, now)
+    with engine.begin() as conn:
+        dropped = drop_expired_partitions(conn, now)
+    with engine.begin() as conn:
+        purged = purge_dedup_keys(conn, now)
+    if created or dropped or purged:
+        logger.info(f"Partition maintenance: created {created}, dropped {dropped}, purged {purged} dedup keys")
+    return {"created": created, "dropped": dropped, "purged_keys": purged}
+
+
+class PartitionMaintainer:
+    """Thread yang menjalankan run_maintenance setiap PARTITION_MAINTENANCE_INTERVAL detik."""
+
+    def __init__(self, engine: Engine, interval: float = PARTITION_MAINTENANCE_INTERVAL):
+        self.engine = engine
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                with self.engine.connect() as conn:
+                    locked = conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"),
+                                          {"key": MAINTENANCE_LOCK_KEY}).scalar()
+                    if locked:
+                        run_maintenance(self.engine)
+            except Exception as e:
+                logger.error(f"Partition maintenance failed: {e}")
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="partition-maintainer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
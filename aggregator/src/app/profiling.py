@@ -0,0 +1,221 @@
+"""
+Stage timing dan sampled cProfile untuk pipeline ingest (PROFILE_STAGES).
+
+Titik ukur: validate (parse JSON + validasi) -> prepare_rows (bangun baris,
+parse timestamp) -> insert (SQL dedup/insert) -> topics -> rollup (upsert
+topic_minute_counts) -> topic_stats -> stats_update -> commit, plus
+process_batch untuk satu transaksi utuh. Setiap durasi dikirim ke hook yang
+terdaftar (register_hook); hook bawaan menyimpan rolling window per stage untuk
+GET /debug/stages.
+
+PROFILE_SAMPLE_RATE > 0 menjalankan sebagian request /publish di bawah
+cProfile (satu capture sekaligus); profil request yang lebih lambat dari
+PROFILE_SLOW_MS disimpan (maks. PROFILE_MAX_CAPTURES terbaru).
+"""
+import io
+import os
+import time
+import random
+import pstats
+import cProfile
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+PROFILE_STAGES = os.getenv("PROFILE_STAGES", "false").lower() == "true"
+# Jumlah sampel terakhir per stage untuk ringkasan
+PROFILE_WINDOW = int(os.getenv("PROFILE_WINDOW", "1024"))
+# Fraksi request /publish yang dijalankan di bawah cProfile; 0 = nonaktif
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_MAX_CAPTURES = int(os.getenv("PROFILE_MAX_CAPTURES", "20"))
+# Jumlah fungsi teratas (cumulative time) per capture
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "30"))
+
+StageHook = Callable[[str, float], None]
+
+_NULL_STAGE = nullcontext()
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class StageSummaries:
+    """Rolling window durasi per stage (thread-safe; consumer berjalan di threadpool)."""
+
+    def __init__(self, window: int = PROFILE_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples: Dict[str, Deque[float]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def __call__(self, name: str, seconds: float):
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+                self.counts[name] = 0
+            samples.append(seconds)
+            self.counts[name] += 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            snapshot = {name: (sorted(samples), self.counts[name]) for name, samples in self.samples.items()}
+        return {
+            name: {
+                "count": count,
+                "window": len(ordered),
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                "p50_ms": _percentile(ordered, 50) * 1000,
+                "p95_ms": _percentile(ordered, 95) * 1000,
+                "p99_ms": _percentile(ordered, 99) * 1000,
+                "max_ms": ordered[-1] * 1000
+            }
+            for name, (ordered, count) in snapshot.items()
+        }
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.counts.clear()
+
+
+summaries = StageSummaries()
+hooks: List[StageHook] = [summaries]
+
+
+def register_hook(hook: StageHook):
+    """Tambahkan penerima durasi stage, mis. untuk diteruskan ke sistem tracing."""
+    hooks.append(hook)
+
+
+def unregister_hook(hook: StageHook):
+    hooks.remove(hook)
+
+
+@contextmanager
+def _timed(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        for hook in hooks:
+            hook(name, elapsed)
+
+
+def stage(name: str):
+    """Context manager pengukur satu stage; no-op bila PROFILE_STAGES nonaktif."""
+    if not PROFILE_STAGES:
+        return _NULL_STAGE
+    return _timed(name)
+
+
+class RequestProfile:
+    """cProfile untuk satu request; profiler per thread digabung saat selesai."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        self.profilers: List[cProfile.Profile] = []
+
+    def call(self, fn: Callable, *args):
+        """Jalankan fn(*args) di bawah profiler baru pada thread saat ini."""
+        profiler = cProfile.Profile()
+        self.profilers.append(profiler)
+        return profiler.runcall(fn, *args)
+
+    async def await_(self, awaitable):
+        """
+        Profil awaitable di thread event loop. Task lain yang berjalan di sela
+        await ikut terekam; karena itu hanya satu capture aktif sekaligus.
+        """
+        profiler = cProfile.Profile()
+        self.profilers.append(profiler)
+        profiler.enable()
+        try:
+            return await awaitable
+        finally:
+            profiler.disable()
+
+    def render(self) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profilers[0], stream=stream)
+        for profiler in self.profilers[1:]:
+            stats.add(profiler)
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        return stream.getvalue()
+
+
+class SlowRequestSampler:
+    """Pilih request untuk di-profil dan simpan capture yang melewati ambang."""
+
+    def __init__(self, rate: float = PROFILE_SAMPLE_RATE, slow_ms: float = PROFILE_SLOW_MS,
+                 max_captures: int = PROFILE_MAX_CAPTURES):
+        self.rate = rate
+        self.slow_ms = slow_ms
+        self.lock = threading.Lock()
+        self.active = False
+        self.sampled = 0
+        self.captures: Deque[Dict[str, Any]] = deque(maxlen=max_captures)
+
+    def start(self, path: str) -> Optional[RequestProfile]:
+        """RequestProfile bila request ini terpilih, selain itu None."""
+        if self.rate <= 0 or random.random() >= self.rate:
+            return None
+        with self.lock:
+            if self.active:
+                return None
+            self.active = True
+            self.sampled += 1
+        return RequestProfile(path)
+
+    def finish(self, profile: Optional[RequestProfile]):
+        if profile is None:
+            return
+        duration_ms = (time.perf_counter() - profile.started) * 1000
+        try:
+            if duration_ms >= self.slow_ms and profile.profilers:
+                self.captures.append({
+                    "path": profile.path,
+                    "started_at": profile.started_at.isoformat(),
+                    "duration_ms": round(duration_ms, 3),
+                    "profile": profile.render()
+                })
+        finally:
+            with self.lock:
+                self.active = False
+
+    def clear(self):
+        with self.lock:
+            self.sampled = 0
+            self.captures.clear()
+
+
+sampler = SlowRequestSampler()
+
+
+def profiling_enabled() -> bool:
+    return PROFILE_STAGES or sampler.rate > 0
+
+
+def debug_report() -> Dict[str, Any]:
+    """Isi GET /debug/stages."""
+    return {
+        "stages_enabled": PROFILE_STAGES,
+        "window": summaries.window,
+        "stages": summaries.summary(),
+        "sample_rate": sampler.rate,
+        "slow_ms": sampler.slow_ms,
+        "sampled_requests": sampler.sampled,
+        "captures": list(sampler.captures)
+    }
+
+
+def reset():
+    summaries.clear()
+    sampler.clear()
@@ -0,0 +1,204 @@
+"""
+Query helpers untuk endpoint baca (GET /events, GET /stats).
+Statement dibangun sekali dan dieksekusi lewat Session (sync) atau AsyncSession (async).
+"""
+import json
+import base64
+import binascii
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import ProcessedEvent, Topic
+from app.database import IS_SQLITE, stats_totals_query
+
+
+def encode_cursor(processed_at: datetime, event_pk: int) -> str:
+    """Cursor opaque atas posisi (processed_at, id) baris terakhir di halaman."""
+    raw = json.dumps([processed_at.isoformat(), event_pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Kebalikan encode_cursor. ValueError bila cursor tidak valid."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        processed_at, event_pk = json.loads(raw)
+        return datetime.fromisoformat(processed_at), int(event_pk)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def parse_payload_filter(where: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+    """
+    Ubah ?where=key:value (boleh berulang) menjadi dokumen containment JSONB.
+    Key bertitik menjadi objek bersarang (user.id:42 -> {"user": {"id": 42}});
+    value diparse sebagai JSON bila bisa (42, true, "42"), selain itu string.
+    ValueError bila format tidak valid.
+    """
+    if not where:
+        return None
+    document: Dict[str, Any] = {}
+    for clause in where:
+        key, sep, raw = clause.partition(":")
+        if not sep or not key or any(not part for part in key.split(".")):
+            raise ValueError(f"invalid where clause {clause!r}, expected key:value")
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        *parents, leaf = key.split(".")
+        node = document
+        for part in parents:
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                raise ValueError(f"conflicting where clause {clause!r}")
+        if leaf in node and node[leaf] != value:
+            raise ValueError(f"conflicting where clause {clause!r}")
+        node[leaf] = value
+    if IS_SQLITE:
+        # Tolak filter yang tidak bisa dipetakan ke json_extract sebelum query (400)
+        sqlite_payload_conditions(document)
+    return document
+
+
+def _json_path(keys: List[str]) -> str:
+    for key in keys:
+        if '"' in key or "\\" in key:
+            raise ValueError(f"unsupported where key {'.'.join(keys)!r}")
+    return "$" + "".join(f'."{key}"' for key in keys)
+
+
+def sqlite_payload_conditions(document: Dict[str, Any], parents: Tuple[str, ...] = ()) -> list:
+    """
+    Padanan `payload @> :doc` di SQLite: satu json_extract per leaf skalar.
+    json_type membedakan true/false/null dari angka 1/0. ValueError untuk
+    value array/objek kosong yang tidak bisa dipetakan ke perbandingan skalar.
+    """
+    conditions = []
+    for key, value in document.items():
+        keys = list(parents) + [key]
+        if isinstance(value, dict) and value:
+            conditions.extend(sqlite_payload_conditions(value, tuple(keys)))
+            continue
+        path = _json_path(keys)
+        if isinstance(value, bool) or value is None:
+            json_type = "null" if value is None else str(value).lower()
+            conditions.append(func.json_type(ProcessedEvent.payload, path) == json_type)
+        elif isinstance(value, (str, int, float)):
+            conditions.append(func.json_extract(ProcessedEvent.payload, path) == value)
+        else:
+            raise ValueError(f"where value for {'.'.join(keys)!r} must be a scalar on SQLite")
+    return conditions
+
+
+def events_query(topic: Optional[str], limit: int, offset: int = 0, cursor: Optional[str] = None,
+                 payload_filter: Optional[Dict[str, Any]] = None):
+    """
+    SELECT event terbaru dengan filter topic opsional.
+    payload_filter menjadi `payload @> :doc` sehingga bisa memakai GIN jsonb_path_ops.
+    Dengan cursor: keyset pagination (processed_at, id) < cursor memakai index
+    komposit, sehingga halaman dalam tidak memindai baris yang dibuang.
+    Tanpa cursor: mode kompatibilitas LIMIT/OFFSET.
+    """
+    query = select(ProcessedEvent)
+    if topic:
+        query = query.where(ProcessedEvent.topic == topic)
+    if payload_filter and IS_SQLITE:
+        query = query.where(*sqlite_payload_conditions(payload_filter))
+    elif payload_filter:
+        query = query.where(ProcessedEvent.payload.contains(payload_filter))
+    if cursor:
+        processed_at, event_pk = decode_cursor(cursor)
+        query = query.where(
+            tuple_(ProcessedEvent.processed_at, ProcessedEvent.id) < tuple_(processed_at, event_pk)
+        )
+    query = query.order_by(ProcessedEvent.processed_at.desc(), ProcessedEvent.id.desc()).limit(limit)
+    return query if cursor else query.offset(offset)
+
+
+def events_after_query(topic: Optional[str], cursor: str, limit: int):
+    """Event sesudah cursor, urut naik (replay live tail dari Last-Event-ID)."""
+    processed_at, event_pk = decode_cursor(cursor)
+    query = select(ProcessedEvent).where(
+        tuple_(ProcessedEvent.processed_at, ProcessedEvent.id) > tuple_(processed_at, event_pk)
+    )
+    if topic:
+        query = query.where(ProcessedEvent.topic == topic)
+    return query.order_by(ProcessedEvent.processed_at, ProcessedEvent.id).limit(limit)
+
+
+def events_by_keys_query(keys: List[Tuple[str, str]]):
+    """Baris untuk key (topic, event_id), urut (processed_at, id)."""
+    return select(ProcessedEvent) \
+        .where(tuple_(ProcessedEvent.topic, ProcessedEvent.event_id).in_(keys)) \
+        .order_by(ProcessedEvent.processed_at, ProcessedEvent.id)
+
+
+def next_cursor(events: List[ProcessedEvent], limit: int) -> Optional[str]:
+    """Cursor halaman berikutnya, None bila halaman ini yang terakhir."""
+    if len(events) < limit:
+        return None
+    return encode_cursor(events[-1].processed_at, events[-1].id)
+
+
+def topic_count_query():
+    """Jumlah topic unik dari registry (tidak bergantung ukuran processed_events)."""
+    return select(func.count()).select_from(Topic)
+
+
+def as_utc(value: datetime) -> datetime:
+    """SQLite mengembalikan DateTime tanpa offset; nilainya disimpan dalam UTC."""
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def serialize_event(event: ProcessedEvent) -> Dict[str, Any]:
+    """Konversi baris ProcessedEvent ke dict EventResponse."""
+    return {
+        "id": event.id,
+        "topic": event.topic,
+        "event_id": event.event_id,
+        "timestamp": as_utc(event.timestamp).isoformat(),
+        "source": event.source,
+        "payload": event.payload,
+        "processed_at": as_utc(event.processed_at).isoformat()
+    }
+
+
+def serialize_stats(totals, topic_count: int) -> Dict[str, Any]:
+    """Konversi total slot stats ke dict StatsResponse (tanpa uptime)."""
+    received, unique, duplicate = totals
+    return {
+        "received": int(received),
+        "unique_processed": int(unique),
+        "duplicate_dropped": int(duplicate),
+        "topics": topic_count
+    }
+
+
+def fetch_events(db: Session, topic: Optional[str], limit: int, offset: int,
+                 cursor: Optional[str] = None,
+                 payload_filter: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Kembalikan (halaman event, cursor berikutnya)."""
+    events = db.execute(events_query(topic, limit, offset, cursor, payload_filter)).scalars().all()
+    return [serialize_event(event) for event in events], next_cursor(events, limit)
+
+
+async def fetch_events_async(db: AsyncSession, topic: Optional[str], limit: int, offset: int,
+                             cursor: Optional[str] = None,
+                             payload_filter: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    events = (await db.execute(events_query(topic, limit, offset, cursor, payload_filter))).scalars().all()
+    return [serialize_event(event) for event in events], next_cursor(events, limit)
+
+
+def fetch_stats(db: Session) -> Dict[str, Any]:
+    totals = db.execute(stats_totals_query()).one()
+    topic_count = db.execute(topic_count_query()).scalar() or 0
+    return serialize_stats(totals, topic_count)
+
+
+async def fetch_stats_async(db: AsyncSession) -> Dict[str, Any]:
+    totals = (await db.execute(stats_totals_query())).one()
+    topic_count = (await db.execute(topic_count_query())).scalar() or 0
+    return serialize_stats(totals, topic_count)
@@ -0,0 +1,172 @@
+"""
+Redis Stream ingestion queue (INGEST_MODE=queue).
+/publish hanya memvalidasi batch lalu XADD ke stream; worker pool membaca stream
+lewat consumer group, menggabungkan beberapa batch menjadi satu transaksi
+IdempotentConsumer.process_batch, dan XACK setelah commit (at-least-once,
+aman karena consumer idempotent). Entry milik worker yang crash diambil alih
+dengan XAUTOCLAIM.
+"""
+import os
+import json
+import socket
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from app.models import EventModel
+
+logger = logging.getLogger(__name__)
+
+BROKER_URL = os.getenv("BROKER_URL", "redis://localhost:6379")
+
+# "direct" = /publish menulis ke PostgreSQL, "queue" = /publish menulis ke Redis Stream
+INGEST_MODE = os.getenv("INGEST_MODE", "direct").lower()
+if INGEST_MODE not in ("direct", "queue"):
+    raise ValueError(f"INGEST_MODE must be 'direct' or 'queue', got {INGEST_MODE!r}")
+
+QUEUE_STREAM = os.getenv("QUEUE_STREAM", "aggregator:events")
+QUEUE_GROUP = os.getenv("QUEUE_GROUP", "aggregator")
+QUEUE_WORKERS = int(os.getenv("QUEUE_WORKERS", "2"))
+# Batas jumlah event yang digabung menjadi satu transaksi database
+QUEUE_COALESCE_MAX = int(os.getenv("QUEUE_COALESCE_MAX", "5000"))
+QUEUE_READ_COUNT = int(os.getenv("QUEUE_READ_COUNT", "50"))
+QUEUE_BLOCK_MS = int(os.getenv("QUEUE_BLOCK_MS", "1000"))
+# Entry pending lebih lama dari ini dianggap milik worker yang crash
+QUEUE_CLAIM_IDLE_MS = int(os.getenv("QUEUE_CLAIM_IDLE_MS", "30000"))
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Client Redis bersama (dibuat pada pemakaian pertama)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(BROKER_URL)
+    return _client
+
+
+def ensure_group(client: redis.Redis):
+    """Buat stream dan consumer group bila belum ada."""
+    try:
+        client.xgroup_create(QUEUE_STREAM, QUEUE_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def enqueue_batch(client: redis.Redis, events: List[EventModel]) -> str:
+    """Tambahkan satu batch tervalidasi ke stream, kembalikan ID entry."""
+    body = json.dumps([event.model_dump() for event in events])
+    message_id = client.xadd(QUEUE_STREAM, {"events": body, "count": len(events)})
+    return message_id.decode() if isinstance(message_id, bytes) else message_id
+
+
+class StreamWorker:
+    """Worker yang menguras stream dalam batch besar lewat IdempotentConsumer."""
+
+    def __init__(self, client: redis.Redis, consumer, name: Optional[str] = None):
+        self.client = client
+        self.consumer = consumer
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+
+    def _decode(self, entries) -> List[EventModel]:
+        events = []
+        for message_id, fields in entries:
+            raw = fields.get(b"events", fields.get("events"))
+            try:
+                events.extend(EventModel.model_validate(item) for item in json.loads(raw))
+            except (TypeError, ValueError) as e:
+                # Entry rusak tidak akan pernah berhasil; log lalu tetap di-ack
+                logger.error(f"Dropping malformed stream entry {message_id!r}: {e}")
+        return events
+
+    def _commit(self, entries) -> Dict[str, Any]:
+        """Proses entry dalam satu transaksi, lalu XACK + XDEL setelah commit."""
+        events = self._decode(entries)
+        result = self.consumer.process_batch(events) if events else {
+            "received": 0, "processed": 0, "duplicates": 0, "errors": 0
+        }
+        ids = [message_id for message_id, _ in entries]
+        self.client.xack(QUEUE_STREAM, QUEUE_GROUP, *ids)
+        self.client.xdel(QUEUE_STREAM, *ids)
+        return result
+
+    def claim_stale(self, min_idle_ms: int = QUEUE_CLAIM_IDLE_MS) -> Optional[Dict[str, Any]]:
+        """Ambil alih entry pending milik worker yang crash (XAUTOCLAIM) dan proses."""
+        reply = self.client.xautoclaim(
+            QUEUE_STREAM, QUEUE_GROUP, self.name,
+            min_idle_time=min_idle_ms, start_id="0-0", count=QUEUE_READ_COUNT
+        )
+        entries = [entry for entry in reply[1] if entry[1]]
+        if not entries:
+            return None
+        logger.warning(f"Reclaimed {len(entries)} pending stream entries")
+        return self._commit(entries)
+
+    def drain_once(self, block_ms: int = QUEUE_BLOCK_MS) -> Optional[Dict[str, Any]]:
+        """Baca entry baru, gabungkan sampai QUEUE_COALESCE_MAX event, lalu commit sekali."""
+        entries = []
+        event_count = 0
+        waited = False
+        while event_count < QUEUE_COALESCE_MAX:
+            # Baca yang sudah tersedia tanpa menunggu; blok hanya bila stream kosong
+            reply = self.client.xreadgroup(
+                QUEUE_GROUP, self.name, {QUEUE_STREAM: ">"}, count=QUEUE_READ_COUNT
+            )
+            if not reply or not reply[0][1]:
+                if entries or waited or not block_ms:
+                    break
+                waited = True
+                reply = self.client.xreadgroup(
+                    QUEUE_GROUP, self.name, {QUEUE_STREAM: ">"},
+                    count=QUEUE_READ_COUNT, block=block_ms
+                )
+                if not reply or not reply[0][1]:
+                    break
+            for entry in reply[0][1]:
+                entries.append(entry)
+                event_count += int(entry[1].get(b"count", entry[1].get("count", 1)))
+        if not entries:
+            return None
+        return self._commit(entries)
+
+    def run(self, stop: threading.Event):
+        """Loop worker sampai stop di-set."""
+        while not stop.is_set():
+            try:
+                self.claim_stale()
+                self.drain_once()
+            except Exception as e:
+                # Entry yang gagal tetap pending dan akan di-reclaim
+                logger.error(f"Stream worker {self.name} error: {e}")
+                stop.wait(1.0)
+
+
+class WorkerPool:
+    """Sekumpulan StreamWorker di thread terpisah."""
+
+    def __init__(self, consumer, size: int = QUEUE_WORKERS, client: Optional[redis.Redis] = None):
+        self.client = client or get_redis()
+        self.consumer = consumer
+        self.size = size
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    def start(self):
+        ensure_group(self.client)
+        for i in range(self.size):
+            worker = StreamWorker(self.client, self.consumer,
+                                  name=f"{socket.gethostname()}-{os.getpid()}-{i}")
+            thread = threading.Thread(target=worker.run, args=(self.stop_event,),
+                                      name=f"stream-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"Started {self.size} stream workers on {QUEUE_STREAM}")
+
+    def stop(self, timeout: float = 5.0):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads.clear()
@@ -0,0 +1,128 @@
+"""
+Rollup time-bucket per (topic, source) untuk GET /stats/timeseries.
+
+Setiap process_batch menjumlahkan event yang BARU ditulis per (topic, source,
+menit event timestamp) di memori, lalu meng-upsert hasilnya ke
+topic_minute_counts dalam transaksi yang sama dengan insert event: satu
+statement per batch, duplikat tidak pernah dihitung, dan rollup tidak pernah
+berbeda dari processed_events.
+
+Bucket yang lebih kasar (5m, 1h, 1d, ...) diturunkan saat dibaca dengan
+mengelompokkan baris per menit dalam rentang yang diminta, sehingga biaya
+query sebanding dengan panjang rentang, bukan ukuran tabel event.
+"""
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import BigInteger, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database import IS_SQLITE
+from app.models import TopicMinuteCount
+
+# Ukuran bucket yang bisa diminta (detik); semuanya kelipatan menit rollup
+BUCKETS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "6h": 21600, "1d": 86400}
+# Batas jumlah bucket per request (rentang / ukuran bucket)
+TIMESERIES_MAX_BUCKETS = int(os.getenv("TIMESERIES_MAX_BUCKETS", "10000"))
+# Tanpa ?from=: rentang default sepanjang sekian bucket sebelum ?to=
+DEFAULT_BUCKETS = 60
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def minute_bucket(value: datetime) -> datetime:
+    """Awal menit (UTC) sebuah timestamp; tanpa offset dianggap UTC."""
+    value = value.astimezone(timezone.utc) if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+    return value.replace(second=0, microsecond=0)
+
+
+class MinuteCounts:
+    """Akumulator per batch: jumlah event baru per (topic, source, menit)."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def __bool__(self) -> bool:
+        return bool(self.counts)
+
+    def add(self, rows: Iterable[Dict[str, Any]], inserted: Set[Tuple[str, str]]):
+        """Hitung baris (keluaran _bulk_chunks) yang key-nya benar-benar baru ditulis."""
+        for row in rows:
+            if (row["topic"], row["event_id"]) in inserted:
+                self.counts[(row["topic"], row["source"], minute_bucket(row["timestamp"]))] += 1
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Baris upsert terurut per key agar batch konkuren mengunci dengan urutan sama."""
+        return [
+            {"topic": topic, "source": source, "bucket": bucket, "count": count}
+            for (topic, source, bucket), count in sorted(self.counts.items())
+        ]
+
+
+def time_range(bucket_seconds: int, start: Optional[datetime], end: Optional[datetime]) -> Tuple[datetime, datetime]:
+    """
+    [start, end) dibulatkan ke batas bucket (start ke bawah, end ke atas) agar
+    setiap bucket lengkap. Default: end = sekarang, start = DEFAULT_BUCKETS bucket sebelumnya.
+    Raises ValueError bila rentang kosong atau melebihi TIMESERIES_MAX_BUCKETS.
+    """
+    step = timedelta(seconds=bucket_seconds)
+    end = minute_bucket(end) if end is not None else datetime.now(timezone.utc)
+    end = _EPOCH - ((_EPOCH - end) // step) * step
+    start = minute_bucket(start) if start is not None else end - DEFAULT_BUCKETS * step
+    start = _EPOCH + ((start - _EPOCH) // step) * step
+    if start >= end:
+        raise ValueError("from must be earlier than to")
+    if (end - start) // step > TIMESERIES_MAX_BUCKETS:
+        raise ValueError(f"time range spans more than TIMESERIES_MAX_BUCKETS={TIMESERIES_MAX_BUCKETS} buckets")
+    return start, end
+
+
+def _bucket_number(bucket_seconds: int):
+    """Nomor bucket (detik epoch // ukuran bucket) dari kolom bucket menit."""
+    if IS_SQLITE:
+        epoch = cast(func.strftime('%s', TopicMinuteCount.bucket), BigInteger)
+    else:
+        epoch = cast(func.extract('epoch', TopicMinuteCount.bucket), BigInteger)
+    return (epoch // bucket_seconds).label("bucket_number")
+
+
+def timeseries_query(topic: Optional[str], source: Optional[str], start: datetime, end: datetime,
+                     bucket_seconds: int):
+    """Jumlah per (bucket, topic, source) dari baris menit di [start, end)."""
+    bucket_number = _bucket_number(bucket_seconds)
+    query = select(
+        bucket_number, TopicMinuteCount.topic, TopicMinuteCount.source, func.sum(TopicMinuteCount.count)
+    ).where(TopicMinuteCount.bucket >= start, TopicMinuteCount.bucket < end)
+    if topic:
+        query = query.where(TopicMinuteCount.topic == topic)
+    if source:
+        query = query.where(TopicMinuteCount.source == source)
+    return query.group_by(bucket_number, TopicMinuteCount.topic, TopicMinuteCount.source) \
+        .order_by(bucket_number, TopicMinuteCount.topic, TopicMinuteCount.source)
+
+
+def serialize_points(rows, bucket_seconds: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "bucket_start": (_EPOCH + timedelta(seconds=int(number) * bucket_seconds)).isoformat(),
+            "topic": topic,
+            "source": source,
+            "count": int(count)
+        }
+        for number, topic, source, count in rows
+    ]
+
+
+def fetch_timeseries(db: Session, topic: Optional[str], source: Optional[str], start: datetime,
+                     end: datetime, bucket_seconds: int) -> List[Dict[str, Any]]:
+    rows = db.execute(timeseries_query(topic, source, start, end, bucket_seconds)).all()
+    return serialize_points(rows, bucket_seconds)
+
+
+async def fetch_timeseries_async(db: AsyncSession, topic: Optional[str], source: Optional[str], start: datetime,
+                                 end: datetime, bucket_seconds: int) -> List[Dict[str, Any]]:
+    rows = (await db.execute(timeseries_query(topic, source, start, end, bucket_seconds))).all()
+    return serialize_points(rows, bucket_seconds)
@@ -0,0 +1,91 @@
+"""
+Counter per topic (received, unique, duplicate, last_event_at) untuk GET /stats/topics.
+
+process_batches menjumlahkan event per topic di memori lalu meng-upsert satu
+baris per topic per transaksi ke topic_stats. Seperti tabel stats, counter
+di-shard ke STATS_SHARDS slot: tiap transaksi memilih satu slot acak sehingga
+batch konkuren untuk topic yang sama tidak antre pada satu row lock. Pembaca
+menjumlahkan slot per topic (paling banyak topic x STATS_SHARDS baris, tidak
+bergantung ukuran processed_events).
+"""
+import random
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database import STATS_SHARDS
+from app.models import TopicStats
+from app.queries import as_utc
+
+# Kolom yang bisa dipakai ?sort= (semuanya urut menurun)
+SORT_KEYS = ("received", "unique_processed", "duplicate_dropped", "duplicate_ratio", "last_event_at")
+
+
+class TopicCounts:
+    """Counter satu transaksi: event diterima dan event baru per topic."""
+
+    def __init__(self, events: Iterable[Any], inserted: Set[Tuple[str, str]]):
+        self.received = Counter(event.topic for event in events)
+        self.unique = Counter(topic for topic, _ in inserted)
+
+    def __bool__(self) -> bool:
+        return bool(self.received)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Baris upsert untuk satu slot acak, terurut per topic (urutan lock konsisten)."""
+        shard = random.randint(1, STATS_SHARDS)
+        now = datetime.now(timezone.utc)
+        return [
+            {
+                "topic": topic,
+                "shard": shard,
+                "received": received,
+                "unique_processed": self.unique[topic],
+                "duplicate_dropped": received - self.unique[topic],
+                "last_event_at": now
+            }
+            for topic, received in sorted(self.received.items())
+        ]
+
+
+def topic_stats_query(sort: str, limit: int):
+    """Jumlah semua slot per topic, top-N menurut `sort` (lihat SORT_KEYS)."""
+    received = func.sum(TopicStats.received).label("received")
+    duplicate = func.sum(TopicStats.duplicate_dropped).label("duplicate_dropped")
+    columns = {
+        "received": received,
+        "unique_processed": func.sum(TopicStats.unique_processed).label("unique_processed"),
+        "duplicate_dropped": duplicate,
+        "duplicate_ratio": (cast(duplicate, Float) / func.nullif(received, 0)).label("duplicate_ratio"),
+        "last_event_at": func.max(TopicStats.last_event_at).label("last_event_at"),
+    }
+    return select(TopicStats.topic, *columns.values()) \
+        .group_by(TopicStats.topic) \
+        .order_by(columns[sort].desc(), TopicStats.topic) \
+        .limit(limit)
+
+
+def serialize_topic_stats(rows) -> List[Dict[str, Any]]:
+    return [
+        {
+            "topic": row.topic,
+            "received": int(row.received),
+            "unique_processed": int(row.unique_processed),
+            "duplicate_dropped": int(row.duplicate_dropped),
+            "duplicate_ratio": round(float(row.duplicate_ratio or 0), 4),
+            "last_event_at": as_utc(row.last_event_at).isoformat()
+        }
+        for row in rows
+    ]
+
+
+def fetch_topic_stats(db: Session, sort: str, limit: int) -> List[Dict[str, Any]]:
+    return serialize_topic_stats(db.execute(topic_stats_query(sort, limit)).all())
+
+
+async def fetch_topic_stats_async(db: AsyncSession, sort: str, limit: int) -> List[Dict[str, Any]]:
+    return serialize_topic_stats((await db.execute(topic_stats_query(sort, limit))).all())
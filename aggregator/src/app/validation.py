@@ -0,0 +1,105 @@
+"""
+Fast-path validation (FAST_VALIDATION=true).
+
+Body mentah divalidasi oleh TypeAdapter yang dikompilasi sekali di atas
+TypedDict (tanpa membangun objek EventModel per event), timestamp diparse
+tepat satu kali, dan hasilnya berupa EventRecord ber-__slots__ yang langsung
+dipakai jalur INSERT. Pesan error sama dengan EventModel.
+"""
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from pydantic import Field, StringConstraints, TypeAdapter
+from typing_extensions import Annotated, TypedDict
+
+from app.models import TIMESTAMP_ERROR, parse_timestamp
+
+FAST_VALIDATION = os.getenv("FAST_VALIDATION", "false").lower() == "true"
+
+BoundedStr = Annotated[str, StringConstraints(min_length=1, max_length=255)]
+
+
+class EventDict(TypedDict):
+    topic: BoundedStr
+    event_id: BoundedStr
+    timestamp: str
+    source: BoundedStr
+    payload: Dict[str, Any]
+
+
+class BatchDict(TypedDict):
+    events: Annotated[List[EventDict], Field(min_length=1)]
+
+
+_event_adapter = TypeAdapter(EventDict)
+_batch_adapter = TypeAdapter(BatchDict)
+
+
+class EventRecord:
+    """Event tervalidasi yang ringan; atribut sama dengan EventModel + event_time."""
+    __slots__ = ("topic", "event_id", "timestamp", "source", "payload", "event_time")
+
+    def __init__(self, topic: str, event_id: str, timestamp: str, source: str,
+                 payload: Dict[str, Any], event_time: datetime):
+        self.topic = topic
+        self.event_id = event_id
+        self.timestamp = timestamp
+        self.source = source
+        self.payload = payload
+        self.event_time = event_time
+
+    def model_dump(self) -> Dict[str, Any]:
+        """Dict kompatibel EventModel.model_dump() (dipakai antrean Redis)."""
+        return {
+            "topic": self.topic,
+            "event_id": self.event_id,
+            "timestamp": self.timestamp,
+            "source": self.source,
+            "payload": self.payload
+        }
+
+
+class FastValidationError(ValueError):
+    """Error validasi fast path dengan format yang sama seperti ValidationError.errors()."""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} validation error(s)")
+        self._errors = errors
+
+    def errors(self) -> List[Dict[str, Any]]:
+        return self._errors
+
+
+def _to_records(items: List[EventDict], loc: Tuple) -> List[EventRecord]:
+    records = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            parsed = parse_timestamp(item["timestamp"])
+        except ValueError:
+            errors.append({
+                "type": "value_error",
+                "loc": loc + (index, "timestamp") if loc else ("timestamp",),
+                "msg": f"Value error, {TIMESTAMP_ERROR}",
+                "input": item["timestamp"]
+            })
+            continue
+        records.append(EventRecord(
+            item["topic"], item["event_id"], item["timestamp"], item["source"], item["payload"], parsed
+        ))
+    if errors:
+        raise FastValidationError(errors)
+    return records
+
+
+def validate_batch_json(raw: bytes) -> List[EventRecord]:
+    """Validasi body JSON {"events": [...]}. Raises ValidationError / FastValidationError."""
+    batch = _batch_adapter.validate_json(raw)
+    return _to_records(batch["events"], ("events",))
+
+
+def validate_event_json(raw: bytes) -> EventRecord:
+    """Validasi satu event JSON (satu baris NDJSON)."""
+    return _to_records([_event_adapter.validate_json(raw)], ())[0]
+
@@ -5,20 +5,45 @@ import os
 import time
 import logging
 from datetime import datetime
-from typing import Optional, List
+from typing import Literal, Optional, List
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Depends, Query, status
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
+import zlib
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import text
+
+from pydantic import ValidationError
 
 from app.models import (
-    EventModel, BatchEventModel, StatsResponse, 
-    EventResponse, ProcessedEvent, Stats
+    EventModel, BatchEventModel, StatsResponse, EventResponse, TimeseriesResponse, TopicStatsResponse
 )
-from app.database import get_db, init_db, update_stats_atomic
+from app.database import DB_MODE, SessionLocal, engine, init_db
+from app.async_database import AsyncSessionLocal, dispose_async_engine
 from app.consumer import consumer
+from app.queries import (
+    fetch_events, fetch_events_async, fetch_stats, fetch_stats_async, decode_cursor,
+    parse_payload_filter, encode_cursor, events_after_query, events_by_keys_query
+)
+from app.cache import TTLValue
+from app.coalescer import Coalescer
+from app.ndjson import iter_ndjson_lines, LineTooLong
+from app.validation import (
+    FAST_VALIDATION, FastValidationError, validate_batch_json, validate_event_json
+)
+from app.queue import INGEST_MODE, WorkerPool, enqueue_batch, get_redis
+from app.models import PARTITIONED
+from app.partitions import PartitionMaintainer
+from app.launcher import schema_ready
+from app.metrics import MetricsMiddleware, observe_replay, render_metrics
+from app.idempotency import MAX_KEY_LENGTH, IdempotencyKeyInProgress, IdempotencyKeyReused, idempotency_keys
+from app.live import LiveTailFull, live_tail
+from app.export import ENCODERS, ExportStream, export_query, stream_export, stream_export_async
+from app.rollups import BUCKETS, fetch_timeseries, fetch_timeseries_async, time_range
+from app.topic_stats import fetch_topic_stats, fetch_topic_stats_async
+from app.profiling import RequestProfile, debug_report, profiling_enabled, reset as reset_profiling, sampler, stage
 
 # Configure logging
 logging.basicConfig(
@@ -30,19 +55,150 @@ logger = logging.getLogger(__name__)
 # Track service start time for uptime calculation
 SERVICE_START_TIME = time.time()
 
+# Batas staleness (detik) hasil GET /stats yang di-cache; 0 = selalu baca database
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "0"))
+stats_cache = TTLValue(STATS_CACHE_TTL)
+
+# POST /publish/stream: ukuran chunk yang di-flush ke consumer dan batas laporan error per baris
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+STREAM_MAX_ERROR_REPORTS = int(os.getenv("STREAM_MAX_ERROR_REPORTS", "100"))
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def run_with_session(fn, *args):
+    """Jalankan query sync dengan session baru (dipanggil dari threadpool)."""
+    with SessionLocal() as db:
+        return fn(db, *args)
+
+
+def inline_schema(model) -> dict:
+    """JSON schema model Pydantic dengan $defs di-inline (untuk openapi_extra)."""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if ref and ref.startswith("#/$defs/"):
+                return resolve(defs[ref[len("#/$defs/"):]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(item) for item in node]
+        return node
+
+    return resolve(schema)
+
+
+def validate_batch(body: bytes):
+    """
+    Validasi body /publish. FAST_VALIDATION memakai TypeAdapter + EventRecord,
+    selain itu BatchEventModel. Error dilaporkan sebagai 422 standar FastAPI.
+    """
+    try:
+        if FAST_VALIDATION:
+            return validate_batch_json(body)
+        return BatchEventModel.model_validate_json(body).events
+    except (ValidationError, FastValidationError) as e:
+        raise RequestValidationError(
+            [dict(err, loc=("body",) + tuple(err["loc"])) for err in e.errors()]
+        )
+
+
+def validate_line(line: bytes):
+    """Validasi satu baris NDJSON (lihat validate_batch)."""
+    if FAST_VALIDATION:
+        return validate_event_json(line)
+    return EventModel.model_validate_json(line)
+
+
+async def process_event_batches(batches: List[List[EventModel]]) -> List[dict]:
+    """Commit beberapa batch dalam satu transaksi pada jalur DB_MODE yang aktif."""
+    if DB_MODE == "async":
+        return await consumer.process_batches_async(batches)
+    return await run_in_threadpool(consumer.process_batches, batches)
+
+
+coalescer = Coalescer(process_event_batches)
+
+
+async def select_rows(query) -> list:
+    """Baris ORM untuk query pada jalur DB_MODE yang aktif."""
+    if DB_MODE == "async":
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(query)).scalars().all()
+    return await run_in_threadpool(run_with_session, lambda db: db.execute(query).scalars().all())
+
+
+async def fetch_live_rows(keys) -> list:
+    """Baris event yang baru di-commit untuk fan-out live tail (per chunk 1000 key)."""
+    rows = []
+    for i in range(0, len(keys), 1000):
+        rows.extend(await select_rows(events_by_keys_query(keys[i:i + 1000])))
+    return rows
+
+
+async def replay_rows(topic: Optional[str], cursor: str):
+    """Halaman event sesudah cursor (resume live tail), urut naik."""
+    page_size = min(1000, live_tail.replay_limit)
+    while True:
+        rows = await select_rows(events_after_query(topic, cursor, page_size))
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        cursor = encode_cursor(rows[-1].processed_at, rows[-1].id)
+
+
+async def process_events(events: List[EventModel], profile: Optional[RequestProfile] = None) -> dict:
+    """
+    Proses batch lewat consumer; digabung dengan request lain bila coalescing aktif.
+    Request yang dipilih sampler dijalankan di bawah cProfile (`profile`).
+    """
+    if coalescer.enabled:
+        pending = coalescer.submit(events)
+    elif DB_MODE == "async":
+        pending = consumer.process_batch_async(events)
+    elif profile is not None:
+        return await run_in_threadpool(profile.call, consumer.process_batch, events)
+    else:
+        return await run_in_threadpool(consumer.process_batch, events)
+    if profile is not None:
+        return await profile.await_(pending)
+    return await pending
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager for startup and shutdown events."""
     # Startup
     logger.info("Starting aggregator service...")
-    init_db()
+    if not schema_ready():
+        init_db()
+    if consumer.prefilter is not None:
+        with SessionLocal() as db:
+            consumer.prefilter.warm(db)
+    worker_pool = None
+    if INGEST_MODE == "queue":
+        worker_pool = WorkerPool(consumer)
+        worker_pool.start()
+    maintainer = None
+    if PARTITIONED:
+        maintainer = PartitionMaintainer(engine)
+        maintainer.start()
+    live_tail.start(fetch_live_rows, engine)
     logger.info("Aggregator service ready!")
     
     yield
     
     # Shutdown
     logger.info("Shutting down aggregator service...")
+    if worker_pool is not None:
+        worker_pool.stop()
+    if maintainer is not None:
+        maintainer.stop()
+    await coalescer.drain()
+    await live_tail.stop()
+    await dispose_async_engine()
 
 
 app = FastAPI(
@@ -51,6 +207,7 @@ app = FastAPI(
     version="1.0.0",
     lifespan=lifespan
 )
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/")
@@ -63,29 +220,91 @@ async def root():
     }
 
 
-@app.post("/publish", status_code=status.HTTP_201_CREATED)
-async def publish_events(
-    batch: BatchEventModel,
-    db: Session = Depends(get_db)
-):
+@app.post(
+    "/publish",
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": inline_schema(BatchEventModel)}}
+    }}
+)
+async def publish_events(request: Request):
     """
     Publish single or batch events to the aggregator.
     
     Events are validated and processed with idempotency guarantee.
     Duplicate events (same topic + event_id) are detected and skipped.
+    With INGEST_MODE=queue the batch is only appended to the Redis Stream
+    and the endpoint returns 202; stream workers commit it asynchronously.
     
-    Args:
-        batch: Batch of events to publish
-        db: Database session
+    Body: {"events": [EventModel, ...]} (validated by validate_batch).
+    
+    Header Idempotency-Key (opsional): respons batch yang berhasil disimpan
+    (app.idempotency) dan retry dengan key + body yang sama menerima respons
+    asli dengan header Idempotent-Replayed: true tanpa menyentuh database.
     
     Returns:
         Processing results with counts
     """
+    body = await request.body()
+    key = request.headers.get("Idempotency-Key")
+    if key is None or not idempotency_keys.enabled:
+        return await publish_body(body)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"
+        )
+
+    async def handler():
+        response = await publish_body(body)
+        if not isinstance(response, Response):
+            response = JSONResponse(status_code=status.HTTP_201_CREATED, content=response)
+        return response.status_code, response.body
+
     try:
-        logger.info(f"Received batch of {len(batch.events)} events")
+        entry, replayed = await idempotency_keys.execute(key, body, handler)
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except IdempotencyKeyInProgress as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e), headers={"Retry-After": "1"})
+    headers = {}
+    if replayed:
+        observe_replay()
+        headers["Idempotent-Replayed"] = "true"
+    return Response(content=entry["body"], status_code=entry["status"], media_type="application/json",
+                    headers=headers)
+
+
+async def publish_body(body: bytes):
+    """Validasi + publish_batch untuk satu body /publish."""
+    profile = sampler.start("/publish")
+    try:
+        with stage("validate"):
+            events = profile.call(validate_batch, body) if profile is not None else validate_batch(body)
+        return await publish_batch(events, profile)
+    finally:
+        sampler.finish(profile)
+
+
+async def publish_batch(events: List[EventModel], profile: Optional[RequestProfile]):
+    """Bagian /publish setelah validasi: antrekan (INGEST_MODE=queue) atau commit."""
+    try:
+        logger.debug(f"Received batch of {len(events)} events")
+        
+        if INGEST_MODE == "queue":
+            message_id = await run_in_threadpool(enqueue_batch, get_redis(), events)
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={
+                    "status": "accepted",
+                    "message": f"Queued {len(events)} events",
+                    "details": {"received": len(events), "message_id": message_id}
+                }
+            )
         
         # Process batch with idempotency
-        result = consumer.process_batch(batch.events)
+        result = await process_events(events, profile)
         
         return {
             "status": "success",
@@ -101,50 +320,147 @@ async def publish_events(
         )
 
 
+@app.post("/publish/stream", status_code=status.HTTP_201_CREATED)
+async def publish_stream(request: Request):
+    """
+    Bulk ingestion of newline-delimited JSON events (one event per line).
+    
+    The body may be gzip-encoded (Content-Encoding: gzip). Lines are parsed
+    and validated incrementally and flushed to the consumer every
+    STREAM_CHUNK_SIZE events, so memory stays constant regardless of body
+    size. Invalid lines are skipped and reported with their line number.
+    
+    Returns:
+        Aggregated processing counts and per-line errors
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in NDJSON_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content-Type must be one of {', '.join(NDJSON_CONTENT_TYPES)}"
+        )
+    encoding = request.headers.get("content-encoding", "identity").strip().lower()
+    if encoding not in ("identity", "gzip"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Content-Encoding must be gzip or identity"
+        )
+    
+    totals = {"received": 0, "processed": 0, "duplicates": 0, "errors": 0}
+    error_lines = []
+    chunk: List[EventModel] = []
+    
+    async def flush():
+        if INGEST_MODE == "queue":
+            await run_in_threadpool(enqueue_batch, get_redis(), chunk)
+            totals["received"] += len(chunk)
+        else:
+            result = await process_events(chunk)
+            for key in ("received", "processed", "duplicates"):
+                totals[key] += result[key]
+        chunk.clear()
+    
+    try:
+        async for line_no, line in iter_ndjson_lines(request.stream(), gzip=encoding == "gzip"):
+            if not line.strip():
+                continue
+            try:
+                chunk.append(validate_line(line))
+            except (ValidationError, FastValidationError) as e:
+                totals["errors"] += 1
+                if len(error_lines) < STREAM_MAX_ERROR_REPORTS:
+                    error_lines.append({
+                        "line": line_no,
+                        "errors": [
+                            {"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()
+                        ]
+                    })
+                continue
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                await flush()
+        if chunk:
+            await flush()
+    except zlib.error as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid gzip body: {e}")
+    except LineTooLong as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error streaming events: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process events after {totals['received']} committed: {str(e)}"
+        )
+    
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED if INGEST_MODE == "queue" else status.HTTP_201_CREATED,
+        content={
+            "status": "success" if not totals["errors"] else "partial",
+            "message": f"Processed {totals['processed']} events, skipped {totals['duplicates']} duplicates, "
+                       f"rejected {totals['errors']} invalid lines",
+            "details": dict(totals, error_lines=error_lines)
+        }
+    )
+
+
 @app.get("/events", response_model=List[EventResponse])
 async def get_events(
+    response: Response,
     topic: Optional[str] = Query(None, description="Filter by topic"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of events to return"),
-    offset: int = Query(0, ge=0, description="Number of events to skip"),
-    db: Session = Depends(get_db)
+    offset: int = Query(0, ge=0, description="Number of events to skip (compatibility mode)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    where: Optional[List[str]] = Query(
+        None, description="Payload containment filter key:value (repeatable, dotted keys for nesting)"
+    )
 ):
     """
     Get list of processed events with optional topic filtering.
     
+    Pagination is keyset-based: pass the X-Next-Cursor header of the previous
+    page as `cursor`. `offset` is kept for compatibility but cannot be combined
+    with `cursor`.
+    
+    `where=user_id:42` keeps events whose payload contains {"user_id": 42}
+    (JSONB @>, served by the optional GIN index).
+    
     Args:
         topic: Optional topic filter
         limit: Maximum number of events to return (1-1000)
         offset: Number of events to skip for pagination
-        db: Database session
+        cursor: Position after which the next page starts
+        where: Payload containment filters
     
     Returns:
         List of processed events
     """
     try:
-        query = db.query(ProcessedEvent)
-        
-        if topic:
-            query = query.filter(ProcessedEvent.topic == topic)
-        
-        events = query.order_by(ProcessedEvent.processed_at.desc()) \
-                     .limit(limit) \
-                     .offset(offset) \
-                     .all()
-        
-        # Convert to response model
-        result = []
-        for event in events:
-            result.append({
-                "id": event.id,
-                "topic": event.topic,
-                "event_id": event.event_id,
-                "timestamp": event.timestamp.isoformat(),
-                "source": event.source,
-                "payload": event.payload,
-                "processed_at": event.processed_at.isoformat()
-            })
+        payload_filter = parse_payload_filter(where)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if cursor is not None:
+        if offset:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="cursor and offset cannot be combined"
+            )
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    
+    try:
+        if DB_MODE == "async":
+            async with AsyncSessionLocal() as db:
+                result, next_page = await fetch_events_async(db, topic, limit, offset, cursor, payload_filter)
+        else:
+            result, next_page = await run_in_threadpool(
+                run_with_session, fetch_events, topic, limit, offset, cursor, payload_filter
+            )
         
-        logger.info(f"Returned {len(result)} events (topic={topic}, limit={limit}, offset={offset})")
+        if next_page:
+            response.headers["X-Next-Cursor"] = next_page
+        logger.debug(f"Returned {len(result)} events (topic={topic}, limit={limit}, offset={offset})")
         return result
         
     except Exception as e:
@@ -155,40 +471,101 @@ async def get_events(
         )
 
 
+@app.get("/events/export", response_class=StreamingResponse)
+async def export_events(
+    topic: Optional[str] = Query(None, description="Filter by topic"),
+    start: Optional[datetime] = Query(None, alias="from", description="processed_at lower bound (inclusive)"),
+    end: Optional[datetime] = Query(None, alias="to", description="processed_at upper bound (exclusive)"),
+    format: Literal["ndjson", "csv", "parquet"] = Query("ndjson", description="Output format"),
+    compress: Optional[Literal["gzip"]] = Query(None, description="gzip-compress NDJSON/CSV output")
+):
+    """
+    Export all matching events ordered by (processed_at, id).
+    
+    Rows are read through a server-side cursor and encoded as they arrive,
+    so memory stays constant regardless of the number of rows. Parquet output
+    has one row group per EXPORT_BATCH_ROWS rows and is compressed internally.
+    """
+    if compress and format == "parquet":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Parquet output is already compressed (EXPORT_PARQUET_COMPRESSION)"
+        )
+    try:
+        encoder = ENCODERS[format]()
+    except ImportError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=f"{format} export unavailable: {e}")
+    
+    stream = ExportStream(encoder, compress=compress == "gzip")
+    query = export_query(topic, start, end)
+    body = stream_export_async(stream, query) if DB_MODE == "async" else stream_export(stream, query)
+    filename = f"events.{encoder.extension}" + (".gz" if compress else "")
+    return StreamingResponse(
+        body,
+        media_type="application/gzip" if compress else encoder.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/events/stream", response_class=StreamingResponse)
+async def stream_events(
+    request: Request,
+    topic: Optional[str] = Query(None, description="Filter by topic"),
+    cursor: Optional[str] = Query(None, description="Resume after this cursor (overridden by Last-Event-ID)")
+):
+    """
+    Live tail of newly committed events as Server-Sent Events.
+    
+    Each `event` message carries an EventResponse as data and its cursor as id.
+    Reconnecting with Last-Event-ID (or ?cursor=) replays the events committed
+    after that position before switching to live delivery. Slow clients get an
+    `overflow` event and are disconnected (or a `gap` event with
+    LIVE_TAIL_SLOW_POLICY=drop_oldest).
+    """
+    resume = request.headers.get("last-event-id") or cursor
+    if resume:
+        try:
+            decode_cursor(resume)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    try:
+        subscriber = live_tail.subscribe(topic)
+    except LiveTailFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    return StreamingResponse(
+        live_tail.stream(subscriber, replay_rows(topic, resume) if resume else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/stats", response_model=StatsResponse)
-async def get_stats(db: Session = Depends(get_db)):
+async def get_stats():
     """
     Get aggregator statistics.
     
     Returns:
         Statistics including received count, unique processed, duplicates dropped,
-        number of topics, and service uptime.
+        number of topics, and service uptime. Counters may be up to
+        STATS_CACHE_TTL seconds stale.
     """
     try:
-        # Get stats from database
-        stats = db.query(Stats).first()
-        
-        if not stats:
-            # Initialize if not exists
-            stats = Stats(received=0, unique_processed=0, duplicate_dropped=0)
-            db.add(stats)
-            db.commit()
-        
-        # Count distinct topics
-        topic_count = db.query(func.count(distinct(ProcessedEvent.topic))).scalar() or 0
+        cached = stats_cache.get()
+        if cached is None:
+            if DB_MODE == "async":
+                async with AsyncSessionLocal() as db:
+                    cached = await fetch_stats_async(db)
+            else:
+                cached = await run_in_threadpool(run_with_session, fetch_stats)
+            stats_cache.set(cached)
+        result = dict(cached)
         
         # Calculate uptime
-        uptime = time.time() - SERVICE_START_TIME
-        
-        result = {
-            "received": stats.received,
-            "unique_processed": stats.unique_processed,
-            "duplicate_dropped": stats.duplicate_dropped,
-            "topics": topic_count,
-            "uptime": round(uptime, 2)
-        }
+        result["uptime"] = round(time.time() - SERVICE_START_TIME, 2)
+        if consumer.prefilter is not None:
+            result["dedup_filter"] = consumer.prefilter.stats()
         
-        logger.info(f"Stats requested: {result}")
+        logger.debug(f"Stats requested: {result}")
         return result
         
     except Exception as e:
@@ -199,8 +576,88 @@ async def get_stats(db: Session = Depends(get_db)):
         )
 
 
+@app.get("/stats/topics", response_model=List[TopicStatsResponse])
+async def get_topic_stats(
+    sort: Literal["received", "unique_processed", "duplicate_dropped", "duplicate_ratio", "last_event_at"] = Query(
+        "received", description="Counter to rank topics by (descending)"
+    ),
+    limit: int = Query(20, ge=1, le=1000, description="Number of topics to return")
+):
+    """
+    Per-topic counters, top `limit` topics by `sort`.
+    
+    Counters are maintained in the ingest transaction (one row per topic per
+    batch), so a topic with a high `duplicate_ratio` points at a producer that
+    is retrying. `last_event_at` is the server time of the last batch that
+    contained the topic.
+    """
+    if DB_MODE == "async":
+        async with AsyncSessionLocal() as db:
+            return await fetch_topic_stats_async(db, sort, limit)
+    return await run_in_threadpool(run_with_session, fetch_topic_stats, sort, limit)
+
+
+@app.get("/stats/timeseries", response_model=TimeseriesResponse)
+async def get_timeseries(
+    topic: Optional[str] = Query(None, description="Filter by topic"),
+    source: Optional[str] = Query(None, description="Filter by source"),
+    start: Optional[datetime] = Query(None, alias="from", description="Event timestamp lower bound (inclusive)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Event timestamp upper bound (exclusive)"),
+    bucket: Literal["1m", "5m", "15m", "1h", "6h", "1d"] = Query("1m", description="Bucket size")
+):
+    """
+    Unique event counts per bucket, topic and source.
+    
+    Served from the per-minute rollup maintained at ingest time; coarser
+    buckets are summed from the minutes in range, so latency depends on the
+    range and not on the number of stored events. `from` is rounded down and
+    `to` up to bucket boundaries (UTC); buckets without events are omitted.
+    """
+    bucket_seconds = BUCKETS[bucket]
+    try:
+        start, end = time_range(bucket_seconds, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if DB_MODE == "async":
+        async with AsyncSessionLocal() as db:
+            points = await fetch_timeseries_async(db, topic, source, start, end, bucket_seconds)
+    else:
+        points = await run_in_threadpool(
+            run_with_session, fetch_timeseries, topic, source, start, end, bucket_seconds
+        )
+    return {"bucket": bucket, "start": start, "end": end, "points": points}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus exposition format (lihat app.metrics)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/debug/stages", include_in_schema=False)
+async def debug_stages():
+    """
+    Ringkasan durasi per stage ingest (rolling window) dan capture cProfile
+    request lambat. 404 bila PROFILE_STAGES dan PROFILE_SAMPLE_RATE nonaktif.
+    """
+    if not profiling_enabled():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    return debug_report()
+
+
+@app.delete("/debug/stages", status_code=status.HTTP_204_NO_CONTENT, include_in_schema=False)
+async def reset_debug_stages():
+    """Kosongkan ringkasan stage dan capture."""
+    if not profiling_enabled():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    reset_profiling()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check():
     """
     Health check endpoint with database connectivity test.
     
@@ -209,7 +666,11 @@ async def health_check(db: Session = Depends(get_db)):
     """
     try:
         # Test database connection
-        db.execute("SELECT 1")
+        if DB_MODE == "async":
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("SELECT 1"))
+        else:
+            await run_in_threadpool(run_with_session, lambda db: db.execute(text("SELECT 1")))
         db_status = "healthy"
     except Exception as e:
         logger.error(f"Database health check failed: {e}")
@@ -229,6 +690,5 @@ async def health_check(db: Session = Depends(get_db)):
 
 
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.getenv("PORT", "8080"))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    from app.launcher import main
+    main()
@@ -9,10 +9,13 @@ import sys
 import time
 import uuid
 import random
+import asyncio
 import logging
 import requests
+import httpx
+from collections import deque
 from datetime import datetime, timezone
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 
 # Configure logging
 logging.basicConfig(
@@ -26,10 +29,90 @@ AGGREGATOR_URL = os.getenv("AGGREGATOR_URL", "http://localhost:8080/publish")
 NUM_EVENTS = int(os.getenv("NUM_EVENTS", "25000"))
 DUPLICATION_RATE = float(os.getenv("DUPLICATION_RATE", "0.30"))  # 30% duplicates
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "100"))
-DELAY_MS = int(os.getenv("DELAY_MS", "10"))  # Delay between batches
+DELAY_MS = int(os.getenv("DELAY_MS", "10"))  # Delay between batches (sync mode)
+# "sync" = satu batch per waktu dengan DELAY_MS, "async" = httpx + batch konkuren
+PUBLISH_MODE = os.getenv("PUBLISH_MODE", "sync").lower()
+if PUBLISH_MODE not in ("sync", "async"):
+    raise ValueError(f"PUBLISH_MODE must be 'sync' or 'async', got {PUBLISH_MODE!r}")
+IN_FLIGHT = int(os.getenv("IN_FLIGHT", "8"))  # Batch konkuren maksimum (async mode)
+TARGET_RATE = float(os.getenv("TARGET_RATE", "0"))  # Target events/sec, 0 = tanpa batas
+MAX_RETRIES = 5
+# Duplikat diambil dari reservoir event unik terbaru (memori tidak bergantung NUM_EVENTS)
+DUP_RESERVOIR_SIZE = int(os.getenv("DUP_RESERVOIR_SIZE", "10000"))
+# Jarak duplikat (dalam event unik ke belakang): "uniform" atas reservoir atau "geometric"
+DUP_DISTANCE = os.getenv("DUP_DISTANCE", "uniform").lower()
+if DUP_DISTANCE not in ("uniform", "geometric"):
+    raise ValueError(f"DUP_DISTANCE must be 'uniform' or 'geometric', got {DUP_DISTANCE!r}")
+DUP_DISTANCE_MEAN = float(os.getenv("DUP_DISTANCE_MEAN", "100"))
 TOPICS = ["user.login", "user.logout", "order.created", "order.completed", "payment.processed"]
 
 
+def idempotency_headers(key: Optional[str]) -> Dict[str, str]:
+    return {"Idempotency-Key": key} if key else {}
+
+
+class TokenBucket:
+    """Token bucket untuk membatasi laju pengiriman (token = event)."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        """Tunggu sampai `amount` token tersedia (FIFO lewat lock)."""
+        async with self.lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class LatencyHistogram:
+    """Kumpulan latency request (detik) dengan ringkasan percentile."""
+
+    BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+    def __init__(self):
+        self.samples: List[float] = []
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> float:
+        """Nearest-rank percentile dalam detik (0.0 bila belum ada sampel)."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def summary(self) -> List[str]:
+        """Baris laporan: percentile lalu jumlah sampel per bucket."""
+        lines = [
+            f"Latency p50: {self.percentile(50) * 1000:.1f} ms, "
+            f"p95: {self.percentile(95) * 1000:.1f} ms, "
+            f"p99: {self.percentile(99) * 1000:.1f} ms ({len(self.samples)} requests)"
+        ]
+        lower = 0
+        for upper in self.BUCKETS_MS + [None]:
+            count = sum(
+                1 for s in self.samples
+                if s * 1000 >= lower and (upper is None or s * 1000 < upper)
+            )
+            label = f"{lower}-{upper} ms" if upper is not None else f">= {lower} ms"
+            lines.append(f"  {label:>14s}: {count}")
+            lower = upper
+        return lines
+
+
 class EventPublisher:
     """Event publisher with duplication simulation."""
     
@@ -38,7 +121,9 @@ class EventPublisher:
         self.published_count = 0
         self.duplicate_count = 0
         self.error_count = 0
-        self.unique_events = []  # Store events for duplication
+        self.unique_count = 0
+        self.latency = LatencyHistogram()
+        self.session = requests.Session()  # Keep-alive antar batch
         
     def generate_event(self, topic: str, event_id: str = None) -> Dict[str, Any]:
         """Generate a single event with random data."""
@@ -58,21 +143,27 @@ class EventPublisher:
             }
         }
     
-    def publish_batch(self, events: List[Dict[str, Any]]) -> bool:
+    def publish_batch(self, events: List[Dict[str, Any]], idempotency_key: Optional[str] = None) -> bool:
         """
         Publish a batch of events to the aggregator.
         
+        Retry batch yang sama memakai idempotency_key yang sama agar aggregator
+        menjawab dari cache respons tanpa memproses (dan menghitung) ulang.
+        
         Returns:
             True if successful, False otherwise
         """
         try:
-            response = requests.post(
+            start = time.perf_counter()
+            response = self.session.post(
                 self.target_url,
                 json={"events": events},
+                headers=idempotency_headers(idempotency_key),
                 timeout=10
             )
+            self.latency.record(time.perf_counter() - start)
             
-            if response.status_code in [200, 201]:
+            if response.status_code in [200, 201, 202]:
                 logger.info(f"✓ Published batch of {len(events)} events")
                 self.published_count += len(events)
                 return True
@@ -86,6 +177,66 @@ class EventPublisher:
             self.error_count += len(events)
             return False
     
+    def pick_duplicate(self, reservoir: deque, distance: str = DUP_DISTANCE,
+                       mean: float = DUP_DISTANCE_MEAN) -> Dict[str, Any]:
+        """Pilih event dari reservoir; jarak 0 = event unik paling baru."""
+        if distance == "geometric":
+            offset = min(int(random.expovariate(1 / mean)), len(reservoir) - 1)
+        else:
+            offset = random.randrange(len(reservoir))
+        return reservoir[-1 - offset]
+    
+    def iter_events(self, num_events: int, duplication_rate: float,
+                    reservoir_size: int = DUP_RESERVOIR_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Generate events lazily: unique events plus duplicates (copies with a
+        fresh timestamp to simulate retries) drawn from a bounded reservoir of
+        recent unique events.
+        
+        Counts are exact (same split as before). At every step the next event is
+        a duplicate with probability remaining_duplicates / remaining_events,
+        which yields the same uniformly random interleaving as shuffling the
+        full list, without materializing it.
+        """
+        num_unique = int(num_events * (1 - duplication_rate))
+        remaining_duplicates = num_events - num_unique
+        remaining_unique = num_unique
+        reservoir: deque = deque(maxlen=max(1, reservoir_size))
+        
+        logger.info(f"Generating {num_unique} unique events and {remaining_duplicates} duplicates "
+                    f"(reservoir {reservoir.maxlen}, {DUP_DISTANCE} distance)")
+        
+        while remaining_unique or remaining_duplicates:
+            remaining = remaining_unique + remaining_duplicates
+            if reservoir and random.random() * remaining < remaining_duplicates:
+                duplicate_event = self.pick_duplicate(reservoir).copy()
+                # Update timestamp to simulate retry
+                duplicate_event["timestamp"] = datetime.now(timezone.utc).isoformat()
+                remaining_duplicates -= 1
+                self.duplicate_count += 1
+                yield duplicate_event
+            elif remaining_unique:
+                event = self.generate_event(random.choice(TOPICS))
+                reservoir.append(event)
+                remaining_unique -= 1
+                self.unique_count += 1
+                yield event
+            else:
+                # Tidak ada event unik untuk diduplikasi (duplication_rate = 1.0)
+                break
+    
+    @staticmethod
+    def iter_batches(events: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """Group an event stream into batches, yielding each as soon as it fills."""
+        batch = []
+        for event in events:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
     def run(self, num_events: int, duplication_rate: float, batch_size: int):
         """
         Run the publisher to generate and send events.
@@ -100,77 +251,142 @@ class EventPublisher:
         logger.info(f"Topics: {', '.join(TOPICS)}")
         
         start_time = time.time()
+        batches = self.iter_batches(self.iter_events(num_events, duplication_rate), batch_size)
         
-        # Calculate unique vs duplicate events
-        num_unique = int(num_events * (1 - duplication_rate))
-        num_duplicates = num_events - num_unique
-        
-        logger.info(f"Generating {num_unique} unique events and {num_duplicates} duplicates")
-        
-        # Generate unique events first
-        for i in range(num_unique):
-            topic = random.choice(TOPICS)
-            event = self.generate_event(topic)
-            self.unique_events.append(event)
-        
-        # Create list of all events (unique + duplicates)
-        all_events = self.unique_events.copy()
-        
-        # Add duplicates by randomly selecting from unique events
-        for _ in range(num_duplicates):
-            duplicate_event = random.choice(self.unique_events).copy()
-            # Update timestamp to simulate retry
-            duplicate_event["timestamp"] = datetime.now(timezone.utc).isoformat()
-            all_events.append(duplicate_event)
-            self.duplicate_count += 1
-        
-        # Shuffle to mix unique and duplicates
-        random.shuffle(all_events)
-        
-        logger.info(f"Total events to publish: {len(all_events)} ({num_unique} unique + {num_duplicates} duplicates)")
-        
-        # Publish in batches
-        for i in range(0, len(all_events), batch_size):
-            batch = all_events[i:i + batch_size]
-            
+        # Publish batches as they are generated
+        for batch_no, batch in enumerate(batches):
             # Wait for aggregator to be ready (retry on startup)
             retries = 0
-            max_retries = 5
-            while retries < max_retries:
-                if self.publish_batch(batch):
+            idempotency_key = str(uuid.uuid4())
+            while retries < MAX_RETRIES:
+                if self.publish_batch(batch, idempotency_key):
                     break
                 else:
                     retries += 1
-                    if retries < max_retries:
+                    if retries < MAX_RETRIES:
                         wait_time = 2 ** retries  # Exponential backoff
-                        logger.warning(f"Retrying in {wait_time}s... (attempt {retries}/{max_retries})")
+                        logger.warning(f"Retrying in {wait_time}s... (attempt {retries}/{MAX_RETRIES})")
                         time.sleep(wait_time)
             
             # Small delay between batches
-            if DELAY_MS > 0 and i + batch_size < len(all_events):
+            if DELAY_MS > 0:
                 time.sleep(DELAY_MS / 1000.0)
             
             # Progress update every 10 batches
-            if (i // batch_size) % 10 == 0 and i > 0:
-                logger.info(f"Progress: {i}/{len(all_events)} events published")
-        
-        elapsed_time = time.time() - start_time
+            if batch_no % 10 == 0 and batch_no > 0:
+                logger.info(f"Progress: {self.published_count}/{num_events} events published")
         
-        # Final statistics
+        self.log_summary(duplication_rate, time.time() - start_time)
+    
+    def log_summary(self, duplication_rate: float, elapsed_time: float):
+        """Log final statistics and the latency histogram."""
+        num_duplicates = self.duplicate_count
+        total_events = self.unique_count + num_duplicates
         logger.info("=" * 60)
         logger.info("PUBLISHING COMPLETE")
         logger.info("=" * 60)
         logger.info(f"Total events sent: {self.published_count}")
-        logger.info(f"Unique events: {num_unique}")
+        logger.info(f"Unique events: {self.unique_count}")
         logger.info(f"Duplicate events: {num_duplicates}")
         logger.info(f"Expected duplication rate: {duplication_rate * 100:.1f}%")
-        logger.info(f"Actual duplication rate: {(num_duplicates / len(all_events)) * 100:.1f}%")
+        logger.info(f"Actual duplication rate: {(num_duplicates / max(total_events, 1)) * 100:.1f}%")
         logger.info(f"Errors: {self.error_count}")
         logger.info(f"Time taken: {elapsed_time:.2f} seconds")
-        logger.info(f"Throughput: {self.published_count / elapsed_time:.2f} events/sec")
+        logger.info(f"Throughput: {self.published_count / max(elapsed_time, 1e-9):.2f} events/sec")
+        for line in self.latency.summary():
+            logger.info(line)
         logger.info("=" * 60)
 
 
+class AsyncEventPublisher(EventPublisher):
+    """
+    Publisher async: satu httpx.AsyncClient dengan pool keep-alive, hingga
+    `in_flight` batch berjalan bersamaan, dan laju dibatasi token bucket.
+    Simulasi duplikasi dan retry/backoff sama dengan EventPublisher.
+    """
+    
+    def __init__(self, target_url: str, in_flight: int = IN_FLIGHT, target_rate: float = TARGET_RATE,
+                 transport: Optional[httpx.AsyncBaseTransport] = None, backoff_base: float = 2.0):
+        super().__init__(target_url)
+        self.in_flight = max(1, in_flight)
+        self.target_rate = target_rate
+        self.transport = transport
+        self.backoff_base = backoff_base
+    
+    async def publish_batch_async(self, client: httpx.AsyncClient, events: List[Dict[str, Any]],
+                                  idempotency_key: Optional[str] = None) -> bool:
+        """Async counterpart of publish_batch."""
+        try:
+            start = time.perf_counter()
+            response = await client.post(self.target_url, json={"events": events},
+                                         headers=idempotency_headers(idempotency_key))
+            self.latency.record(time.perf_counter() - start)
+            
+            if response.status_code in [200, 201, 202]:
+                logger.debug(f"✓ Published batch of {len(events)} events")
+                self.published_count += len(events)
+                return True
+            logger.error(f"✗ Failed to publish batch: {response.status_code} - {response.text}")
+            self.error_count += len(events)
+            return False
+        
+        except httpx.HTTPError as e:
+            logger.error(f"✗ Request failed: {e}")
+            self.error_count += len(events)
+            return False
+    
+    async def _send_with_retry(self, client: httpx.AsyncClient, batch: List[Dict[str, Any]],
+                               bucket: Optional[TokenBucket]):
+        retries = 0
+        idempotency_key = str(uuid.uuid4())
+        while retries < MAX_RETRIES:
+            if bucket is not None:
+                await bucket.acquire(len(batch))
+            if await self.publish_batch_async(client, batch, idempotency_key):
+                return
+            retries += 1
+            if retries < MAX_RETRIES:
+                wait_time = self.backoff_base ** retries  # Exponential backoff
+                logger.warning(f"Retrying in {wait_time}s... (attempt {retries}/{MAX_RETRIES})")
+                await asyncio.sleep(wait_time)
+    
+    async def publish_all(self, batches: Iterable[List[Dict[str, Any]]], batch_size: int):
+        """
+        Kirim semua batch lewat `in_flight` worker yang berbagi satu client.
+        Worker menarik batch langsung dari iterator (generator tidak pernah
+        dieksekusi bersamaan karena semua worker berjalan di satu event loop).
+        """
+        batches = iter(batches)
+        sent = 0
+        bucket = None
+        if self.target_rate > 0:
+            bucket = TokenBucket(self.target_rate, capacity=max(self.target_rate, batch_size))
+        limits = httpx.Limits(max_connections=self.in_flight, max_keepalive_connections=self.in_flight)
+        
+        async with httpx.AsyncClient(limits=limits, timeout=10, transport=self.transport) as client:
+            async def worker():
+                nonlocal sent
+                for batch in batches:
+                    await self._send_with_retry(client, batch, bucket)
+                    sent += 1
+                    if sent % 10 == 0:
+                        logger.info(f"Progress: {self.published_count} events published")
+            
+            await asyncio.gather(*(worker() for _ in range(self.in_flight)))
+    
+    async def run_async(self, num_events: int, duplication_rate: float, batch_size: int):
+        """Async counterpart of run()."""
+        logger.info(f"Starting async publisher: {num_events} events, {duplication_rate*100}% duplication, "
+                    f"{self.in_flight} in-flight batches, target rate "
+                    f"{self.target_rate if self.target_rate > 0 else 'unlimited'} events/sec")
+        logger.info(f"Target URL: {self.target_url}")
+        
+        start_time = time.time()
+        batches = self.iter_batches(self.iter_events(num_events, duplication_rate), batch_size)
+        await self.publish_all(batches, batch_size)
+        self.log_summary(duplication_rate, time.time() - start_time)
+
+
 def main():
     """Main entry point for the publisher service."""
     logger.info("Event Publisher Service Starting...")
@@ -179,16 +395,22 @@ def main():
     logger.info("Waiting for aggregator service to be ready...")
     time.sleep(5)
     
-    # Create publisher
-    publisher = EventPublisher(AGGREGATOR_URL)
-    
     # Run publishing
     try:
-        publisher.run(
-            num_events=NUM_EVENTS,
-            duplication_rate=DUPLICATION_RATE,
-            batch_size=BATCH_SIZE
-        )
+        if PUBLISH_MODE == "async":
+            publisher = AsyncEventPublisher(AGGREGATOR_URL)
+            asyncio.run(publisher.run_async(
+                num_events=NUM_EVENTS,
+                duplication_rate=DUPLICATION_RATE,
+                batch_size=BATCH_SIZE
+            ))
+        else:
+            publisher = EventPublisher(AGGREGATOR_URL)
+            publisher.run(
+                num_events=NUM_EVENTS,
+                duplication_rate=DUPLICATION_RATE,
+                batch_size=BATCH_SIZE
+            )
     except KeyboardInterrupt:
         logger.info("Publisher interrupted by user")
     except Exception as e:
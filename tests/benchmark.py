@@ -0,0 +1,331 @@
+"""
+Benchmark harness ingest: skenario terparametrisasi, warmup, pengulangan, hasil
+JSON dan regression gate terhadap baseline.
+
+    python -m tests.benchmark --throwaway-pg --baseline tests/benchmark_baseline.json
+    python -m tests.benchmark --scenario dup-60 --repeats 5 --output results.json
+    python -m tests.benchmark --throwaway-pg --update-baseline
+
+Setiap run: TRUNCATE tabel aktif, body JSON per batch disiapkan lebih dulu, lalu
+`concurrency` thread menjalankan validasi (jalur /publish, mengikuti
+FAST_VALIDATION) + IdempotentConsumer.process_batch. Jumlah event unik yang
+tersimpan dicek setiap run agar skenario benar-benar mengukur yang dimaksud.
+
+--throwaway-pg menjalankan initdb + pg_ctl di direktori sementara (binary dari
+PG_BIN, `pg_config --bindir`, atau PATH) sehingga benchmark bisa berjalan
+offline tanpa menyentuh DATABASE_URL; --throwaway-sqlite memakai file SQLite
+sementara (backend edge) untuk perbandingan throughput. Modul app baru di-import setelah
+DATABASE_URL ditetapkan.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+# Penurunan events/sec atau kenaikan p99 di atas fraksi ini dianggap regresi
+DEFAULT_TOLERANCE = 0.2
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    events: int = 20000
+    batch_size: int = 500
+    dup_rate: float = 0.3
+    payload_bytes: int = 64
+    concurrency: int = 4
+    topics: int = 5
+
+
+SCENARIOS = [
+    Scenario("baseline"),
+    Scenario("batch-10", events=5000, batch_size=10),
+    Scenario("batch-2000", batch_size=2000),
+    Scenario("dup-0", dup_rate=0.0),
+    Scenario("dup-60", dup_rate=0.6),
+    Scenario("payload-4k", events=10000, payload_bytes=4096),
+    Scenario("concurrency-1", concurrency=1),
+    Scenario("concurrency-16", concurrency=16),
+    Scenario("topics-1000", topics=1000),
+]
+
+
+def generate_batches(scenario: Scenario, run_id: str, seed: int = 0) -> List[bytes]:
+    """
+    Body JSON /publish untuk satu run. Tepat round(events * dup_rate) event
+    adalah duplikat dari event unik sebelumnya (urutan diacak deterministik).
+    """
+    rng = random.Random(seed)
+    duplicates = round(scenario.events * scenario.dup_rate)
+    unique = scenario.events - duplicates
+    filler = "x" * scenario.payload_bytes
+    events = [{
+        "topic": f"bench.{i % scenario.topics}",
+        "event_id": f"{run_id}-{i}",
+        "timestamp": "2025-12-24T00:00:00Z",
+        "source": "benchmark",
+        "payload": {"index": i, "data": filler}
+    } for i in range(unique)]
+    events += [dict(events[rng.randrange(unique)]) for _ in range(duplicates)] if unique else []
+    rng.shuffle(events)
+    return [
+        json.dumps({"events": events[i:i + scenario.batch_size]}).encode()
+        for i in range(0, len(events), scenario.batch_size)
+    ]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def median(values: List[float]) -> float:
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def reset_tables():
+    from sqlalchemy import text
+    from app.database import SessionLocal
+    from app.models import active_tables
+    from app.consumer import consumer
+
+    from app.database import IS_SQLITE
+
+    with SessionLocal() as session:
+        if IS_SQLITE:
+            for table in reversed(active_tables()):
+                session.execute(text(f"DELETE FROM {table.name}"))
+        else:
+            tables = ", ".join(table.name for table in active_tables())
+            session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+        session.commit()
+    consumer.reset_caches()
+
+
+def count_events() -> int:
+    from sqlalchemy import text
+    from app.database import SessionLocal
+
+    with SessionLocal() as session:
+        return session.execute(text("SELECT count(*) FROM processed_events")).scalar()
+
+
+def run_once(scenario: Scenario, run_id: str, seed: int = 0) -> Dict[str, float]:
+    """Satu run terukur pada tabel kosong."""
+    from app.consumer import consumer
+    from app.models import BatchEventModel
+    from app.validation import FAST_VALIDATION, validate_batch_json
+
+    bodies = generate_batches(scenario, run_id, seed)
+    reset_tables()
+    latencies: List[float] = []
+
+    def publish(body: bytes):
+        started = time.perf_counter()
+        events = validate_batch_json(body) if FAST_VALIDATION else BatchEventModel.model_validate_json(body).events
+        consumer.process_batch(events)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=scenario.concurrency) as pool:
+        list(pool.map(publish, bodies))
+    elapsed = time.perf_counter() - started
+
+    expected = scenario.events - round(scenario.events * scenario.dup_rate)
+    stored = count_events()
+    if stored != expected:
+        raise RuntimeError(f"{scenario.name}: expected {expected} unique events, found {stored}")
+    return {
+        "seconds": elapsed,
+        "events_per_sec": scenario.events / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000
+    }
+
+
+def run_scenario(scenario: Scenario, repeats: int = 3, warmup: int = 1) -> Dict[str, Any]:
+    """Warmup (tidak dihitung) lalu `repeats` run; ringkasan memakai median."""
+    for i in range(warmup):
+        run_once(scenario, f"warmup{i}", seed=i)
+    runs = [run_once(scenario, f"run{i}", seed=i) for i in range(repeats)]
+    return {
+        "params": asdict(scenario),
+        "runs": runs,
+        "events_per_sec": median([run["events_per_sec"] for run in runs]),
+        "p99_ms": median([run["p99_ms"] for run in runs])
+    }
+
+
+def environment_info() -> Dict[str, Any]:
+    from sqlalchemy import text
+    from app.database import DB_DIALECT, DB_MODE, IS_SQLITE, SessionLocal
+    from app.validation import FAST_VALIDATION
+
+    with SessionLocal() as session:
+        server_version = session.execute(text("SELECT sqlite_version()" if IS_SQLITE else "SHOW server_version")).scalar()
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "backend": DB_DIALECT,
+        "sqlite" if IS_SQLITE else "postgres": server_version,
+        "cpus": os.cpu_count(),
+        "db_mode": DB_MODE,
+        "fast_validation": FAST_VALIDATION
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Daftar regresi terhadap baseline; skenario tanpa baseline dilewati."""
+    regressions = []
+    for name, result in results["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if reference is None:
+            continue
+        if result["params"] != reference["params"]:
+            regressions.append(f"{name}: parameters differ from baseline, update the baseline")
+            continue
+        floor = reference["events_per_sec"] * (1 - tolerance)
+        if result["events_per_sec"] < floor:
+            regressions.append(f"{name}: {result['events_per_sec']:.0f} events/sec < "
+                               f"{floor:.0f} (baseline {reference['events_per_sec']:.0f} - {tolerance:.0%})")
+        ceiling = reference["p99_ms"] * (1 + tolerance)
+        if result["p99_ms"] > ceiling:
+            regressions.append(f"{name}: p99 {result['p99_ms']:.1f} ms > "
+                               f"{ceiling:.1f} ms (baseline {reference['p99_ms']:.1f} + {tolerance:.0%})")
+    return regressions
+
+
+def find_pg_bin() -> str:
+    """Direktori binary PostgreSQL: PG_BIN, `pg_config --bindir`, atau PATH."""
+    candidates = [os.getenv("PG_BIN")]
+    if shutil.which("pg_config"):
+        try:
+            candidates.append(subprocess.run(["pg_config", "--bindir"], capture_output=True,
+                                             text=True, check=True).stdout.strip())
+        except subprocess.CalledProcessError:
+            pass
+    if shutil.which("initdb"):
+        candidates.append(os.path.dirname(shutil.which("initdb")))
+    for candidate in candidates:
+        if candidate and os.path.exists(os.path.join(candidate, "initdb")):
+            return candidate
+    raise RuntimeError("PostgreSQL binaries not found; set PG_BIN to the directory containing initdb")
+
+
+class ThrowawayPostgres:
+    """initdb + pg_ctl di direktori sementara; dihapus saat keluar."""
+
+    def __init__(self, pg_bin: Optional[str] = None):
+        self.pg_bin = pg_bin or find_pg_bin()
+        self.workdir: Optional[str] = None
+        self.port = 0
+
+    def _bin(self, name: str) -> str:
+        return os.path.join(self.pg_bin, name)
+
+    def __enter__(self) -> str:
+        self.workdir = tempfile.mkdtemp(prefix="aggregator-bench-")
+        data_dir = os.path.join(self.workdir, "data")
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        subprocess.run([self._bin("initdb"), "-D", data_dir, "-U", "bench", "--auth=trust", "-E", "UTF8"],
+                       check=True, capture_output=True)
+        subprocess.run([
+            self._bin("pg_ctl"), "-D", data_dir, "-l", os.path.join(self.workdir, "postgres.log"), "-w",
+            "-o", f"-p {self.port} -k {self.workdir} -c listen_addresses=127.0.0.1", "start"
+        ], check=True, capture_output=True)
+        subprocess.run([self._bin("createdb"), "-h", "127.0.0.1", "-p", str(self.port), "-U", "bench", "bench"],
+                       check=True, capture_output=True)
+        return f"postgresql://bench@127.0.0.1:{self.port}/bench"
+
+    def __exit__(self, *exc):
+        subprocess.run([self._bin("pg_ctl"), "-D", os.path.join(self.workdir, "data"), "-m", "fast", "stop"],
+                       capture_output=True)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def run_suite(scenarios: List[Scenario], repeats: int, warmup: int) -> Dict[str, Any]:
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    from app.database import init_db
+
+    init_db()
+    results = {"environment": environment_info(), "scenarios": {}}
+    for scenario in scenarios:
+        result = run_scenario(scenario, repeats=repeats, warmup=warmup)
+        results["scenarios"][scenario.name] = result
+        print(f"{scenario.name:16s} {result['events_per_sec']:9.0f} events/sec  p99 {result['p99_ms']:8.1f} ms")
+    reset_tables()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Aggregator ingest benchmark")
+    parser.add_argument("--scenario", action="append", choices=[s.name for s in SCENARIOS],
+                        help="Run only these scenarios (repeatable)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--throwaway-pg", action="store_true",
+                        help="Run against a temporary initdb cluster instead of DATABASE_URL")
+    parser.add_argument("--throwaway-sqlite", action="store_true",
+                        help="Run against a temporary SQLite database instead of DATABASE_URL")
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+    if args.throwaway_pg:
+        with ThrowawayPostgres() as url:
+            os.environ["DATABASE_URL"] = url
+            results = run_suite(scenarios, args.repeats, args.warmup)
+    elif args.throwaway_sqlite:
+        with tempfile.TemporaryDirectory(prefix="aggregator-bench-") as workdir:
+            os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+            results = run_suite(scenarios, args.repeats, args.warmup)
+    else:
+        results = run_suite(scenarios, args.repeats, args.warmup)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    backend = results["environment"]["backend"]
+    if baseline.get("environment", {}).get("backend", "postgresql") != backend:
+        print(f"Baseline {args.baseline} was not recorded on {backend}; comparison skipped")
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
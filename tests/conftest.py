@@ -1,7 +1,13 @@
 import pytest
 import os
 import sys
-from sqlalchemy import text
+import time
+import socket
+import tempfile
+import subprocess
+import httpx
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 
 # Fix Path agar import app.models dkk tidak error
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -9,21 +15,126 @@ SRC_DIR = os.path.join(BASE_DIR, 'aggregator', 'src')
 if SRC_DIR not in sys.path:
     sys.path.insert(0, SRC_DIR)
 
-from app.database import SessionLocal, engine, Base
+from app.database import DATABASE_URL, IS_SQLITE, SessionLocal, init_db
+from app.models import active_tables
+from app.consumer import consumer
+import main
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_db():
-    Base.metadata.create_all(bind=engine)
+    # create_all + migrasi (+ partisi bila PARTITIONING aktif)
+    init_db()
     yield
 
 @pytest.fixture(autouse=True)
 def db_cleaner():
     """Membersihkan database sebelum setiap fungsi test."""
     with SessionLocal() as session:
-        # Gunakan TRUNCATE CASCADE agar semua tabel bersih dan ID mulai dari 1 lagi
-        # Sesuaikan nama tabel dengan yang ada di database Anda
-        session.execute(text("TRUNCATE TABLE processed_events, stats RESTART IDENTITY CASCADE;"))
+        if IS_SQLITE:
+            # SQLite tidak punya TRUNCATE; rowid mulai dari 1 lagi bila tabel kosong
+            for table in reversed(active_tables()):
+                session.execute(text(f"DELETE FROM {table.name}"))
+        else:
+            # Gunakan TRUNCATE CASCADE agar semua tabel bersih dan ID mulai dari 1 lagi
+            # Sesuaikan nama tabel dengan yang ada di database Anda
+            tables = ", ".join(table.name for table in active_tables())
+            session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE;"))
         # Masukkan row stats awal agar update_stats_atomic selalu menemukan ID=1
         session.execute(text("INSERT INTO stats (id, received, unique_processed, duplicate_dropped) VALUES (1, 0, 0, 0)"))
         session.commit()
-    yield
\ No newline at end of file
+    # State in-process (pre-filter, registry topic, cache /stats, Idempotency-Key) ikut dikosongkan setelah TRUNCATE
+    consumer.reset_caches()
+    main.stats_cache.clear()
+    main.idempotency_keys.store.clear()
+    yield
+
+
+@pytest.fixture
+def run_in_scratch_db():
+    """
+    Jalankan file-file test di proses pytest terpisah dengan database baru dan env
+    tambahan. Dipakai untuk layout yang ditentukan saat import (PARTITIONING,
+    DEDUP_KEY_STORE). Mengembalikan stdout pytest anak.
+    """
+    url = make_url(DATABASE_URL)
+    admin = create_engine(url, isolation_level="AUTOCOMMIT")
+    created = []
+
+    def run(*test_files, suffix, **env):
+        scratch = url.set(database=f"{url.database}_{suffix}")
+        try:
+            with admin.connect() as conn:
+                conn.execute(text(f'DROP DATABASE IF EXISTS "{scratch.database}" WITH (FORCE)'))
+                conn.execute(text(f'CREATE DATABASE "{scratch.database}"'))
+        except Exception as e:
+            pytest.skip(f"cannot create scratch database: {e}")
+        created.append(scratch.database)
+        return run_child_pytest(test_files, DATABASE_URL=scratch.render_as_string(hide_password=False), **env)
+
+    yield run
+    with admin.connect() as conn:
+        for database in created:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)'))
+    admin.dispose()
+
+
+@pytest.fixture
+def run_on_sqlite(tmp_path):
+    """Jalankan file-file test di proses pytest terpisah dengan backend SQLite baru."""
+    def run(*test_files, **env):
+        return run_child_pytest(test_files, DATABASE_URL=f"sqlite:///{tmp_path / 'aggregator.db'}", **env)
+    return run
+
+
+def run_child_pytest(test_files, **env) -> str:
+    """pytest anak dengan env tambahan; gagal dengan output anak bila ada test yang gagal."""
+    child_env = dict(os.environ, **env)
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", *test_files],
+        cwd=BASE_DIR, env=child_env, capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode == 0, result.stdout[-4000:] + result.stderr[-2000:]
+    return result.stdout
+
+
+@pytest.fixture
+def launch_aggregator():
+    """
+    Jalankan `python -m app.launcher` (init_db + WORKERS proses uvicorn) di port
+    bebas terhadap database test. Mengembalikan (base_url, proses); proses yang
+    masih hidup dimatikan saat teardown.
+    """
+    processes = []
+
+    def launch(**env):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        child_env = dict(os.environ, HOST="127.0.0.1", PORT=str(port), **env)
+        # Log ke file, bukan PIPE: access log yang tidak dibaca akan memblokir server
+        log = tempfile.TemporaryFile(mode="w+")
+        process = subprocess.Popen(
+            [sys.executable, "-m", "app.launcher"], cwd=SRC_DIR, env=child_env,
+            stdout=log, stderr=subprocess.STDOUT, text=True
+        )
+        processes.append((process, log))
+        base_url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                log.seek(0)
+                pytest.fail(log.read()[-4000:])
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    return base_url, process
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        pytest.fail("aggregator launcher did not become healthy")
+
+    yield launch
+    for process, log in processes:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        log.close()
@@ -5,6 +5,8 @@ These tests verify the correct behavior of all REST API endpoints
 including validation, filtering, and response formats.
 """
 import pytest
+import gzip
+import json
 from fastapi.testclient import TestClient
 import sys
 import os
@@ -248,3 +250,153 @@ class TestAPI:
         assert received_delta == 15, "Should receive 15 total events"
         assert unique_delta == 10, "Should process 10 unique events"
         assert dup_delta == 5, "Should drop 5 duplicates"
+    
+    def test_get_events_cursor_pagination(self):
+        """Test keyset pagination walks every event exactly once."""
+        for batch in range(3):
+            events = {
+                "events": [
+                    {
+                        "topic": "test.cursor",
+                        "event_id": f"cursor-{batch}-{i}",
+                        "timestamp": "2025-12-24T00:00:00Z",
+                        "source": "api-test",
+                        "payload": {"index": i}
+                    }
+                    for i in range(9)
+                ]
+            }
+            client.post("/publish", json=events)
+        
+        seen = []
+        cursor = None
+        while True:
+            params = {"topic": "test.cursor", "limit": 10}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/events", params=params)
+            assert response.status_code == 200
+            seen.extend(event["id"] for event in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        
+        assert len(seen) == 27
+        assert len(set(seen)) == 27
+        assert seen == sorted(seen, reverse=True)
+    
+    def test_get_events_invalid_cursor(self):
+        """Test that malformed cursors and cursor+offset are rejected."""
+        assert client.get("/events?cursor=not-a-cursor").status_code == 400
+        
+        client.post("/publish", json={"events": [{
+            "topic": "test.cursor.bad", "event_id": f"bad-{i}",
+            "timestamp": "2025-12-24T00:00:00Z", "source": "api-test", "payload": {}
+        } for i in range(2)]})
+        cursor = client.get("/events?limit=1").headers["X-Next-Cursor"]
+        assert client.get(f"/events?cursor={cursor}&offset=5").status_code == 400
+    
+    def test_get_events_payload_filter(self):
+        """Test ?where= payload containment filters (typed, nested, combined)."""
+        client.post("/publish", json={"events": [{
+            "topic": "test.where", "event_id": f"where-{i}",
+            "timestamp": "2025-12-24T00:00:00Z", "source": "api-test",
+            "payload": {"user_id": i % 3, "action": "login" if i % 2 else "logout", "meta": {"region": "id"}}
+        } for i in range(12)]})
+        
+        response = client.get("/events", params={"where": "user_id:1"})
+        assert response.status_code == 200
+        assert sorted(e["event_id"] for e in response.json()) == \
+            sorted(f"where-{i}" for i in range(12) if i % 3 == 1)
+        
+        # String "1" does not match the integer 1
+        assert client.get("/events", params={"where": 'user_id:"1"'}).json() == []
+        
+        response = client.get("/events", params=[
+            ("where", "user_id:1"), ("where", "action:login"), ("where", "meta.region:id")
+        ])
+        assert sorted(e["event_id"] for e in response.json()) == ["where-1", "where-7"]
+        
+        for bad in ("user_id", ":1", "meta..region:x"):
+            assert client.get("/events", params={"where": bad}).status_code == 400
+    
+    def test_stats_cache_staleness_bound(self, monkeypatch):
+        """Test that cached /stats counters are reused within the TTL only."""
+        now = [1000.0]
+        monkeypatch.setattr(main, "stats_cache", main.TTLValue(5.0, clock=lambda: now[0]))
+        event = {"topic": "test.cache", "timestamp": "2025-12-24T00:00:00Z",
+                 "source": "api-test", "payload": {}}
+        
+        client.post("/publish", json={"events": [dict(event, event_id="cache-1")]})
+        first = client.get("/stats").json()
+        client.post("/publish", json={"events": [dict(event, event_id="cache-2")]})
+        
+        assert client.get("/stats").json()["received"] == first["received"]
+        now[0] += 5.1
+        assert client.get("/stats").json()["received"] == first["received"] + 1
+    
+    def test_publish_stream_ndjson(self):
+        """Test NDJSON streaming ingestion with chunk flushing and per-line errors."""
+        lines = [
+            json.dumps({
+                "topic": "test.stream",
+                "event_id": f"stream-{i % 40}",  # 10 duplicates
+                "timestamp": "2025-12-24T00:00:00Z",
+                "source": "api-test",
+                "payload": {"index": i}
+            })
+            for i in range(50)
+        ]
+        lines.insert(3, '{"topic": "test.stream", "event_id": "bad"}')
+        lines.insert(7, "not json")
+        body = ("\n".join(lines) + "\n").encode()
+        
+        # Body dikirim dalam potongan kecil agar baris terpotong di batas chunk
+        def body_chunks():
+            for i in range(0, len(body), 97):
+                yield body[i:i + 97]
+        
+        response = client.post(
+            "/publish/stream",
+            content=body_chunks(),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 201
+        details = response.json()["details"]
+        assert details["received"] == 50
+        assert details["processed"] == 40
+        assert details["duplicates"] == 10
+        assert details["errors"] == 2
+        assert [err["line"] for err in details["error_lines"]] == [4, 8]
+    
+    def test_publish_stream_gzip(self):
+        """Test gzip-encoded NDJSON body."""
+        body = "\n".join(
+            json.dumps({
+                "topic": "test.stream.gzip",
+                "event_id": f"gz-{i}",
+                "timestamp": "2025-12-24T00:00:00Z",
+                "source": "api-test",
+                "payload": {}
+            })
+            for i in range(2500)
+        ).encode()
+        
+        response = client.post(
+            "/publish/stream",
+            content=gzip.compress(body),
+            headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+        )
+        assert response.status_code == 201
+        assert response.json()["details"]["processed"] == 2500
+        
+        response = client.post(
+            "/publish/stream",
+            content=b"not gzip",
+            headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+        )
+        assert response.status_code == 400
+    
+    def test_publish_stream_rejects_wrong_content_type(self):
+        response = client.post("/publish/stream", json={"events": []})
+        assert response.status_code == 415
@@ -0,0 +1,69 @@
+"""
+Tests for the benchmark harness (tests/benchmark.py).
+
+These tests verify scenario generation, the baseline regression gate and
+a small end-to-end run against the test database. The full benchmark runs
+through `python -m tests.benchmark`.
+"""
+import json
+
+import pytest
+
+from tests.benchmark import SCENARIOS, Scenario, compare, generate_batches, run_scenario
+
+
+def result(name, events_per_sec, p99_ms, **params):
+    return {"scenarios": {name: {
+        "params": dict(vars(Scenario(name, **params))),
+        "events_per_sec": events_per_sec,
+        "p99_ms": p99_ms
+    }}}
+
+
+class TestScenarioGeneration:
+    def test_exact_duplicate_rate_and_batching(self):
+        scenario = Scenario("t", events=1000, batch_size=300, dup_rate=0.25, payload_bytes=128, topics=7)
+        bodies = generate_batches(scenario, "run0")
+        events = [event for body in bodies for event in json.loads(body)["events"]]
+        assert [len(json.loads(body)["events"]) for body in bodies] == [300, 300, 300, 100]
+        keys = {(event["topic"], event["event_id"]) for event in events}
+        assert len(events) == 1000
+        assert len(keys) == 750
+        assert {event["topic"] for event in events} == {f"bench.{i}" for i in range(7)}
+        assert all(len(event["payload"]["data"]) == 128 for event in events)
+
+    def test_generation_is_deterministic(self):
+        scenario = Scenario("t", events=200, batch_size=50)
+        assert generate_batches(scenario, "run0", seed=1) == generate_batches(scenario, "run0", seed=1)
+        assert generate_batches(scenario, "run0", seed=1) != generate_batches(scenario, "run0", seed=2)
+
+    def test_scenario_names_unique(self):
+        assert len({scenario.name for scenario in SCENARIOS}) == len(SCENARIOS)
+
+
+class TestRegressionGate:
+    def test_within_tolerance(self):
+        baseline = result("baseline", 1000, 50)
+        assert compare(result("baseline", 850, 59), baseline, tolerance=0.2) == []
+
+    def test_throughput_and_latency_regressions(self):
+        baseline = result("baseline", 1000, 50)
+        regressions = compare(result("baseline", 700, 70), baseline, tolerance=0.2)
+        assert len(regressions) == 2
+        assert "events/sec" in regressions[0]
+        assert "p99" in regressions[1]
+
+    def test_changed_parameters_and_missing_baseline(self):
+        baseline = result("baseline", 1000, 50)
+        assert "parameters differ" in compare(result("baseline", 1000, 50, batch_size=10), baseline)[0]
+        assert compare(result("new-scenario", 1, 10_000), baseline) == []
+
+
+class TestHarnessRun:
+    def test_small_scenario_end_to_end(self):
+        scenario = Scenario("smoke", events=400, batch_size=50, dup_rate=0.5, concurrency=4)
+        summary = run_scenario(scenario, repeats=2, warmup=1)
+        assert len(summary["runs"]) == 2
+        assert summary["params"]["dup_rate"] == 0.5
+        assert summary["events_per_sec"] > 0
+        assert all(run["p99_ms"] >= run["p50_ms"] for run in summary["runs"])
@@ -0,0 +1,111 @@
+"""
+Tests for the write-behind coalescer.
+
+These tests verify that concurrent /publish batches are committed in a
+single transaction, that each caller gets its own counts, and that a
+caller only returns after its events are committed.
+"""
+import asyncio
+import sys
+import os
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+from app.models import EventModel
+from app.consumer import consumer
+from app.coalescer import Coalescer
+from app.database import get_db_session, read_stats_totals
+
+
+def make_event(event_id, topic="test.coalesce"):
+    return EventModel(
+        topic=topic,
+        event_id=event_id,
+        timestamp="2025-12-24T00:00:00Z",
+        source="coalesce-test",
+        payload={}
+    )
+
+
+def committed_count():
+    with get_db_session() as db:
+        return db.execute(text("SELECT count(*) FROM processed_events")).scalar()
+
+
+class TestCoalescer:
+    """Test suite for request coalescing."""
+
+    def test_per_caller_counts_in_one_transaction(self):
+        """Cross-caller duplicates are credited to the first caller only."""
+        calls = []
+
+        async def flush(batches):
+            calls.append(len(batches))
+            return await asyncio.to_thread(consumer.process_batches, batches)
+
+        async def scenario():
+            coalescer = Coalescer(flush, max_wait_ms=50, max_events=1000)
+            return await asyncio.gather(
+                coalescer.submit([make_event("a"), make_event("b")]),
+                coalescer.submit([make_event("b"), make_event("c"), make_event("c")]),
+                coalescer.submit([make_event("a")]),
+            )
+
+        first, second, third = asyncio.run(scenario())
+        assert calls == [3]
+        assert (first["processed"], first["duplicates"]) == (2, 0)
+        assert (second["processed"], second["duplicates"]) == (1, 2)
+        assert (third["processed"], third["duplicates"]) == (0, 1)
+
+        with get_db_session() as db:
+            totals = read_stats_totals(db)
+        assert totals == {"received": 6, "unique_processed": 3, "duplicate_dropped": 3}
+
+    def test_caller_returns_only_after_commit(self):
+        """Each resolved caller observes its events already committed."""
+        observed = []
+
+        async def flush(batches):
+            return await asyncio.to_thread(consumer.process_batches, batches)
+
+        async def caller(coalescer, i):
+            await coalescer.submit([make_event(f"durable-{i}")])
+            observed.append(await asyncio.to_thread(committed_count))
+
+        async def scenario():
+            coalescer = Coalescer(flush, max_wait_ms=20, max_events=1000)
+            await asyncio.gather(*(caller(coalescer, i) for i in range(10)))
+            return coalescer.flushes
+
+        flushes = asyncio.run(scenario())
+        assert flushes == 1
+        assert observed == [10] * 10
+
+    def test_max_events_flushes_without_waiting(self):
+        """Reaching max_events commits immediately instead of waiting max_wait."""
+        async def flush(batches):
+            return [{"received": len(b), "processed": len(b), "duplicates": 0, "errors": 0} for b in batches]
+
+        async def scenario():
+            coalescer = Coalescer(flush, max_wait_ms=10_000, max_events=3)
+            return await asyncio.wait_for(asyncio.gather(
+                coalescer.submit([1, 2]), coalescer.submit([3])
+            ), timeout=1)
+
+        assert [r["received"] for r in asyncio.run(scenario())] == [2, 1]
+
+    def test_failed_commit_fails_every_caller(self):
+        """If the shared transaction fails, no caller reports success."""
+        async def flush(batches):
+            raise RuntimeError("database unavailable")
+
+        async def scenario():
+            coalescer = Coalescer(flush, max_wait_ms=5)
+            return await asyncio.gather(
+                coalescer.submit([1]), coalescer.submit([2]), return_exceptions=True
+            )
+
+        results = asyncio.run(scenario())
+        assert all(isinstance(r, RuntimeError) for r in results)
@@ -8,7 +8,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', '
 
 from app.models import EventModel, ProcessedEvent, Stats
 from app.consumer import IdempotentConsumer
-from app.database import get_db_session, update_stats_atomic
+from app.database import get_db_session, update_stats_atomic, read_stats_totals
+from app.queries import topic_count_query
 
 class TestConcurrency:
     
@@ -59,8 +60,7 @@ class TestConcurrency:
         for t in threads: t.join()
 
         with get_db_session() as db:
-            stats = db.query(Stats).first()
-            assert stats.received >= 200
+            assert read_stats_totals(db)["received"] >= 200
 
     def test_no_lost_updates(self):
         """
@@ -77,8 +77,8 @@ class TestConcurrency:
         for t in threads: t.join()
 
         with get_db_session() as db:
-            stats = db.query(Stats).first()
-            assert stats.received == 150, f"Diharapkan 150, dapat {stats.received}"
+            received = read_stats_totals(db)["received"]
+            assert received == 150, f"Diharapkan 150, dapat {received}"
 
     def test_concurrent_different_events(self):
         consumer = IdempotentConsumer()
@@ -95,4 +95,49 @@ class TestConcurrency:
         for t in threads: t.join()
 
         with get_db_session() as db:
-            assert db.query(ProcessedEvent).filter_by(topic="test.unique").count() == 20
\ No newline at end of file
+            assert db.query(ProcessedEvent).filter_by(topic="test.unique").count() == 20
+    def test_overlapping_batches_reverse_order_no_deadlock(self):
+        """Batch konkuren dengan key overlap dalam urutan terbalik tidak boleh deadlock."""
+        consumer = IdempotentConsumer()
+        events = [EventModel(
+            topic="test.overlap", event_id=f"evt-{i}",
+            timestamp="2025-12-24T00:00:00Z", source="test-source", payload={"index": i}
+        ) for i in range(2000)]
+        results, errors = [], []
+
+        def worker(batch):
+            try:
+                results.append(consumer.process_batch(batch))
+            except Exception as e:
+                errors.append(e)
+
+        for _ in range(3):
+            threads = [threading.Thread(target=worker, args=(events,)),
+                       threading.Thread(target=worker, args=(list(reversed(events)),))]
+            for t in threads: t.start()
+            for t in threads: t.join()
+
+        assert errors == []
+        assert sum(r["processed"] for r in results) == 2000
+        with get_db_session() as db:
+            assert db.query(ProcessedEvent).filter_by(topic="test.overlap").count() == 2000
+
+    def test_topic_registry_exact_under_concurrent_inserts(self):
+        """Registry topic tetap eksak saat banyak batch konkuren memperkenalkan topic yang sama."""
+        def worker(worker_id: int):
+            consumer = IdempotentConsumer()
+            events = [EventModel(
+                topic=f"test.registry.{(worker_id + i) % 7}",
+                event_id=f"evt-{worker_id}-{i}",
+                timestamp="2025-12-24T00:00:00Z", source="test-source", payload={}
+            ) for i in range(20)]
+            consumer.process_batch(events)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(12)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        with get_db_session() as db:
+            assert db.execute(topic_count_query()).scalar() == 7
+            distinct = db.query(ProcessedEvent.topic).distinct().count()
+            assert distinct == 7
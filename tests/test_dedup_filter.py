@@ -0,0 +1,117 @@
+"""
+Tests for the in-process dedup pre-filter (Bloom filter + LRU).
+
+The pre-filter may only skip an insert when the exact LRU confirms the key,
+so it must never cause a unique event to be dropped.
+"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+import main
+from fastapi.testclient import TestClient
+from app.models import EventModel, ProcessedEvent
+from app.consumer import IdempotentConsumer
+from app.database import get_db_session, SessionLocal
+from app.dedup_filter import DedupPreFilter, ScalableBloomFilter, RecentKeyCache
+
+
+def make_events(topic, ids, payload=None):
+    return [
+        EventModel(
+            topic=topic,
+            event_id=f"evt-{i}",
+            timestamp="2025-12-24T00:00:00Z",
+            source="filter-test",
+            payload=payload or {"index": i}
+        )
+        for i in ids
+    ]
+
+
+class TestDedupFilter:
+    """Test suite for the dedup pre-filter."""
+
+    def test_scalable_bloom_has_no_false_negatives(self):
+        """Every added key is reported as present, also after the filter grows."""
+        bloom = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+        keys = [("topic", f"evt-{i}") for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        assert len(bloom.filters) > 1
+        assert all(key in bloom for key in keys)
+        false_positives = sum(("topic", f"other-{i}") in bloom for i in range(10000))
+        assert false_positives / 10000 < 0.05
+
+    def test_lru_evicts_oldest_key(self):
+        cache = RecentKeyCache(maxsize=2)
+        cache.add(("t", "a"))
+        cache.add(("t", "b"))
+        cache.confirm(("t", "a"))
+        cache.add(("t", "c"))
+
+        assert cache.confirm(("t", "a"))
+        assert not cache.confirm(("t", "b"))
+
+    def test_known_duplicates_skip_database(self):
+        """A retried batch is answered from the LRU with the same counts."""
+        consumer = IdempotentConsumer(prefilter=DedupPreFilter(lru_size=1000, bloom_capacity=1000))
+
+        first = consumer.process_batch(make_events("test.filter", range(10)))
+        second = consumer.process_batch(make_events("test.filter", range(5, 15)))
+
+        assert first["processed"] == 10
+        assert second["processed"] == 5
+        assert second["duplicates"] == 5
+        assert consumer.prefilter.stats()["hits"] == 5
+
+    def test_bloom_positive_without_lru_confirmation_still_inserts(self, monkeypatch):
+        """A Bloom false positive must never drop a unique event."""
+        prefilter = DedupPreFilter(lru_size=1000, bloom_capacity=1000)
+        monkeypatch.setattr(ScalableBloomFilter, "__contains__", lambda self, key: True)
+        consumer = IdempotentConsumer(prefilter=prefilter)
+
+        result = consumer.process_batch(make_events("test.filter.fp", range(20)))
+
+        assert result["processed"] == 20
+        assert prefilter.stats()["hits"] == 0
+        assert prefilter.stats()["bloom_unconfirmed"] == 20
+
+    def test_evicted_key_falls_back_to_constraint(self):
+        """Keys evicted from the LRU are still deduplicated by uq_topic_event_id."""
+        consumer = IdempotentConsumer(prefilter=DedupPreFilter(lru_size=5, bloom_capacity=1000))
+        consumer.process_batch(make_events("test.filter.evict", range(20)))
+
+        result = consumer.process_batch(make_events("test.filter.evict", range(20)))
+
+        assert result["processed"] == 0
+        assert result["duplicates"] == 20
+        with get_db_session() as db:
+            assert db.query(ProcessedEvent).filter_by(topic="test.filter.evict").count() == 20
+
+    def test_warm_loads_committed_keys(self):
+        IdempotentConsumer().process_batch(make_events("test.filter.warm", range(10)))
+
+        prefilter = DedupPreFilter(lru_size=1000, bloom_capacity=1000)
+        with SessionLocal() as db:
+            assert prefilter.warm(db) == 10
+
+        candidates, skipped = prefilter.split(make_events("test.filter.warm", range(12)))
+        assert skipped == 10
+        assert len(candidates) == 2
+
+    def test_stats_exposes_hit_counters(self, monkeypatch):
+        monkeypatch.setattr(main.consumer, "prefilter", DedupPreFilter(lru_size=100, bloom_capacity=100))
+        client = TestClient(main.app)
+        batch = {"events": [e.model_dump() for e in make_events("test.filter.api", range(3))]}
+        client.post("/publish", json=batch)
+        client.post("/publish", json=batch)
+
+        data = client.get("/stats").json()
+        assert data["dedup_filter"]["hits"] == 3
+        assert data["dedup_filter"]["misses"] == 3
+        assert data["dedup_filter"]["hit_ratio"] == 0.5
+        assert data["duplicate_dropped"] == 3
@@ -12,7 +12,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
 
 from app.models import EventModel, ProcessedEvent
-from app.consumer import IdempotentConsumer
+from app.consumer import IdempotentConsumer, BULK_INSERT_CHUNK_SIZE
 from app.database import get_db_session
 
 
@@ -196,3 +196,57 @@ class TestDeduplication:
         assert result['processed'] == 20, "Should process 20 unique events"
         assert result['duplicates'] == 20, "Should detect 20 duplicates"
         assert result['duplicates'] / result['received'] == 0.5, "50% duplication rate"
+
+    def test_bulk_batch_across_chunks_first_occurrence_wins(self):
+        """Batch lebih besar dari satu chunk: dedup dalam batch & antar batch, payload dari event pertama."""
+        consumer = IdempotentConsumer()
+        unique_count = BULK_INSERT_CHUNK_SIZE + 250
+
+        # Duplikat dalam batch diletakkan setelah kemunculan pertama
+        events = [
+            EventModel(
+                topic="test.chunk",
+                event_id=f"evt-{i}",
+                timestamp="2025-12-24T00:00:00Z",
+                source="test-source",
+                payload={"index": i, "occurrence": "first"}
+            )
+            for i in range(unique_count)
+        ]
+        events.extend(
+            EventModel(
+                topic="test.chunk",
+                event_id=f"evt-{i}",
+                timestamp="2025-12-24T00:01:00Z",
+                source="test-source",
+                payload={"index": i, "occurrence": "second"}
+            )
+            for i in range(0, unique_count, 7)
+        )
+        in_batch_duplicates = len(events) - unique_count
+
+        result = consumer.process_batch(events)
+        assert result['received'] == len(events)
+        assert result['processed'] == unique_count
+        assert result['duplicates'] == in_batch_duplicates
+
+        # Batch kedua: sebagian sudah tersimpan, sebagian baru
+        batch2 = [
+            EventModel(
+                topic="test.chunk",
+                event_id=f"evt-{i}",
+                timestamp="2025-12-24T00:02:00Z",
+                source="test-source",
+                payload={"index": i, "occurrence": "retry"}
+            )
+            for i in range(unique_count - 10, unique_count + 5)
+        ]
+        result2 = consumer.process_batch(batch2)
+        assert result2['processed'] == 5
+        assert result2['duplicates'] == 10
+
+        with get_db_session() as db:
+            rows = db.query(ProcessedEvent).filter_by(topic="test.chunk").all()
+            assert len(rows) == unique_count + 5
+            stored = {row.event_id: row.payload["occurrence"] for row in rows}
+            assert all(stored[f"evt-{i}"] == "first" for i in range(unique_count))
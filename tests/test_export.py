@@ -0,0 +1,126 @@
+"""
+Tests for the bulk export endpoint (GET /events/export).
+
+These tests verify the NDJSON, CSV and Parquet encodings, incremental gzip
+output, the topic/time-range filters and parameter validation.
+"""
+import io
+import csv
+import sys
+import os
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+import main
+from app.models import EventModel
+from app.consumer import IdempotentConsumer
+from app.export import ExportStream, NDJSONEncoder, ParquetEncoder, export_query, stream_export
+
+client = TestClient(main.app)
+
+
+def publish(topic, count, prefix="evt"):
+    IdempotentConsumer().process_batch([EventModel(
+        topic=topic,
+        event_id=f"{prefix}-{i}",
+        timestamp="2025-12-24T07:00:00+07:00",
+        source="export-test",
+        payload={"n": i, "tags": ["a", "b"]}
+    ) for i in range(count)])
+
+
+class TestExport:
+    """Formats, compression and filters of GET /events/export."""
+
+    def test_ndjson(self):
+        publish("test.export", 3)
+        publish("test.other", 2)
+        response = client.get("/events/export", params={"topic": "test.export"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.headers["content-disposition"] == 'attachment; filename="events.ndjson"'
+
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["event_id"] for row in rows] == ["evt-0", "evt-1", "evt-2"]
+        assert rows[1]["payload"] == {"n": 1, "tags": ["a", "b"]}
+        assert datetime.fromisoformat(rows[0]["timestamp"]) == datetime(2025, 12, 24, tzinfo=timezone.utc)
+        assert len(client.get("/events/export").text.splitlines()) == 5
+
+    def test_csv_gzip(self):
+        publish("test.export", 4)
+        response = client.get("/events/export", params={"format": "csv", "compress": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/gzip"
+        assert response.headers["content-disposition"] == 'attachment; filename="events.csv.gz"'
+
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode())))
+        assert [row["event_id"] for row in rows] == [f"evt-{i}" for i in range(4)]
+        assert json.loads(rows[3]["payload"]) == {"n": 3, "tags": ["a", "b"]}
+
+    def test_parquet_row_groups(self):
+        publish("test.export", 25)
+        stream = ExportStream(ParquetEncoder())
+        body = b"".join(stream_export(stream, export_query("test.export", None, None), batch_rows=10))
+
+        parquet = pq.ParquetFile(io.BytesIO(body))
+        # Satu row group per partisi cursor
+        assert parquet.metadata.num_row_groups == 3
+        table = parquet.read()
+        # Batch di-insert terurut per (topic, event_id); processed_at sama, id menentukan urutan
+        assert table.column("event_id").to_pylist() == sorted(f"evt-{i}" for i in range(25))
+        assert table.schema.field("processed_at").type.tz == "UTC"
+        assert json.loads(table.column("payload")[0].as_py()) == {"n": 0, "tags": ["a", "b"]}
+
+        response = client.get("/events/export", params={"format": "parquet"})
+        assert response.status_code == 200
+        assert pq.read_table(io.BytesIO(response.content)).num_rows == 25
+
+    def test_time_range(self):
+        publish("test.export", 3, prefix="old")
+        boundary = datetime.now(timezone.utc)
+        publish("test.export", 2, prefix="new")
+
+        def event_ids(**params):
+            response = client.get("/events/export", params=params)
+            assert response.status_code == 200
+            return [json.loads(line)["event_id"] for line in response.text.splitlines()]
+
+        assert event_ids(**{"to": boundary.isoformat()}) == ["old-0", "old-1", "old-2"]
+        assert event_ids(**{"from": boundary.isoformat()}) == ["new-0", "new-1"]
+        # Waktu tanpa offset dianggap UTC; offset lain dikonversi
+        naive = boundary.replace(tzinfo=None).isoformat()
+        assert event_ids(**{"from": naive, "topic": "test.export"}) == ["new-0", "new-1"]
+        shifted = boundary.astimezone(timezone(timedelta(hours=7))).isoformat()
+        assert event_ids(**{"to": shifted}) == ["old-0", "old-1", "old-2"]
+        assert event_ids(**{"from": (boundary + timedelta(hours=1)).isoformat()}) == []
+
+    def test_chunks_follow_cursor_partitions(self):
+        publish("test.export", 12)
+        stream = ExportStream(NDJSONEncoder(), compress=True)
+        chunks = [chunk for chunk in stream_export(stream, export_query(None, None, None), batch_rows=5)]
+        assert len(gzip.decompress(b"".join(chunks)).splitlines()) == 12
+
+    @pytest.mark.parametrize("params,status_code", [
+        ({"format": "parquet", "compress": "gzip"}, 400),
+        ({"format": "xml"}, 422),
+        ({"compress": "brotli"}, 422),
+        ({"from": "yesterday"}, 422),
+    ])
+    def test_invalid_parameters(self, params, status_code):
+        assert client.get("/events/export", params=params).status_code == status_code
+
+    def test_empty_export(self):
+        assert client.get("/events/export").content == b""
+        response = client.get("/events/export", params={"format": "csv"})
+        assert response.text.splitlines() == [
+            "id,topic,event_id,timestamp,source,payload,processed_at"
+        ]
+        response = client.get("/events/export", params={"format": "parquet"})
+        assert pq.read_table(io.BytesIO(response.content)).num_rows == 0
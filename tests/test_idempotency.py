@@ -0,0 +1,170 @@
+"""
+Tests for Idempotency-Key handling on POST /publish.
+
+These tests verify that a retried batch is answered from the response cache
+without touching the database or the stats counters, that a key reused with
+a different body is rejected, that concurrent retries join the original
+request, and the LRU/TTL and Redis stores.
+"""
+import sys
+import os
+import json
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+import main
+from app.database import get_db_session, read_stats_totals
+from app.idempotency import (
+    IdempotencyKeyInProgress, IdempotencyKeyReused, IdempotencyKeys, MemoryStore, RedisStore
+)
+
+client = TestClient(main.app)
+
+
+def batch(*event_ids, topic="test.idempotency"):
+    return {"events": [{
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": "2025-12-24T00:00:00Z",
+        "source": "idempotency-test",
+        "payload": {}
+    } for event_id in event_ids]}
+
+
+def publish(body, key):
+    return client.post("/publish", content=json.dumps(body), headers={"Idempotency-Key": key})
+
+
+def received():
+    with get_db_session() as db:
+        return read_stats_totals(db)["received"]
+
+
+class TestPublishEndpoint:
+    """Idempotency-Key on POST /publish."""
+
+    def test_retry_replays_original_response(self, monkeypatch):
+        body = batch("evt-1", "evt-2", "evt-1")
+        first = publish(body, "batch-1")
+        assert first.status_code == 201
+        assert first.json()["details"]["duplicates"] == 1
+        assert "Idempotent-Replayed" not in first.headers
+
+        # Retry tidak boleh sampai ke consumer
+        async def fail(*args, **kwargs):
+            raise AssertionError("replayed batch reached the consumer")
+        monkeypatch.setattr(main, "publish_batch", fail)
+
+        retry = publish(body, "batch-1")
+        assert retry.status_code == 201
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert retry.json() == first.json()
+        assert received() == 3
+
+    def test_key_reused_with_different_body(self):
+        assert publish(batch("evt-1"), "batch-1").status_code == 201
+        response = publish(batch("evt-2"), "batch-1")
+        assert response.status_code == 422
+        assert received() == 1
+
+    def test_errors_are_not_cached(self):
+        invalid = {"events": [{"topic": "test.idempotency"}]}
+        assert publish(invalid, "batch-1").status_code == 422
+        # Key yang sama bisa dipakai lagi setelah request gagal
+        response = publish(batch("evt-1"), "batch-1")
+        assert response.status_code == 201
+        assert "Idempotent-Replayed" not in response.headers
+
+    def test_without_key_and_invalid_key(self):
+        body = batch("evt-1")
+        assert client.post("/publish", json=body).status_code == 201
+        assert client.post("/publish", json=body).json()["details"]["duplicates"] == 1
+        assert received() == 2
+        assert publish(body, "x" * 256).status_code == 400
+
+
+class TestIdempotencyKeys:
+    """Coordinator and stores without the HTTP layer."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_retries_join_original(self):
+        keys = IdempotencyKeys(MemoryStore(size=10, ttl=60), enabled=True)
+        release = asyncio.Event()
+        calls = []
+
+        async def handler():
+            calls.append(1)
+            await release.wait()
+            return 201, b'{"ok":true}'
+
+        tasks = [asyncio.create_task(keys.execute("k", b"body", handler)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert len(calls) == 1
+        assert [replayed for _, replayed in results] == [False, True, True, True, True]
+        assert all(entry["body"] == '{"ok":true}' for entry, _ in results)
+        assert not keys.in_flight
+
+    @pytest.mark.asyncio
+    async def test_failed_handler_is_retried(self):
+        keys = IdempotencyKeys(MemoryStore(size=10, ttl=60), enabled=True)
+
+        async def fail():
+            raise RuntimeError("db down")
+
+        async def succeed():
+            return 201, b"{}"
+
+        with pytest.raises(RuntimeError):
+            await keys.execute("k", b"body", fail)
+        entry, replayed = await keys.execute("k", b"body", succeed)
+        assert not replayed and entry["status"] == 201
+        assert not keys.in_flight
+
+    def test_memory_store_lru_and_ttl(self):
+        now = [0.0]
+        store = MemoryStore(size=2, ttl=10, clock=lambda: now[0])
+        store.put("a", {"n": 1})
+        store.put("b", {"n": 2})
+        assert store.get("a") == {"n": 1}
+        # "b" paling lama tidak dipakai -> dikeluarkan
+        store.put("c", {"n": 3})
+        assert store.get("b") is None
+        assert len(store) == 2
+
+        now[0] = 10.0
+        assert store.get("a") is None
+        assert store.get("c") is None
+
+    @pytest.mark.asyncio
+    async def test_redis_store_shared_between_workers(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        redis = fakeredis.FakeRedis()
+        worker_a = IdempotencyKeys(RedisStore(redis, ttl=60), enabled=True)
+        worker_b = IdempotencyKeys(RedisStore(redis, ttl=60), enabled=True)
+        release = asyncio.Event()
+
+        async def handler():
+            await release.wait()
+            return 202, b'{"status":"accepted"}'
+
+        original = asyncio.create_task(worker_a.execute("k", b"body", handler))
+        await asyncio.sleep(0.05)
+        # Worker lain melihat penanda pending
+        with pytest.raises(IdempotencyKeyInProgress):
+            await worker_b.execute("k", b"body", handler)
+        release.set()
+        entry, replayed = await original
+        assert not replayed
+
+        entry, replayed = await worker_b.execute("k", b"body", handler)
+        assert replayed and entry["status"] == 202
+        with pytest.raises(IdempotencyKeyReused):
+            await worker_b.execute("k", b"other body", handler)
+        assert 0 < redis.pttl("aggregator:idempotency:k") <= 60_000
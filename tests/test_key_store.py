@@ -0,0 +1,108 @@
+"""
+Tests for the hashed dedup key store (DEDUP_KEY_STORE=hashed).
+
+Like the partitioned layout, the key store is chosen at import time, so the
+hashed tests (and the existing dedup/concurrency suites) run in a child
+pytest process against a scratch database.
+"""
+import os
+import sys
+
+import pytest
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+from app.models import EventModel, DEDUP_KEY_STORE, DEDUP_KEY_PARTITIONS
+from app.database import engine, get_db_session
+from app.consumer import consumer
+from app.key_store import key_hash, backfill_key_hashes
+
+TESTS_DIR = os.path.dirname(__file__)
+hashed_only = pytest.mark.skipif(DEDUP_KEY_STORE != "hashed", reason="requires DEDUP_KEY_STORE=hashed")
+
+
+def make_event(event_id, topic="test.keys"):
+    return EventModel(
+        topic=topic,
+        event_id=event_id,
+        timestamp="2025-12-24T00:00:00Z",
+        source="key-store-test",
+        payload={}
+    )
+
+
+class TestKeyHash:
+    """Hash function properties, independent of the active key store."""
+
+    def test_hash_is_stable_and_unambiguous(self):
+        assert key_hash("orders", "evt-1") == key_hash("orders", "evt-1")
+        assert key_hash("orders", "evt-1") != key_hash("orders", "evt-2")
+        # Topic/event_id boundary is part of the hash input
+        assert key_hash("ab", "c") != key_hash("a", "bc")
+        assert len(key_hash("orders", "evt-1").bytes) == 16
+
+
+@pytest.mark.skipif(DEDUP_KEY_STORE == "hashed", reason="already running with the hashed key store")
+def test_hashed_key_store_in_scratch_database(run_in_scratch_db):
+    """Run this module plus the dedup and concurrency suites with DEDUP_KEY_STORE=hashed."""
+    output = run_in_scratch_db(
+        __file__,
+        os.path.join(TESTS_DIR, "test_deduplication.py"),
+        os.path.join(TESTS_DIR, "test_concurrency.py"),
+        suffix="hashed_keys", DEDUP_KEY_STORE="hashed", DEDUP_KEY_PARTITIONS="8"
+    )
+    assert " passed" in output and "skipped" in output
+
+
+@pytest.mark.skipif(DEDUP_KEY_STORE == "hashed", reason="already running with the hashed key store")
+def test_hashed_key_store_with_time_partitions(run_in_scratch_db):
+    """Hashed keys combined with PARTITIONING=daily (retention purges hashed keys)."""
+    output = run_in_scratch_db(
+        __file__, os.path.join(TESTS_DIR, "test_partitions.py"),
+        suffix="hashed_partitioned", DEDUP_KEY_STORE="hashed", PARTITIONING="daily"
+    )
+    assert " passed" in output
+
+
+@hashed_only
+class TestHashedKeyStore:
+    """processed_events is append-only; event_key_hashes decides what is new."""
+
+    def test_schema(self):
+        """Key table is hash-partitioned; processed_events has no uq_topic_event_id."""
+        with get_db_session() as db:
+            partitions = db.execute(text("""
+                SELECT count(*) FROM pg_inherits i
+                JOIN pg_class parent ON parent.oid = i.inhparent
+                WHERE parent.relname = 'event_key_hashes'
+            """)).scalar()
+            constraint = db.execute(text(
+                "SELECT 1 FROM pg_constraint WHERE conname = 'uq_topic_event_id'"
+            )).scalar()
+        assert partitions == DEDUP_KEY_PARTITIONS
+        assert constraint is None
+
+    def test_keys_spread_over_partitions(self):
+        """Hashed keys are distributed across all hash partitions."""
+        consumer.process_batch([make_event(f"evt-{i}") for i in range(400)])
+        with get_db_session() as db:
+            per_partition = db.execute(text(
+                "SELECT tableoid::regclass, count(*) FROM event_key_hashes GROUP BY 1"
+            )).all()
+        assert len(per_partition) == DEDUP_KEY_PARTITIONS
+        assert sum(count for _, count in per_partition) == 400
+
+    def test_backfill_from_existing_events(self):
+        """Switching an existing database to hashed keys backfills them once."""
+        with get_db_session() as db:
+            db.execute(text("""
+                INSERT INTO processed_events (topic, event_id, timestamp, source, payload)
+                SELECT 'test.keys', 'old-' || g, now(), 'legacy', '{}' FROM generate_series(1, 25) AS g
+            """))
+        assert backfill_key_hashes(engine, batch_size=10) == 25
+        assert backfill_key_hashes(engine) == 0
+
+        result = consumer.process_batch([make_event("old-1"), make_event("old-26")])
+        assert result["processed"] == 1
+        assert result["duplicates"] == 1
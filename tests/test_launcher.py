@@ -0,0 +1,89 @@
+"""
+Tests for the multi-worker launcher.
+
+These tests verify that per-worker pools are derived from the global
+connection budget, that init_db is serialized by an advisory lock, and
+that SIGTERM drains in-flight requests before the workers exit.
+"""
+import os
+import sys
+import signal
+import threading
+import time
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+from app import database
+from app.database import INIT_DB_LOCK_KEY, engine, get_db_session, init_db, worker_pool_limits
+
+
+class TestWorkerPoolLimits:
+    """Pool sizing from DB_CONNECTION_BUDGET."""
+
+    def test_budget_split_across_workers(self):
+        assert worker_pool_limits(budget=80, workers=4, db_mode="sync") == (10, 10)
+        assert worker_pool_limits(budget=81, workers=4, db_mode="sync") == (10, 10)
+        # async: two connections per worker stay with the minimal sync engine
+        assert worker_pool_limits(budget=80, workers=4, db_mode="async") == (9, 9)
+
+    def test_no_budget_keeps_pool_settings(self):
+        assert worker_pool_limits(budget=0, workers=8, db_mode="sync") == (
+            database.DB_POOL_SIZE, database.DB_MAX_OVERFLOW
+        )
+
+    def test_budget_too_small(self):
+        with pytest.raises(ValueError):
+            worker_pool_limits(budget=3, workers=4, db_mode="sync")
+        with pytest.raises(ValueError):
+            worker_pool_limits(budget=12, workers=4, db_mode="async")
+
+
+class TestInitDbLock:
+    def test_init_db_waits_for_advisory_lock(self):
+        """A second init_db (another worker or replica) blocks until the first releases the lock."""
+        finished = threading.Event()
+        with engine.connect() as holder:
+            holder.execute(text("SELECT pg_advisory_lock(:key)"), {"key": INIT_DB_LOCK_KEY})
+            thread = threading.Thread(target=lambda: (init_db(), finished.set()))
+            thread.start()
+            time.sleep(0.5)
+            assert not finished.is_set()
+            holder.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": INIT_DB_LOCK_KEY})
+            holder.commit()
+        thread.join(timeout=30)
+        assert finished.is_set()
+
+
+class TestLauncher:
+    def test_sigterm_drains_in_flight_request(self, launch_aggregator):
+        """A request waiting in the coalescer when SIGTERM arrives is committed and answered."""
+        base_url, process = launch_aggregator(WORKERS="2", COALESCE_MAX_WAIT_MS="1500",
+                                              GRACEFUL_SHUTDOWN_TIMEOUT="10")
+        response = {}
+
+        def publish():
+            response["value"] = httpx.post(f"{base_url}/publish", json={"events": [{
+                "topic": "test.drain",
+                "event_id": "evt-drain",
+                "timestamp": "2025-12-24T00:00:00Z",
+                "source": "launcher-test",
+                "payload": {}
+            }]}, timeout=30)
+
+        thread = threading.Thread(target=publish)
+        thread.start()
+        time.sleep(0.5)
+        process.send_signal(signal.SIGTERM)
+        thread.join(timeout=30)
+        assert process.wait(timeout=30) == 0
+
+        assert response["value"].status_code == 201
+        assert response["value"].json()["details"]["processed"] == 1
+        with get_db_session() as db:
+            assert db.execute(text(
+                "SELECT count(*) FROM processed_events WHERE event_id = 'evt-drain'"
+            )).scalar() == 1
@@ -0,0 +1,172 @@
+"""
+Tests for the live tail (GET /events/stream).
+
+These tests verify the in-process fan-out (one fetch per committed batch
+regardless of subscriber count), the slow-consumer policies, replay
+deduplication on resume, and the SSE endpoint end to end, including the
+NOTIFY relay between workers.
+"""
+import sys
+import os
+import json
+import time
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+from app.database import IS_SQLITE
+from app.live import LiveTail, Subscriber, notify_payloads, render_event, NOTIFY_PAYLOAD_BYTES
+
+postgres_only = pytest.mark.skipif(IS_SQLITE, reason="NOTIFY relay requires PostgreSQL")
+
+
+def make_row(pk, topic="test.live", event_id=None):
+    moment = datetime(2025, 12, 24, 0, 0, pk % 60, tzinfo=timezone.utc)
+    return SimpleNamespace(id=pk, topic=topic, event_id=event_id or f"evt-{pk}", timestamp=moment,
+                           source="live-test", payload={}, processed_at=moment)
+
+
+def read_events(response, count, timeout=15):
+    """Frame SSE `event`/`id`/`data` dari stream sampai `count` frame non-komentar terkumpul."""
+    frames, frame = [], {}
+    deadline = time.monotonic() + timeout
+    for line in response.iter_lines():
+        # Komentar keep-alive (LIVE_TAIL_HEARTBEAT) menjamin loop ini tetap berputar
+        if time.monotonic() > deadline:
+            break
+        if line.startswith(":"):
+            continue
+        if not line:
+            if frame:
+                frames.append(frame)
+                frame = {}
+                if len(frames) >= count:
+                    return frames
+            continue
+        field, _, value = line.partition(": ")
+        frame[field] = value
+    return frames
+
+
+def publish(base_url, topic, *event_ids):
+    response = httpx.post(f"{base_url}/publish", json={"events": [{
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": "2025-12-24T00:00:00Z",
+        "source": "live-test",
+        "payload": {"n": event_id}
+    } for event_id in event_ids]}, timeout=10)
+    assert response.status_code == 201
+
+
+class TestFanOut:
+    """Hub behaviour with a fake fetch function."""
+
+    @pytest.mark.asyncio
+    async def test_thousands_of_subscribers_share_one_fetch(self):
+        fetched = []
+
+        async def fetch(keys):
+            fetched.append(sorted(keys))
+            return [make_row(i + 1, topic, event_id) for i, (topic, event_id) in enumerate(sorted(keys))]
+
+        hub = LiveTail(relay=False, max_subscribers=10_000)
+        hub.start(fetch)
+        try:
+            subscribers = [hub.subscribe("test.live") for _ in range(5000)]
+            other = hub.subscribe("test.other")
+            hub.committed({("test.unwatched", "evt-x")})
+            hub.committed({("test.live", "evt-1"), ("test.live", "evt-2"), ("test.unwatched", "evt-y")})
+            for _ in range(100):
+                if fetched:
+                    break
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+        finally:
+            await hub.stop()
+
+        # Satu query untuk semua subscriber, hanya key dengan subscriber
+        assert fetched == [[("test.live", "evt-1"), ("test.live", "evt-2")]]
+        assert all(len(subscriber.buffer) == 2 for subscriber in subscribers)
+        assert not other.buffer
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_policies(self):
+        disconnect = Subscriber("t", buffer_size=2, policy="disconnect")
+        drop = Subscriber("t", buffer_size=2, policy="drop_oldest")
+        for pk in range(1, 5):
+            disconnect.offer(render_event(make_row(pk)))
+            drop.offer(render_event(make_row(pk)))
+
+        assert disconnect.overflowed and not disconnect.buffer
+        events, dropped = await drop.take(timeout=0)
+        assert [event.pk for event in events] == [3, 4]
+        assert dropped == 2
+
+    @pytest.mark.asyncio
+    async def test_replayed_events_are_not_sent_twice(self):
+        hub = LiveTail(relay=False, heartbeat=0.01)
+        subscriber = hub.subscribe("test.live")
+
+        async def replay():
+            yield [make_row(1), make_row(2)]
+
+        stream = hub.stream(subscriber, replay())
+        frames = [await stream.__anext__() for _ in range(3)]
+        # evt-2 sudah di-replay dan juga tiba lewat jalur live
+        hub.publish([render_event(make_row(2)), render_event(make_row(3))])
+        frames.append(await stream.__anext__())
+        await stream.aclose()
+
+        ids = [json.loads(frame.split("data: ")[1])["id"] for frame in frames[1:]]
+        assert ids == [1, 2, 3]
+        assert hub.subscribers == 0
+
+    def test_notify_payloads_respect_size_limit(self):
+        keys = [("test.live", f"evt-{i:05d}" + "x" * 40) for i in range(1000)]
+        payloads = notify_payloads(keys)
+        assert len(payloads) > 1
+        assert all(len(payload.encode()) <= NOTIFY_PAYLOAD_BYTES for payload in payloads)
+        assert [tuple(key) for payload in payloads for key in json.loads(payload)] == keys
+
+
+class TestStreamEndpoint:
+    """GET /events/stream against a launched server."""
+
+    def test_live_delivery_and_resume(self, launch_aggregator):
+        base_url, _ = launch_aggregator(WORKERS="1", LIVE_TAIL_HEARTBEAT="0.5")
+        with httpx.Client(base_url=base_url, timeout=10) as client:
+            with client.stream("GET", "/events/stream", params={"topic": "test.live"}) as response:
+                assert response.status_code == 200
+                assert response.headers["content-type"].startswith("text/event-stream")
+                publish(base_url, "test.other", "evt-o1")
+                publish(base_url, "test.live", "evt-1", "evt-2", "evt-1")
+                frames = read_events(response, 2)
+            assert [frame["event"] for frame in frames] == ["event", "event"]
+            assert [json.loads(frame["data"])["event_id"] for frame in frames] == ["evt-1", "evt-2"]
+
+            # Event yang di-commit selama klien terputus di-replay dari Last-Event-ID
+            publish(base_url, "test.live", "evt-3", "evt-4")
+            with client.stream("GET", "/events/stream", params={"topic": "test.live"},
+                               headers={"Last-Event-ID": frames[0]["id"]}) as response:
+                resumed = read_events(response, 3)
+            assert [json.loads(frame["data"])["event_id"] for frame in resumed] == ["evt-2", "evt-3", "evt-4"]
+
+            assert client.get("/events/stream", params={"cursor": "not-a-cursor"}).status_code == 400
+
+    @postgres_only
+    def test_notify_relay_across_workers(self, launch_aggregator):
+        """With WORKERS=2 every worker's commits reach a subscriber on either worker."""
+        base_url, _ = launch_aggregator(WORKERS="2", LIVE_TAIL_HEARTBEAT="0.5")
+        event_ids = [f"evt-relay-{i}" for i in range(12)]
+        with httpx.Client(base_url=base_url, timeout=10) as client:
+            with client.stream("GET", "/events/stream") as response:
+                for event_id in event_ids:
+                    publish(base_url, "test.relay", event_id)
+                frames = read_events(response, len(event_ids))
+        assert sorted(json.loads(frame["data"])["event_id"] for frame in frames) == sorted(event_ids)
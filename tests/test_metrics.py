@@ -0,0 +1,77 @@
+"""
+Tests for the Prometheus /metrics endpoint.
+
+These tests verify that request latency is labelled by route template,
+that consumer transactions update the batch, dedup and Stats-mirroring
+metrics, and that pool saturation is exposed at scrape time.
+"""
+import sys
+import os
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+import main
+
+client = TestClient(main.app)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def make_events(*event_ids):
+    return {"events": [{
+        "topic": "test.metrics",
+        "event_id": event_id,
+        "timestamp": "2025-12-24T00:00:00Z",
+        "source": "metrics-test",
+        "payload": {}
+    } for event_id in event_ids]}
+
+
+class TestMetrics:
+    """Test suite for /metrics."""
+
+    def test_publish_updates_consumer_metrics(self):
+        received = sample("aggregator_events_received_total")
+        unique = sample("aggregator_events_unique_processed_total")
+        duplicate = sample("aggregator_events_duplicate_dropped_total")
+        transactions = sample("aggregator_db_transaction_seconds_count")
+        ratio_sum = sample("aggregator_dedup_hit_ratio_sum")
+
+        response = client.post("/publish", json=make_events("evt-m1", "evt-m2", "evt-m1", "evt-m1"))
+        assert response.status_code == 201
+
+        assert sample("aggregator_events_received_total") - received == 4
+        assert sample("aggregator_events_unique_processed_total") - unique == 2
+        assert sample("aggregator_events_duplicate_dropped_total") - duplicate == 2
+        assert sample("aggregator_db_transaction_seconds_count") - transactions == 1
+        assert sample("aggregator_db_pool_wait_seconds_count") >= 1
+        assert sample("aggregator_dedup_hit_ratio_sum") - ratio_sum == 0.5
+
+    def test_request_latency_by_route_template(self):
+        before = sample("aggregator_request_duration_seconds_count", method="GET", route="/stats", status="200")
+        unmatched = sample("aggregator_request_duration_seconds_count",
+                           method="GET", route="unmatched", status="404")
+        client.get("/stats")
+        client.get("/no-such-route/123")
+        assert sample("aggregator_request_duration_seconds_count",
+                      method="GET", route="/stats", status="200") - before == 1
+        assert sample("aggregator_request_duration_seconds_count",
+                      method="GET", route="unmatched", status="404") - unmatched == 1
+
+    def test_metrics_endpoint_exposition(self):
+        client.post("/publish", json=make_events("evt-m3"))
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        for name in ("aggregator_request_duration_seconds_bucket", "aggregator_batch_size_events_bucket",
+                     "aggregator_db_transaction_seconds_bucket", "aggregator_db_pool_wait_seconds_bucket",
+                     "aggregator_dedup_hit_ratio_bucket", "aggregator_events_received_total"):
+            assert name in body
+        assert 'aggregator_db_pool_checked_out{engine="sync"}' in body
+        assert 'aggregator_db_pool_saturation{engine="sync"}' in body
@@ -0,0 +1,135 @@
+"""
+Tests for the time-partitioned processed_events layout.
+
+The layout is fixed at import time (PARTITIONING), so the partitioned tests
+run in a child pytest process against a scratch database. Run this file
+directly with PARTITIONING=daily to execute them in-process.
+"""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+from app.models import EventModel, EventKeyHash, PARTITIONED, key_store_model
+from app.database import engine, get_db_session, read_stats_totals
+from app.consumer import consumer
+from app.key_store import key_hash
+from app import partitions
+from app.partitions import (
+    ensure_partitions, partition_bounds, partition_name, period_start, run_maintenance
+)
+
+partitioned_only = pytest.mark.skipif(not PARTITIONED, reason="requires PARTITIONING=daily|hourly")
+
+
+def make_event(event_id, topic="test.partition"):
+    return EventModel(
+        topic=topic,
+        event_id=event_id,
+        timestamp="2025-12-24T00:00:00Z",
+        source="partition-test",
+        payload={"id": event_id}
+    )
+
+
+def partition_of(event_id):
+    with get_db_session() as db:
+        return db.execute(text(
+            "SELECT tableoid::regclass::text FROM processed_events WHERE event_id = :id"
+        ), {"id": event_id}).scalar()
+
+
+def age_event(event_id, when, topic="test.partition"):
+    """Pindahkan event (dan key dedup-nya) ke waktu lampau; baris berpindah partisi."""
+    with engine.begin() as conn:
+        ensure_partitions(conn, now=when, premake=0)
+        conn.execute(text("UPDATE processed_events SET processed_at = :when WHERE event_id = :id"),
+                     {"when": when, "id": event_id})
+        if key_store_model() is EventKeyHash:
+            conn.execute(text("UPDATE event_key_hashes SET first_seen_at = :when WHERE key_hash = :hash"),
+                         {"when": when, "hash": key_hash(topic, event_id)})
+        else:
+            conn.execute(text("UPDATE event_keys SET first_seen_at = :when WHERE event_id = :id"),
+                         {"when": when, "id": event_id})
+
+
+class TestPartitionNaming:
+    """Pure helpers, independent of the active layout."""
+
+    def test_daily_and_hourly_names_round_trip(self):
+        ts = datetime(2025, 12, 24, 13, 45, tzinfo=timezone.utc)
+        daily = partition_name(period_start(ts, "daily"), "daily")
+        hourly = partition_name(period_start(ts, "hourly"), "hourly")
+        assert daily == "processed_events_p20251224"
+        assert hourly == "processed_events_p2025122413"
+        assert partition_bounds(daily) == (
+            datetime(2025, 12, 24, tzinfo=timezone.utc), datetime(2025, 12, 25, tzinfo=timezone.utc)
+        )
+        assert partition_bounds(hourly)[1] - partition_bounds(hourly)[0] == timedelta(hours=1)
+        assert partition_bounds("processed_events_default") is None
+
+
+@pytest.mark.skipif(PARTITIONED, reason="already running in the partitioned layout")
+def test_partitioned_layout_in_scratch_database(run_in_scratch_db):
+    """Run this module with PARTITIONING=daily against a fresh database."""
+    output = run_in_scratch_db(__file__, suffix="partitioned", PARTITIONING="daily")
+    assert " passed" in output and "skipped" in output
+
+
+@partitioned_only
+class TestPartitionedLayout:
+    """Deduplication and retention with processed_events range-partitioned by processed_at."""
+
+    def test_dedup_across_partition_boundary(self):
+        """A duplicate arriving after the original moved to an older partition is still dropped."""
+        consumer.process_batch([make_event("evt-boundary")])
+        yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+        age_event("evt-boundary", yesterday)
+        assert partition_of("evt-boundary") == partition_name(period_start(yesterday))
+
+        result = consumer.process_batch([make_event("evt-boundary"), make_event("evt-fresh")])
+        assert result["processed"] == 1
+        assert result["duplicates"] == 1
+
+        with get_db_session() as db:
+            rows = db.execute(text(
+                "SELECT event_id, tableoid::regclass::text FROM processed_events ORDER BY event_id"
+            )).all()
+            totals = read_stats_totals(db)
+        assert [event_id for event_id, _ in rows] == ["evt-boundary", "evt-fresh"]
+        assert rows[0][1] != rows[1][1]
+        assert totals["unique_processed"] == 2
+        assert totals["duplicate_dropped"] == 1
+
+    def test_retention_drops_partitions_and_expires_keys(self, monkeypatch):
+        """Old partitions are detached and dropped; keys outside the dedup window are purged."""
+        now = datetime.now(timezone.utc)
+        consumer.process_batch([make_event("evt-old"), make_event("evt-recent")])
+        old = now - timedelta(days=5)
+        age_event("evt-old", old)
+        age_event("evt-recent", now - timedelta(hours=1))
+
+        monkeypatch.setattr(partitions, "EVENT_RETENTION_HOURS", 72)
+        monkeypatch.setattr(partitions, "DEDUP_WINDOW_HOURS", 48)
+        result = run_maintenance(engine, now=now)
+
+        assert partition_name(period_start(old)) in result["dropped"]
+        assert result["purged_keys"] == 1
+        assert partition_of("evt-old") is None
+
+        # Outside the dedup window the old event is accepted again, the recent one is not
+        result = consumer.process_batch([make_event("evt-old"), make_event("evt-recent")])
+        assert result["processed"] == 1
+        assert partition_of("evt-old") == partition_name(period_start(now))
+
+    def test_future_partitions_created(self):
+        """Maintenance keeps PARTITION_PREMAKE partitions ahead of the current period."""
+        future = datetime.now(timezone.utc) + timedelta(days=30)
+        result = run_maintenance(engine, now=future)
+        assert partition_name(period_start(future)) in result["created"]
+        assert len(result["created"]) == partitions.PARTITION_PREMAKE + 1
+
@@ -5,16 +5,70 @@ These tests verify that the system can handle the required load
 of 20,000+ events with 30%+ duplication rate.
 """
 import pytest
+import pytest_asyncio
 import time
+import asyncio
+import threading
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy import text
 from datetime import datetime
 import sys
 import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
 
-from app.models import EventModel, ProcessedEvent
+import main
+import json
+from app.models import EventModel, BatchEventModel, ProcessedEvent, parse_timestamp
+from app.validation import validate_batch_json
 from app.consumer import IdempotentConsumer
-from app.database import get_db_session
+from app import database
+from app.database import get_db_session, update_stats_atomic, read_stats_totals, SessionLocal
+from app.queries import encode_cursor, fetch_events, parse_payload_filter
+from app.async_database import dispose_async_engine
+from app.coalescer import Coalescer
+from app import metrics
+
+
+# Benchmark dengan tabel berukuran jutaan baris hanya dijalankan bila diminta
+RUN_LARGE_BENCHMARKS = os.getenv("RUN_LARGE_BENCHMARKS", "0") == "1"
+DEDUP_BENCH_KEYS = int(os.getenv("DEDUP_BENCH_KEYS", "10000000"))
+EXPORT_BENCH_ROWS = int(os.getenv("EXPORT_BENCH_ROWS", "10000000"))
+large_benchmark = pytest.mark.skipif(
+    not RUN_LARGE_BENCHMARKS, reason="set RUN_LARGE_BENCHMARKS=1 to run million-row benchmarks"
+)
+
+
+def process_batch_per_row(consumer, events):
+    """Baseline lama: satu INSERT per event via process_event (pembanding bulk path)."""
+    processed_count = 0
+    with get_db_session() as db:
+        for event in events:
+            if consumer.process_event(event, db):
+                processed_count += 1
+        update_stats_atomic(db, len(events), processed_count, len(events) - processed_count)
+    return {
+        "received": len(events),
+        "processed": processed_count,
+        "duplicates": len(events) - processed_count,
+        "errors": 0
+    }
+
+
+def peak_rss_mb(pid):
+    """VmHWM (puncak resident set) sebuah proses dalam MB."""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmHWM not available")
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
 
 
 class TestPerformance:
@@ -134,3 +188,616 @@ class TestPerformance:
         
         # Larger batches should generally be faster
         assert results[500]["throughput"] > results[10]["throughput"]
+
+    def test_bulk_vs_per_row_batch(self):
+        """Compare set-based bulk upsert against the per-row INSERT path."""
+        consumer = IdempotentConsumer()
+
+        batch_sizes = [10, 100, 500, 1000, 5000]
+        results = {}
+
+        for batch_size in batch_sizes:
+            results[batch_size] = {}
+            for mode, process in (("per_row", lambda events: process_batch_per_row(consumer, events)),
+                                  ("bulk", consumer.process_batch)):
+                # ~30% duplicates inside each batch
+                unique_count = int(batch_size * 0.7)
+                events = [
+                    EventModel(
+                        topic=f"test.bulk.{mode}.{batch_size}",
+                        event_id=f"bulk-{i % unique_count}",
+                        timestamp="2025-12-24T00:00:00Z",
+                        source="perf-test",
+                        payload={"index": i}
+                    )
+                    for i in range(batch_size)
+                ]
+
+                start_time = time.time()
+                result = process(events)
+                elapsed_time = time.time() - start_time
+
+                assert result["received"] == batch_size
+                assert result["processed"] == unique_count
+                assert result["duplicates"] == batch_size - unique_count
+
+                results[batch_size][mode] = batch_size / elapsed_time
+
+        print("\n=== Bulk vs Per-Row Upsert ===")
+        for batch_size, metrics in results.items():
+            print(f"Batch size {batch_size:4d}: per-row {metrics['per_row']:9.1f} events/sec, "
+                  f"bulk {metrics['bulk']:9.1f} events/sec, "
+                  f"speedup {metrics['bulk'] / metrics['per_row']:.1f}x")
+        print("==============================\n")
+
+        assert results[5000]["bulk"] > results[5000]["per_row"]
+
+    @pytest_asyncio.fixture
+    async def async_engine_scope(self):
+        """Bind the lazy async engine to this test's event loop and dispose it there."""
+        yield
+        await dispose_async_engine()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("db_mode", ["sync", "async"])
+    async def test_mixed_publish_stats_latency(self, db_mode, monkeypatch, async_engine_scope):
+        """p99 latency of concurrent /publish and /stats traffic on the sync and async DB paths."""
+        monkeypatch.setattr(main, "DB_MODE", db_mode)
+        latencies = {"publish": [], "stats": []}
+
+        async def call(client, kind, i):
+            start = time.perf_counter()
+            if kind == "publish":
+                response = await client.post("/publish", json={"events": [
+                    {
+                        "topic": f"test.mixed.{db_mode}",
+                        "event_id": f"mixed-{i}-{j}",
+                        "timestamp": "2025-12-24T00:00:00Z",
+                        "source": "perf-test",
+                        "payload": {"index": j}
+                    }
+                    for j in range(200)
+                ]})
+                assert response.status_code == 201
+            else:
+                response = await client.get("/stats")
+                assert response.status_code == 200
+            latencies[kind].append(time.perf_counter() - start)
+
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            for _ in range(5):
+                await asyncio.gather(
+                    *[call(client, "publish", i) for i in range(20)],
+                    *[call(client, "stats", i) for i in range(40)]
+                )
+
+        print(f"\n=== Mixed traffic latency (DB_MODE={db_mode}) ===")
+        for kind, samples in latencies.items():
+            print(f"/{kind:8s}: n={len(samples)}, p50 {percentile(samples, 50) * 1000:.1f} ms, "
+                  f"p99 {percentile(samples, 99) * 1000:.1f} ms")
+        print("==============================================\n")
+
+        assert len(latencies["publish"]) == 100
+        assert len(latencies["stats"]) == 200
+
+    @pytest.mark.asyncio
+    async def test_single_event_publish_coalescing(self, monkeypatch):
+        """Throughput of one-event /publish requests (k6 style) with coalescing off vs on."""
+        concurrency = 64
+        requests_per_mode = 1500
+        results = {}
+
+        for mode, wait_ms in (("off", 0), ("on", 5)):
+            monkeypatch.setattr(main, "coalescer", Coalescer(main.process_event_batches, max_wait_ms=wait_ms))
+            counter = iter(range(requests_per_mode))
+
+            async def worker(client):
+                for i in counter:
+                    response = await client.post("/publish", json={"events": [{
+                        "topic": "test.coalesce",
+                        "event_id": f"coalesce-{mode}-{i % (requests_per_mode * 7 // 10)}",
+                        "timestamp": "2025-12-24T00:00:00Z",
+                        "source": "perf-test",
+                        "payload": {"index": i}
+                    }]})
+                    assert response.status_code == 201
+
+            async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+                start = time.perf_counter()
+                await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+                elapsed = time.perf_counter() - start
+            results[mode] = {
+                "rps": requests_per_mode / elapsed,
+                "transactions": main.coalescer.flushes if wait_ms else requests_per_mode
+            }
+
+        with get_db_session() as db:
+            totals = read_stats_totals(db)
+        assert totals["received"] == 2 * requests_per_mode
+        assert totals["unique_processed"] == 2 * (requests_per_mode * 7 // 10)
+
+        print(f"\n=== Single-event /publish, {concurrency} concurrent clients ===")
+        for mode, metrics in results.items():
+            print(f"coalescing {mode:3s}: {metrics['rps']:7.0f} req/sec, {metrics['transactions']} transactions")
+        print("======================================================\n")
+
+        assert results["on"]["transactions"] < requests_per_mode / 4
+        assert results["on"]["rps"] > results["off"]["rps"]
+
+    @pytest.mark.asyncio
+    async def test_metrics_overhead(self, monkeypatch):
+        """Prometheus instrumentation cost per single-event /publish request stays under 2%."""
+        concurrency = 32
+        requests_per_run = 600
+
+        async def run(label):
+            counter = iter(range(requests_per_run))
+
+            async def worker(client):
+                for i in counter:
+                    response = await client.post("/publish", json={"events": [{
+                        "topic": "test.metrics",
+                        "event_id": f"metrics-{label}-{i}",
+                        "timestamp": "2025-12-24T00:00:00Z",
+                        "source": "perf-test",
+                        "payload": {"index": i}
+                    }]})
+                    assert response.status_code == 201
+
+            async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+                start = time.perf_counter()
+                await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+                return requests_per_run / (time.perf_counter() - start)
+
+        # A/B bergantian agar drift (autovacuum, cache) terbagi rata
+        rps = {True: [], False: []}
+        for round_no in range(3):
+            for enabled in (True, False):
+                monkeypatch.setattr(metrics, "METRICS_ENABLED", enabled)
+                rps[enabled].append(await run(f"{round_no}-{enabled}"))
+        monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+
+        # Biaya instrumentasi per request diukur terisolasi: middleware di sekitar
+        # app ASGI kosong + satu observe_transaction
+        async def bare_app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 201, "headers": []})
+
+        async def noop_send(message):
+            pass
+
+        scope = {"type": "http", "method": "POST", "app": main.app, "endpoint": main.publish_events}
+        middleware = metrics.MetricsMiddleware(bare_app)
+        iterations = 20000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await bare_app(scope, None, noop_send)
+        bare = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await middleware(scope, None, noop_send)
+            now = time.perf_counter()
+            metrics.observe_transaction(1, 1, now, now)
+        instrumented = time.perf_counter() - start
+        per_request_cost = (instrumented - bare) / iterations
+
+        peak_rps = max(rps[True] + rps[False])
+        overhead = per_request_cost * peak_rps
+        on, off = sorted(rps[True])[1], sorted(rps[False])[1]
+        print(f"\n=== /metrics instrumentation overhead, {concurrency} concurrent clients ===")
+        print(f"metrics on:  {on:7.0f} req/sec (median of 3)")
+        print(f"metrics off: {off:7.0f} req/sec (median of 3)")
+        print(f"instrumentation: {per_request_cost * 1e6:.1f} us/request = {overhead * 100:.2f}% at {peak_rps:.0f} req/sec")
+        print("==============================================================\n")
+
+        assert overhead < 0.02
+
+    def test_stats_shard_contention(self, monkeypatch):
+        """Lock wait on the stats row(s) with 50 concurrent writers: 1 slot vs sharded slots."""
+        writers = 50
+        updates_per_writer = 20
+        results = {}
+
+        for shards in (1, 16):
+            monkeypatch.setattr(database, "STATS_SHARDS", shards)
+            waits = []
+            lock = threading.Lock()
+            barrier = threading.Barrier(writers)
+
+            def writer():
+                barrier.wait()
+                for _ in range(updates_per_writer):
+                    with get_db_session() as db:
+                        # Hold the transaction open briefly, like a batch insert would
+                        db.execute(text("SELECT pg_sleep(0.002)"))
+                        start = time.perf_counter()
+                        update_stats_atomic(db, received=1, unique=1, duplicate=0)
+                        wait = time.perf_counter() - start
+                    with lock:
+                        waits.append(wait)
+
+            start_time = time.perf_counter()
+            threads = [threading.Thread(target=writer) for _ in range(writers)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+            elapsed = time.perf_counter() - start_time
+
+            results[shards] = {
+                "total_wait": sum(waits),
+                "p99_wait": percentile(waits, 99),
+                "tps": len(waits) / elapsed
+            }
+
+        with get_db_session() as db:
+            assert read_stats_totals(db)["received"] == 2 * writers * updates_per_writer
+
+        print("\n=== Stats counter contention (50 writers) ===")
+        for shards, metrics in results.items():
+            print(f"STATS_SHARDS={shards:2d}: total lock wait {metrics['total_wait']:.2f}s, "
+                  f"p99 {metrics['p99_wait'] * 1000:.1f} ms, {metrics['tps']:.0f} tx/sec")
+        print("=============================================\n")
+
+        assert results[16]["total_wait"] < results[1]["total_wait"]
+
+    def test_fast_validation_throughput(self):
+        """Events/sec: BatchEventModel + timestamp re-parse vs TypeAdapter fast path."""
+        body = json.dumps({"events": [
+            {
+                "topic": f"test.validate.{i % 10}",
+                "event_id": f"validate-{i}",
+                "timestamp": "2025-12-24T00:00:00Z",
+                "source": "perf-test",
+                "payload": {"index": i, "value": i * 10}
+            }
+            for i in range(5000)
+        ]}).encode()
+        rounds = 5
+
+        def model_path():
+            events = BatchEventModel.model_validate_json(body).events
+            return [parse_timestamp(event.timestamp) for event in events]
+
+        def fast_path():
+            return [record.event_time for record in validate_batch_json(body)]
+
+        assert model_path() == fast_path()
+        rates = {}
+        for name, fn in (("model", model_path), ("fast", fast_path)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                fn()
+            rates[name] = 5000 * rounds / (time.perf_counter() - start)
+
+        print("\n=== Validation throughput (5000-event batch) ===")
+        print(f"BatchEventModel:   {rates['model']:.0f} events/sec")
+        print(f"FAST_VALIDATION:   {rates['fast']:.0f} events/sec")
+        print("================================================\n")
+
+        assert rates["fast"] > rates["model"]
+
+    @large_benchmark
+    def test_cursor_pagination_flat_latency(self):
+        """Page latency over a 1M-row table: keyset cursor vs OFFSET."""
+        total_rows = 1_000_000
+        page_size = 100
+        with get_db_session() as db:
+            db.execute(text("""
+                INSERT INTO processed_events (topic, event_id, timestamp, source, payload, processed_at)
+                SELECT 'test.page.' || (g % 5), 'page-' || g, now(), 'perf-test', '{}',
+                       now() - (g || ' milliseconds')::interval
+                FROM generate_series(1, :n) AS g
+            """), {"n": total_rows})
+        with SessionLocal() as db:
+            db.execute(text("ANALYZE processed_events"))
+            db.commit()
+
+        http = TestClient(main.app)
+        results = {}
+
+        for page in (1, 100, 1000, 5000):
+            offset = (page - 1) * page_size
+            with SessionLocal() as db:
+                # Cursor yang akan diterima klien setelah page-1 halaman
+                row = db.execute(text("""
+                    SELECT processed_at, id FROM processed_events
+                    ORDER BY processed_at DESC, id DESC OFFSET :o LIMIT 1
+                """), {"o": offset - 1}).one() if offset else None
+            cursor = encode_cursor(row[0], row[1]) if row else None
+
+            timings = {}
+            for mode in ("offset", "cursor"):
+                params = {"limit": page_size}
+                if mode == "offset":
+                    params["offset"] = offset
+                elif cursor:
+                    params["cursor"] = cursor
+                samples = []
+                for _ in range(5):
+                    start = time.perf_counter()
+                    response = http.get("/events", params=params)
+                    samples.append(time.perf_counter() - start)
+                    assert response.status_code == 200
+                    assert len(response.json()) == page_size
+                timings[mode] = percentile(samples, 50)
+            results[page] = timings
+
+        print("\n=== /events page latency on 1M rows (p50) ===")
+        for page, timings in results.items():
+            print(f"page {page:5d}: offset {timings['offset'] * 1000:8.1f} ms, "
+                  f"cursor {timings['cursor'] * 1000:6.1f} ms")
+        print("==============================================\n")
+
+        # Halaman dalam dengan cursor tetap sekelas halaman pertama
+        assert results[5000]["cursor"] < results[1]["cursor"] * 5 + 0.05
+        assert results[5000]["cursor"] < results[5000]["offset"]
+
+    @large_benchmark
+    def test_dedup_key_store_size_and_throughput(self):
+        """uq_topic_event_id-style B-tree vs hashed, hash-partitioned key store at 10M random keys."""
+        chunk = 500_000
+        tables = {
+            "columns": (
+                "CREATE TABLE bench_keys_columns (topic varchar(255) NOT NULL, event_id varchar(255) NOT NULL, "
+                "CONSTRAINT bench_uq_topic_event_id UNIQUE (topic, event_id))",
+                # Sama dengan INSERT ... ON CONFLICT (uq_topic_event_id) DO NOTHING
+                "INSERT INTO bench_keys_columns SELECT 'topic.' || (g % 10), 'evt-' || gen_random_uuid() "
+                "FROM generate_series(1, :n) AS g ON CONFLICT DO NOTHING"
+            ),
+            "hashed": (
+                "CREATE TABLE bench_keys_hashed (key_hash uuid PRIMARY KEY, "
+                "first_seen_at timestamptz NOT NULL DEFAULT now()) PARTITION BY HASH (key_hash)",
+                # md5 sebagai pengganti hash 16 byte di sisi server (app memakai blake2b)
+                "INSERT INTO bench_keys_hashed (key_hash) "
+                "SELECT md5('topic.' || (g % 10) || 'evt-' || gen_random_uuid())::uuid "
+                "FROM generate_series(1, :n) AS g ON CONFLICT DO NOTHING"
+            ),
+        }
+        results = {}
+        try:
+            with SessionLocal() as db:
+                for name, (ddl, _) in tables.items():
+                    db.execute(text(f"DROP TABLE IF EXISTS bench_keys_{name}"))
+                    db.execute(text(ddl))
+                for remainder in range(16):
+                    db.execute(text(
+                        f"CREATE TABLE bench_keys_hashed_p{remainder} PARTITION OF bench_keys_hashed "
+                        f"FOR VALUES WITH (MODULUS 16, REMAINDER {remainder})"
+                    ))
+                db.commit()
+
+            for name, (_, insert_sql) in tables.items():
+                elapsed = 0.0
+                last_chunk = 0.0
+                for _ in range(0, DEDUP_BENCH_KEYS, chunk):
+                    with SessionLocal() as db:
+                        start = time.perf_counter()
+                        db.execute(text(insert_sql), {"n": chunk})
+                        db.commit()
+                        last_chunk = time.perf_counter() - start
+                        elapsed += last_chunk
+                with SessionLocal() as db:
+                    # pg_partition_tree kosong untuk tabel biasa, jadi fallback ke tabel itu sendiri
+                    index_bytes, table_bytes = db.execute(text("""
+                        SELECT coalesce((SELECT sum(pg_indexes_size(relid)) FROM pg_partition_tree(:t)),
+                                        pg_indexes_size(CAST(:t AS regclass))),
+                               coalesce((SELECT sum(pg_total_relation_size(relid)) FROM pg_partition_tree(:t)),
+                                        pg_total_relation_size(CAST(:t AS regclass)))
+                    """), {"t": f"bench_keys_{name}"}).one()
+                results[name] = {
+                    "keys_per_sec": DEDUP_BENCH_KEYS / elapsed,
+                    "last_chunk_keys_per_sec": chunk / last_chunk,
+                    "index_mb": index_bytes / 1024 / 1024,
+                    "total_mb": table_bytes / 1024 / 1024
+                }
+        finally:
+            with SessionLocal() as db:
+                for name in tables:
+                    db.execute(text(f"DROP TABLE IF EXISTS bench_keys_{name}"))
+                db.commit()
+
+        print(f"\n=== Dedup key store at {DEDUP_BENCH_KEYS:,} random keys ===")
+        for name, metrics in results.items():
+            print(f"{name:8s}: index {metrics['index_mb']:8.1f} MB, total {metrics['total_mb']:8.1f} MB, "
+                  f"{metrics['keys_per_sec']:9.0f} keys/sec overall, "
+                  f"{metrics['last_chunk_keys_per_sec']:9.0f} keys/sec last chunk")
+        print("=================================================\n")
+
+        assert results["hashed"]["index_mb"] < results["columns"]["index_mb"]
+
+    @large_benchmark
+    def test_payload_filter_with_and_without_gin(self):
+        """?where=user_id:N latency over 1M events: sequential filter vs GIN jsonb_path_ops."""
+        total_rows = 1_000_000
+        with get_db_session() as db:
+            db.execute(text("""
+                INSERT INTO processed_events (topic, event_id, timestamp, source, payload, processed_at)
+                SELECT 'test.jsonb.' || (g % 5), 'jsonb-' || g, now(), 'perf-test',
+                       jsonb_build_object('user_id', g % 20000, 'action', 'login', 'seq', g),
+                       now() - (g || ' milliseconds')::interval
+                FROM generate_series(1, :n) AS g
+            """), {"n": total_rows})
+        payload_filter = parse_payload_filter(["user_id:4242"])
+        results = {}
+        try:
+            for mode in ("no_index", "gin"):
+                with SessionLocal() as db:
+                    if mode == "gin":
+                        db.execute(text(
+                            "CREATE INDEX IF NOT EXISTS ix_processed_events_payload_gin "
+                            "ON processed_events USING gin (payload jsonb_path_ops)"
+                        ))
+                    else:
+                        db.execute(text("DROP INDEX IF EXISTS ix_processed_events_payload_gin"))
+                    db.execute(text("ANALYZE processed_events"))
+                    db.commit()
+                samples = []
+                for _ in range(5):
+                    with SessionLocal() as db:
+                        start = time.perf_counter()
+                        events, _ = fetch_events(db, None, 100, 0, None, payload_filter)
+                        samples.append(time.perf_counter() - start)
+                    assert len(events) == total_rows // 20000
+                    assert all(event["payload"]["user_id"] == 4242 for event in events)
+                results[mode] = percentile(samples, 50)
+        finally:
+            with SessionLocal() as db:
+                db.execute(text("DROP INDEX IF EXISTS ix_processed_events_payload_gin"))
+                db.commit()
+
+        print("\n=== /events?where=user_id:4242 on 1M rows (p50) ===")
+        print(f"without index: {results['no_index'] * 1000:8.1f} ms")
+        print(f"GIN index:     {results['gin'] * 1000:8.1f} ms")
+        print("===================================================\n")
+
+        assert results["gin"] < results["no_index"]
+
+    @large_benchmark
+    def test_timeseries_rollup_vs_group_by(self):
+        """Per-minute counts for one hour: topic_minute_counts vs GROUP BY over 1M events."""
+        from app.migrations import run_migrations
+
+        total_rows = 1_000_000
+        with get_db_session() as db:
+            # Satu event per 100 ms selama ~28 jam, 5 topic x 4 source
+            db.execute(text("""
+                INSERT INTO processed_events (topic, event_id, timestamp, source, payload)
+                SELECT 'test.ts.' || (g % 5), 'ts-' || g,
+                       timestamptz '2025-12-24 00:00:00+00' + (g * 100 || ' milliseconds')::interval,
+                       'svc-' || (g % 4), '{}'
+                FROM generate_series(1, :n) AS g
+            """), {"n": total_rows})
+        # Rollup diisi lewat migrasi backfill (sama dengan upgrade database lama)
+        run_migrations(database.engine)
+        with SessionLocal() as db:
+            db.execute(text("ANALYZE processed_events"))
+            db.execute(text("ANALYZE topic_minute_counts"))
+            db.commit()
+
+        params = {"from": "2025-12-24T12:00:00Z", "to": "2025-12-24T13:00:00Z", "topic": "test.ts.1"}
+        group_by = text("""
+            SELECT date_trunc('minute', timestamp) AS bucket, source, count(*)
+            FROM processed_events WHERE topic = :topic
+            GROUP BY 1, 2 ORDER BY 1, 2
+        """)
+        http = TestClient(main.app)
+        samples = {"rollup": [], "group_by": []}
+        for _ in range(5):
+            start = time.perf_counter()
+            response = http.get("/stats/timeseries", params=params)
+            samples["rollup"].append(time.perf_counter() - start)
+            assert response.status_code == 200
+            with SessionLocal() as db:
+                start = time.perf_counter()
+                reference = db.execute(group_by, {"topic": params["topic"]}).all()
+                samples["group_by"].append(time.perf_counter() - start)
+
+        # Satu jam = 60 menit x 4 source, nilainya sama dengan GROUP BY penuh
+        points = response.json()["points"]
+        assert len(points) == 60 * 4
+        in_range = {(bucket.isoformat(), source): count for bucket, source, count in reference
+                    if datetime.fromisoformat(params["from"].replace("Z", "+00:00")) <= bucket
+                    < datetime.fromisoformat(params["to"].replace("Z", "+00:00"))}
+        assert {(datetime.fromisoformat(point["bucket_start"].replace("Z", "+00:00")).isoformat(), point["source"]):
+                point["count"] for point in points} == in_range
+
+        results = {mode: percentile(values, 50) for mode, values in samples.items()}
+        print("\n=== per-minute counts, 1 topic x 1 hour, 1M events (p50) ===")
+        print(f"GET /stats/timeseries: {results['rollup'] * 1000:8.1f} ms")
+        print(f"GROUP BY events:       {results['group_by'] * 1000:8.1f} ms")
+        print("============================================================\n")
+
+        assert results["rollup"] < results["group_by"]
+
+    @large_benchmark
+    @pytest.mark.asyncio
+    async def test_launcher_worker_scaling(self, launch_aggregator):
+        """/publish throughput of app.launcher with WORKERS=1 vs WORKERS=N (N = min(4, CPU))."""
+        cores = os.cpu_count() or 1
+        scaled = int(os.getenv("BENCH_WORKERS", str(min(4, cores))))
+        concurrency = 32
+        requests_per_run = 2000
+        batch_size = 50
+        results = {}
+
+        for workers in sorted({1, scaled}):
+            base_url, process = launch_aggregator(WORKERS=str(workers), DB_CONNECTION_BUDGET="64")
+            counter = iter(range(requests_per_run))
+
+            async def worker(client):
+                for i in counter:
+                    response = await client.post("/publish", json={"events": [{
+                        "topic": "test.workers",
+                        "event_id": f"workers-{workers}-{i}-{j}",
+                        "timestamp": "2025-12-24T00:00:00Z",
+                        "source": "perf-test",
+                        "payload": {"index": i}
+                    } for j in range(batch_size)]})
+                    assert response.status_code == 201
+
+            # keepalive_expiry < timeout keep-alive uvicorn (5 detik): koneksi yang
+            # sedang ditutup server tidak dipakai ulang
+            limits = httpx.Limits(max_connections=concurrency, keepalive_expiry=2)
+            async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+                # Pemanasan: semua worker sudah menerima koneksi sebelum pengukuran
+                await asyncio.gather(*(client.get("/health") for _ in range(concurrency)))
+                start = time.perf_counter()
+                await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+                elapsed = time.perf_counter() - start
+            results[workers] = requests_per_run * batch_size / elapsed
+            process.terminate()
+            assert process.wait(timeout=60) == 0
+
+        print(f"\n=== app.launcher /publish throughput ({cores} CPU) ===")
+        for workers, events_per_sec in results.items():
+            print(f"WORKERS={workers}: {events_per_sec:9.0f} events/sec")
+        print("======================================================\n")
+
+        if scaled > 1 and cores > 1:
+            assert results[scaled] > results[1]
+
+    @large_benchmark
+    @pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="requires /proc")
+    def test_export_constant_memory(self, launch_aggregator):
+        """GET /events/export over EXPORT_BENCH_ROWS rows: peak RSS of the worker stays flat."""
+        with get_db_session() as db:
+            db.execute(text("""
+                INSERT INTO processed_events (topic, event_id, timestamp, source, payload, processed_at)
+                SELECT 'test.export.' || (g % 5), 'export-' || g, now(), 'perf-test',
+                       jsonb_build_object('user_id', g % 20000, 'seq', g),
+                       now() - (g || ' milliseconds')::interval
+                FROM generate_series(1, :n) AS g
+            """), {"n": EXPORT_BENCH_ROWS})
+
+        base_url, process = launch_aggregator(WORKERS="1")
+        results = {}
+        with httpx.Client(base_url=base_url, timeout=120) as client:
+            # Pemanasan: import encoder (pyarrow) dan pool koneksi sudah terisi
+            for export_format in ("ndjson", "parquet"):
+                assert client.get("/events/export", params={"format": export_format, "from": "2999-01-01T00:00:00Z"}).status_code == 200
+            baseline = peak_rss_mb(process.pid)
+
+            for export_format, compress in (("ndjson", "gzip"), ("csv", None), ("parquet", None)):
+                params = {"format": export_format}
+                if compress:
+                    params["compress"] = compress
+                received = 0
+                start = time.perf_counter()
+                with client.stream("GET", "/events/export", params=params) as response:
+                    assert response.status_code == 200
+                    for chunk in response.iter_raw():
+                        received += len(chunk)
+                elapsed = time.perf_counter() - start
+                results[(export_format, compress)] = {
+                    "rows_per_sec": EXPORT_BENCH_ROWS / elapsed,
+                    "mb": received / 1024 / 1024,
+                    "peak_growth_mb": peak_rss_mb(process.pid) - baseline
+                }
+
+        print(f"\n=== /events/export over {EXPORT_BENCH_ROWS} rows (WORKERS=1) ===")
+        for (export_format, compress), metrics in results.items():
+            label = export_format + (f"+{compress}" if compress else "")
+            print(f"{label:12s}: {metrics['rows_per_sec']:9.0f} rows/sec, {metrics['mb']:8.1f} MB, "
+                  f"peak RSS +{metrics['peak_growth_mb']:6.1f} MB")
+        print("=========================================================\n")
+
+        # Memori worker sebesar satu partisi cursor, bukan sebesar hasil export
+        assert all(metrics["peak_growth_mb"] < 64 for metrics in results.values())
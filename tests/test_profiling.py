@@ -0,0 +1,114 @@
+"""
+Tests for ingest stage profiling.
+
+These tests verify that every pipeline stage reports its duration to the
+registered hooks, that /debug/stages summarizes them, and that sampled
+slow requests keep a cProfile capture.
+"""
+import sys
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+import main
+from app import profiling
+from app.profiling import StageSummaries
+
+client = TestClient(main.app)
+
+
+def make_events(*event_ids):
+    return {"events": [{
+        "topic": "test.profiling",
+        "event_id": event_id,
+        "timestamp": "2025-12-24T00:00:00Z",
+        "source": "profiling-test",
+        "payload": {}
+    } for event_id in event_ids]}
+
+
+@pytest.fixture
+def stages_enabled(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_STAGES", True)
+    profiling.reset()
+    yield
+    profiling.reset()
+
+
+class TestStageSummaries:
+    def test_rolling_window_summary(self):
+        summaries = StageSummaries(window=4)
+        for ms in (1, 2, 3, 4, 100):
+            summaries("insert", ms / 1000)
+        summary = summaries.summary()["insert"]
+        assert summary["count"] == 5
+        assert summary["window"] == 4
+        assert summary["p50_ms"] == pytest.approx(4)
+        assert summary["max_ms"] == pytest.approx(100)
+
+
+class TestStageProfiling:
+    """Test suite for stage hooks and /debug/stages."""
+
+    def test_debug_endpoint_disabled_by_default(self, monkeypatch):
+        monkeypatch.setattr(profiling, "PROFILE_STAGES", False)
+        monkeypatch.setattr(profiling.sampler, "rate", 0)
+        assert client.get("/debug/stages").status_code == 404
+
+    def test_publish_reports_every_stage(self, stages_enabled):
+        seen = []
+        hook = lambda name, seconds: seen.append(name)
+        profiling.register_hook(hook)
+        try:
+            assert client.post("/publish", json=make_events("evt-p1", "evt-p2")).status_code == 201
+        finally:
+            profiling.unregister_hook(hook)
+
+        expected = {"validate", "checkout", "prepare_rows", "insert", "topics", "rollup",
+                    "topic_stats", "stats_update", "commit", "process_batch"}
+        assert expected <= set(seen)
+        # process_batch membungkus stage transaksi, commit termasuk di dalamnya
+        assert seen.index("commit") < seen.index("process_batch")
+
+        report = client.get("/debug/stages").json()
+        assert report["stages_enabled"] is True
+        assert expected <= set(report["stages"])
+        assert report["stages"]["insert"]["count"] == 1
+        assert report["stages"]["process_batch"]["p99_ms"] >= report["stages"]["insert"]["p99_ms"]
+
+        assert client.delete("/debug/stages").status_code == 204
+        assert client.get("/debug/stages").json()["stages"] == {}
+
+    def test_sampled_slow_request_is_captured(self, monkeypatch):
+        monkeypatch.setattr(profiling.sampler, "rate", 1.0)
+        monkeypatch.setattr(profiling.sampler, "slow_ms", 0)
+        monkeypatch.setattr(profiling, "PROFILE_TOP", 500)
+        profiling.reset()
+        try:
+            assert client.post("/publish", json=make_events("evt-p3")).status_code == 201
+            report = client.get("/debug/stages").json()
+        finally:
+            profiling.reset()
+
+        assert report["sampled_requests"] == 1
+        assert len(report["captures"]) == 1
+        capture = report["captures"][0]
+        assert capture["path"] == "/publish"
+        # Profil threadpool (consumer) digabung dengan profil validasi
+        assert "process_batch" in capture["profile"]
+        assert "validate_batch" in capture["profile"]
+
+    def test_fast_requests_are_not_kept(self, monkeypatch):
+        monkeypatch.setattr(profiling.sampler, "rate", 1.0)
+        monkeypatch.setattr(profiling.sampler, "slow_ms", 60_000)
+        profiling.reset()
+        try:
+            assert client.post("/publish", json=make_events("evt-p4")).status_code == 201
+            report = client.get("/debug/stages").json()
+        finally:
+            profiling.reset()
+        assert report["sampled_requests"] == 1
+        assert report["captures"] == []
@@ -0,0 +1,162 @@
+"""
+Tests for the async publisher.
+
+These tests verify the async publisher against an in-memory httpx
+transport: all batches are delivered, retries follow the backoff
+semantics, the token bucket bounds the send rate and the in-flight limit
+is respected.
+"""
+import asyncio
+import itertools
+import tracemalloc
+import time
+import json
+import sys
+import os
+
+import httpx
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'publisher', 'src'))
+
+from publisher import AsyncEventPublisher, EventPublisher, TokenBucket, LatencyHistogram, MAX_RETRIES
+
+
+class FakeAggregator:
+    """MockTransport handler that records batches and tracks concurrency."""
+
+    def __init__(self, fail_first: int = 0, delay: float = 0.0):
+        self.fail_first = fail_first
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.event_ids = []
+        self.idempotency_keys = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        self.idempotency_keys.append(request.headers.get("Idempotency-Key"))
+        if self.calls <= self.fail_first:
+            return httpx.Response(503, text="starting")
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        events = json.loads(request.content)["events"]
+        self.event_ids.extend(event["event_id"] for event in events)
+        return httpx.Response(201, json={"status": "success"})
+
+
+def make_publisher(handler, **kwargs):
+    return AsyncEventPublisher("http://aggregator/publish", transport=httpx.MockTransport(handler), **kwargs)
+
+
+class TestAsyncPublisher:
+    """Test suite for the async publisher mode."""
+
+    def test_publishes_all_events_with_duplicates(self):
+        """Every generated event (unique + duplicate) is delivered exactly once."""
+        aggregator = FakeAggregator(delay=0.005)
+        publisher = make_publisher(aggregator, in_flight=4)
+        asyncio.run(publisher.run_async(num_events=1000, duplication_rate=0.3, batch_size=50))
+
+        assert publisher.published_count == 1000
+        assert publisher.error_count == 0
+        assert len(aggregator.event_ids) == 1000
+        assert len(set(aggregator.event_ids)) == 700
+        assert 1 < aggregator.max_in_flight <= 4
+        assert len(publisher.latency.samples) == 20
+
+    def test_retries_with_backoff(self):
+        """Failed batches are retried (up to MAX_RETRIES attempts) and then succeed."""
+        aggregator = FakeAggregator(fail_first=2)
+        publisher = make_publisher(aggregator, in_flight=1, backoff_base=0.01)
+        asyncio.run(publisher.run_async(num_events=100, duplication_rate=0.0, batch_size=100))
+
+        assert aggregator.calls == 3
+        assert publisher.published_count == 100
+
+        aggregator = FakeAggregator(fail_first=100)
+        publisher = make_publisher(aggregator, in_flight=1, backoff_base=0.01)
+        asyncio.run(publisher.run_async(num_events=10, duplication_rate=0.0, batch_size=10))
+        assert aggregator.calls == MAX_RETRIES
+        assert publisher.published_count == 0
+
+    def test_retries_reuse_idempotency_key(self):
+        """Every attempt of one batch carries the same Idempotency-Key; batches get distinct keys."""
+        aggregator = FakeAggregator(fail_first=2)
+        publisher = make_publisher(aggregator, in_flight=1, backoff_base=0.01)
+        asyncio.run(publisher.run_async(num_events=20, duplication_rate=0.0, batch_size=10))
+
+        keys = aggregator.idempotency_keys
+        assert len(keys) == 4 and all(keys)
+        assert keys[0] == keys[1] == keys[2] != keys[3]
+
+    def test_token_bucket_limits_rate(self):
+        """With TARGET_RATE set, events beyond the initial burst are paced at the target."""
+        aggregator = FakeAggregator()
+        publisher = make_publisher(aggregator, in_flight=8, target_rate=2000)
+        start = time.perf_counter()
+        asyncio.run(publisher.run_async(num_events=3000, duplication_rate=0.0, batch_size=50))
+        elapsed = time.perf_counter() - start
+
+        # Bucket starts full (2000 tokens), the remaining 1000 refill at 2000/sec
+        assert publisher.published_count == 3000
+        assert 0.4 <= elapsed < 5
+
+    def test_latency_histogram_percentiles(self):
+        """Percentiles and bucket counts of the latency report."""
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.record(ms / 1000)
+        assert abs(histogram.percentile(50) - 0.050) < 0.002
+        assert abs(histogram.percentile(99) - 0.099) < 0.002
+        summary = histogram.summary()
+        assert "p95" in summary[0]
+        assert sum(int(line.rsplit(":", 1)[1]) for line in summary[1:]) == 100
+
+
+class TestStreamingGeneration:
+    """Test suite for lazy event generation with a duplicate reservoir."""
+
+    def test_exact_counts_and_even_interleaving(self):
+        """Unique/duplicate counts match the old split; duplicates are spread evenly."""
+        publisher = EventPublisher("http://aggregator/publish")
+        events = list(publisher.iter_events(20000, 0.3, reservoir_size=500))
+
+        assert len(events) == 20000
+        assert publisher.unique_count == 14000
+        assert publisher.duplicate_count == 6000
+        assert len({event["event_id"] for event in events}) == 14000
+
+        # Each quarter of the stream carries roughly 30% duplicates
+        seen = set()
+        for quarter in range(4):
+            window = events[quarter * 5000:(quarter + 1) * 5000]
+            duplicates = 0
+            for event in window:
+                duplicates += event["event_id"] in seen
+                seen.add(event["event_id"])
+            assert 0.25 < duplicates / len(window) < 0.35
+
+    def test_geometric_distance_prefers_recent_events(self):
+        """Geometric duplicate distance stays close to the newest unique events."""
+        publisher = EventPublisher("http://aggregator/publish")
+        reservoir = deque(range(1000))
+        offsets = [999 - publisher.pick_duplicate(reservoir, "geometric", 10) for _ in range(2000)]
+        assert max(offsets) < 1000
+        assert 5 < sum(offsets) / len(offsets) < 15
+
+    def test_first_batch_without_materializing(self):
+        """The first batch of a 10^9-event run is produced immediately in bounded memory."""
+        publisher = EventPublisher("http://aggregator/publish")
+        tracemalloc.start()
+        batches = publisher.iter_batches(publisher.iter_events(10 ** 9, 0.3, reservoir_size=1000), 100)
+        first = list(itertools.islice(batches, 50))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert len(first) == 50
+        assert all(len(batch) == 100 for batch in first)
+        assert peak < 20 * 1024 * 1024
@@ -0,0 +1,110 @@
+"""
+Tests for the Redis Stream ingestion queue (INGEST_MODE=queue).
+
+These tests run against fakeredis so no Redis server is required.
+"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import main
+from fastapi.testclient import TestClient
+from app import queue
+from app.models import EventModel, ProcessedEvent
+from app.consumer import IdempotentConsumer
+from app.database import get_db_session
+
+
+def make_events(prefix: str, ids):
+    return [
+        EventModel(
+            topic="test.queue",
+            event_id=f"{prefix}-{i}",
+            timestamp="2025-12-24T00:00:00Z",
+            source="queue-test",
+            payload={"index": i}
+        )
+        for i in ids
+    ]
+
+
+@pytest.fixture
+def redis_client():
+    client = fakeredis.FakeRedis()
+    queue.ensure_group(client)
+    yield client
+    client.flushall()
+
+
+class TestQueue:
+    """Test suite for stream-based ingestion."""
+
+    def test_worker_coalesces_batches_into_one_commit(self, redis_client):
+        """Several queued batches are drained and committed together, then acked."""
+        queue.enqueue_batch(redis_client, make_events("q", range(10)))
+        queue.enqueue_batch(redis_client, make_events("q", range(5, 15)))  # 5 duplicates
+
+        worker = queue.StreamWorker(redis_client, IdempotentConsumer(), name="w1")
+        result = worker.drain_once(block_ms=10)
+
+        assert result["received"] == 20
+        assert result["processed"] == 15
+        assert result["duplicates"] == 5
+        assert redis_client.xpending(queue.QUEUE_STREAM, queue.QUEUE_GROUP)["pending"] == 0
+        assert worker.drain_once(block_ms=10) is None
+
+        with get_db_session() as db:
+            assert db.query(ProcessedEvent).filter_by(topic="test.queue").count() == 15
+
+    def test_crashed_worker_entries_are_reclaimed(self, redis_client):
+        """Entries read but never acked by a crashed worker are reclaimed via XAUTOCLAIM."""
+        queue.enqueue_batch(redis_client, make_events("crash", range(8)))
+
+        # Worker "dead" reads the entry and crashes before commit/XACK
+        redis_client.xreadgroup(queue.QUEUE_GROUP, "dead", {queue.QUEUE_STREAM: ">"}, count=10)
+        assert redis_client.xpending(queue.QUEUE_STREAM, queue.QUEUE_GROUP)["pending"] == 1
+
+        survivor = queue.StreamWorker(redis_client, IdempotentConsumer(), name="survivor")
+        assert survivor.drain_once(block_ms=10) is None
+        result = survivor.claim_stale(min_idle_ms=0)
+
+        assert result["processed"] == 8
+        assert redis_client.xpending(queue.QUEUE_STREAM, queue.QUEUE_GROUP)["pending"] == 0
+
+    def test_failed_commit_leaves_entries_pending(self, redis_client):
+        """Nothing is acked when the database transaction fails."""
+        queue.enqueue_batch(redis_client, make_events("fail", range(3)))
+
+        class FailingConsumer:
+            def process_batch(self, events):
+                raise RuntimeError("database unavailable")
+
+        worker = queue.StreamWorker(redis_client, FailingConsumer(), name="w-fail")
+        with pytest.raises(RuntimeError):
+            worker.drain_once(block_ms=10)
+        assert redis_client.xpending(queue.QUEUE_STREAM, queue.QUEUE_GROUP)["pending"] == 1
+
+    def test_publish_returns_202_in_queue_mode(self, redis_client, monkeypatch):
+        """/publish only validates and enqueues when INGEST_MODE=queue."""
+        monkeypatch.setattr(main, "INGEST_MODE", "queue")
+        monkeypatch.setattr(main, "get_redis", lambda: redis_client)
+
+        response = TestClient(main.app).post("/publish", json={"events": [
+            {
+                "topic": "test.queue.api",
+                "event_id": "api-1",
+                "timestamp": "2025-12-24T00:00:00Z",
+                "source": "queue-test",
+                "payload": {}
+            }
+        ]})
+
+        assert response.status_code == 202
+        assert response.json()["details"]["received"] == 1
+        assert redis_client.xlen(queue.QUEUE_STREAM) == 1
+        with get_db_session() as db:
+            assert db.query(ProcessedEvent).filter_by(topic="test.queue.api").count() == 0
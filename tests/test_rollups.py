@@ -0,0 +1,184 @@
+"""
+Tests for the per-minute rollups (topic_minute_counts) and GET /stats/timeseries.
+
+These tests verify that the rollup is maintained in the ingest transaction
+(duplicates never counted), matches a GROUP BY over processed_events, derives
+coarser buckets on read, and is backfilled for existing events.
+"""
+import sys
+import os
+from collections import Counter
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+import main
+from app.models import EventModel, ProcessedEvent, TopicMinuteCount
+from app.database import engine, get_db_session
+from app.consumer import IdempotentConsumer
+from app.migrations import run_migrations
+from app.rollups import MinuteCounts, minute_bucket, time_range
+
+client = TestClient(main.app)
+
+
+def make_event(event_id, timestamp, topic="test.rollup", source="svc-a"):
+    return EventModel(topic=topic, event_id=event_id, timestamp=timestamp, source=source, payload={})
+
+
+def rollup_rows():
+    with get_db_session() as db:
+        return {
+            (topic, source, minute_bucket(bucket)): count
+            for topic, source, bucket, count in db.execute(select(
+                TopicMinuteCount.topic, TopicMinuteCount.source, TopicMinuteCount.bucket, TopicMinuteCount.count
+            ))
+        }
+
+
+def grouped_events():
+    """Referensi: GROUP BY penuh atas processed_events."""
+    with get_db_session() as db:
+        return Counter(
+            (topic, source, minute_bucket(timestamp))
+            for topic, source, timestamp in db.execute(select(
+                ProcessedEvent.topic, ProcessedEvent.source, ProcessedEvent.timestamp
+            ))
+        )
+
+
+def at(minute, second=0):
+    return datetime(2025, 12, 24, 0, minute, second, tzinfo=timezone.utc)
+
+
+class TestMinuteRollup:
+    """topic_minute_counts maintained by process_batch."""
+
+    def test_counts_only_new_events(self):
+        consumer = IdempotentConsumer()
+        consumer.process_batch([
+            make_event("evt-1", "2025-12-24T00:00:10Z"),
+            make_event("evt-2", "2025-12-24T00:00:50Z"),
+            make_event("evt-2", "2025-12-24T00:00:50Z"),
+            # Offset dikonversi ke UTC sebelum dibulatkan ke menit
+            make_event("evt-3", "2025-12-24T07:03:59+07:00", source="svc-b"),
+        ])
+        consumer.process_batch([
+            make_event("evt-1", "2025-12-24T00:00:10Z"),
+            make_event("evt-4", "2025-12-24T00:00:30Z", topic="test.other"),
+        ])
+        assert rollup_rows() == {
+            ("test.rollup", "svc-a", at(0)): 2,
+            ("test.rollup", "svc-b", at(3)): 1,
+            ("test.other", "svc-a", at(0)): 1,
+        }
+
+    def test_matches_group_by_over_events(self):
+        consumer = IdempotentConsumer()
+        for batch in range(5):
+            consumer.process_batch([
+                make_event(f"evt-{i}", f"2025-12-24T00:{i % 7:02d}:{i % 60:02d}Z",
+                           topic=f"test.rollup.{i % 3}", source=f"svc-{i % 2}")
+                for i in range(batch * 40, batch * 40 + 60)
+            ])
+        assert rollup_rows() == dict(grouped_events())
+
+    def test_backfill_existing_events(self):
+        IdempotentConsumer().process_batch([
+            make_event(f"evt-{i}", f"2025-12-24T00:0{i % 4}:00Z") for i in range(10)
+        ])
+        expected = rollup_rows()
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM topic_minute_counts"))
+        run_migrations(engine)
+        assert rollup_rows() == expected
+        # Rollup yang sudah terisi tidak di-backfill ulang
+        run_migrations(engine)
+        assert rollup_rows() == expected
+
+    def test_accumulator_sorts_rows(self):
+        counts = MinuteCounts()
+        assert not counts
+        rows = [
+            {"topic": "b", "event_id": "1", "source": "s", "timestamp": at(1, 5)},
+            {"topic": "a", "event_id": "2", "source": "s", "timestamp": at(1, 30)},
+            {"topic": "a", "event_id": "3", "source": "s", "timestamp": at(1, 59)},
+        ]
+        counts.add(rows, {("b", "1"), ("a", "2"), ("a", "3")})
+        assert [(row["topic"], row["count"]) for row in counts.rows()] == [("a", 2), ("b", 1)]
+
+
+class TestTimeseriesEndpoint:
+    """GET /stats/timeseries."""
+
+    def setup_method(self):
+        IdempotentConsumer().process_batch([
+            make_event("evt-1", "2025-12-24T00:00:10Z"),
+            make_event("evt-2", "2025-12-24T00:04:59Z"),
+            make_event("evt-3", "2025-12-24T00:05:00Z"),
+            make_event("evt-4", "2025-12-24T00:05:00Z", source="svc-b"),
+            make_event("evt-5", "2025-12-24T01:30:00Z", topic="test.other"),
+        ])
+
+    def points(self, **params):
+        response = client.get("/stats/timeseries", params=params)
+        assert response.status_code == 200
+        return [
+            (datetime.fromisoformat(point["bucket_start"].replace("Z", "+00:00")),
+             point["topic"], point["source"], point["count"])
+            for point in response.json()["points"]
+        ]
+
+    def test_minute_buckets(self):
+        assert self.points(**{"from": "2025-12-24T00:00:00Z", "to": "2025-12-24T00:10:00Z"}) == [
+            (at(0), "test.rollup", "svc-a", 1),
+            (at(4), "test.rollup", "svc-a", 1),
+            (at(5), "test.rollup", "svc-a", 1),
+            (at(5), "test.rollup", "svc-b", 1),
+        ]
+
+    def test_coarser_buckets_derived_on_read(self):
+        assert self.points(**{"from": "2025-12-24T00:00:00Z", "to": "2025-12-24T00:10:00Z", "bucket": "5m"}) == [
+            (at(0), "test.rollup", "svc-a", 2),
+            (at(5), "test.rollup", "svc-a", 1),
+            (at(5), "test.rollup", "svc-b", 1),
+        ]
+        day = datetime(2025, 12, 24, tzinfo=timezone.utc)
+        assert self.points(**{"from": "2025-12-24T12:00:00Z", "to": "2025-12-24T13:00:00Z", "bucket": "1d"}) == [
+            (day, "test.other", "svc-a", 1),
+            (day, "test.rollup", "svc-a", 3),
+            (day, "test.rollup", "svc-b", 1),
+        ]
+
+    def test_topic_and_source_filters(self):
+        params = {"from": "2025-12-24T00:00:00Z", "to": "2025-12-24T02:00:00Z", "bucket": "1h"}
+        assert self.points(topic="test.other", **params) == [
+            (datetime(2025, 12, 24, 1, tzinfo=timezone.utc), "test.other", "svc-a", 1)
+        ]
+        assert self.points(topic="test.rollup", source="svc-b", **params) == [(at(0), "test.rollup", "svc-b", 1)]
+
+    def test_range_rounded_to_bucket_boundaries(self):
+        response = client.get("/stats/timeseries", params={
+            "from": "2025-12-24T00:07:00Z", "to": "2025-12-24T00:31:00+00:00", "bucket": "15m"
+        }).json()
+        assert datetime.fromisoformat(response["start"].replace("Z", "+00:00")) == at(0)
+        assert datetime.fromisoformat(response["end"].replace("Z", "+00:00")) == at(45)
+        assert sum(point["count"] for point in response["points"]) == 4
+
+    @pytest.mark.parametrize("params,status_code", [
+        ({"from": "2025-12-24T01:00:00Z", "to": "2025-12-24T00:00:00Z"}, 400),
+        ({"from": "2000-01-01T00:00:00Z", "to": "2025-12-24T00:00:00Z"}, 400),
+        ({"bucket": "2m"}, 422),
+    ])
+    def test_invalid_parameters(self, params, status_code):
+        assert client.get("/stats/timeseries", params=params).status_code == status_code
+
+    def test_default_range_ends_now(self):
+        start, end = time_range(60, None, None)
+        assert (end - start).total_seconds() == 60 * 60
+        assert end >= datetime.now(timezone.utc)
+        assert client.get("/stats/timeseries").json()["points"] == []
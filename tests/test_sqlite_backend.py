@@ -0,0 +1,102 @@
+"""
+Tests for the SQLite storage backend (DATABASE_URL=sqlite:///...).
+
+The backend is chosen from DATABASE_URL at import time, so the SQLite tests
+(and the existing dedup, concurrency and API suites) run in a child pytest
+process against a fresh database file.
+"""
+import os
+import sys
+import subprocess
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+import main
+from app.models import EventModel
+from app.database import IS_SQLITE, engine, get_db_session
+from app.consumer import IdempotentConsumer
+from app.backends import SQLiteBackend
+
+TESTS_DIR = os.path.dirname(__file__)
+sqlite_only = pytest.mark.skipif(not IS_SQLITE, reason="requires DATABASE_URL=sqlite:///...")
+
+client = TestClient(main.app)
+
+
+def make_event(event_id, topic="test.sqlite", **fields):
+    return EventModel(**{
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": "2025-12-24T00:00:00Z",
+        "source": "sqlite-test",
+        "payload": {},
+        **fields
+    })
+
+
+@pytest.mark.skipif(IS_SQLITE, reason="already running on SQLite")
+def test_suites_on_sqlite(run_on_sqlite):
+    """Run this module plus the dedup, concurrency, API, export, rollup and topic stats suites on SQLite."""
+    output = run_on_sqlite(
+        __file__,
+        os.path.join(TESTS_DIR, "test_deduplication.py"),
+        os.path.join(TESTS_DIR, "test_concurrency.py"),
+        os.path.join(TESTS_DIR, "test_api.py"),
+        os.path.join(TESTS_DIR, "test_export.py"),
+        os.path.join(TESTS_DIR, "test_rollups.py"),
+        os.path.join(TESTS_DIR, "test_topic_stats.py"),
+        os.path.join(TESTS_DIR, "test_idempotency.py")
+    )
+    assert " passed" in output
+
+
+@pytest.mark.parametrize("env", [
+    {"DB_MODE": "async"},
+    {"DEDUP_KEY_STORE": "hashed"},
+    {"PARTITIONING": "daily"},
+])
+def test_postgres_only_settings_rejected(tmp_path, env):
+    child_env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'aggregator.db'}", **env)
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.database"],
+        cwd=os.path.join(TESTS_DIR, '..', 'aggregator', 'src'), env=child_env, capture_output=True, text=True
+    )
+    assert result.returncode != 0
+    assert "PostgreSQL" in result.stderr
+
+
+@sqlite_only
+class TestSQLiteBackend:
+    """INSERT OR IGNORE dedup, WAL and JSON filtering on SQLite."""
+
+    def test_wal_mode(self):
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+
+    @pytest.mark.parametrize("returning", [True, False])
+    def test_returning_and_fallback_agree(self, returning):
+        """Pre-3.35 fallback (SELECT + INSERT OR IGNORE) gives the same result as RETURNING."""
+        consumer = IdempotentConsumer(backend=SQLiteBackend(returning=returning))
+        first = consumer.process_batch([make_event("evt-1"), make_event("evt-2"), make_event("evt-1")])
+        second = consumer.process_batch([make_event("evt-2"), make_event("evt-3")])
+        assert (first["processed"], first["duplicates"]) == (2, 1)
+        assert (second["processed"], second["duplicates"]) == (1, 1)
+        with get_db_session() as db:
+            assert db.execute(text("SELECT count(*) FROM processed_events")).scalar() == 3
+
+    def test_payload_filter_and_utc_timestamps(self):
+        IdempotentConsumer().process_batch([
+            make_event("evt-a", payload={"user": {"id": 42}, "active": True},
+                       timestamp="2025-12-24T07:00:00+07:00"),
+            make_event("evt-b", payload={"user": {"id": "42"}, "active": 1}),
+        ])
+        events = client.get("/events", params={"where": "user.id:42"}).json()
+        assert [event["event_id"] for event in events] == ["evt-a"]
+        assert datetime.fromisoformat(events[0]["timestamp"]) == datetime(2025, 12, 24, tzinfo=timezone.utc)
+        assert [e["event_id"] for e in client.get("/events", params={"where": "active:true"}).json()] == ["evt-a"]
+        assert client.get("/events", params={"where": "tags:[1]"}).status_code == 400
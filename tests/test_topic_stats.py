@@ -0,0 +1,123 @@
+"""
+Tests for the per-topic counters (topic_stats) and GET /stats/topics.
+
+These tests verify that counters are updated once per topic per transaction,
+count duplicates dropped by the pre-filter, agree with the global stats, and
+that the endpoint ranks topics by the requested counter.
+"""
+import sys
+import os
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
+
+import main
+from app.models import EventModel
+from app.database import engine, get_db_session, read_stats_totals
+from app.consumer import IdempotentConsumer
+from app.dedup_filter import DedupPreFilter
+from app.migrations import run_migrations
+
+client = TestClient(main.app)
+
+
+def make_event(topic, event_id):
+    return EventModel(topic=topic, event_id=event_id, timestamp="2025-12-24T00:00:00Z",
+                      source="topic-stats-test", payload={})
+
+
+def topic_stats(**params):
+    response = client.get("/stats/topics", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def counters(**params):
+    return {
+        row["topic"]: (row["received"], row["unique_processed"], row["duplicate_dropped"])
+        for row in topic_stats(**params)
+    }
+
+
+class TestTopicCounters:
+    """topic_stats maintained by process_batch."""
+
+    def test_counts_per_topic(self):
+        consumer = IdempotentConsumer()
+        consumer.process_batch([
+            make_event("test.a", "evt-1"), make_event("test.a", "evt-1"), make_event("test.b", "evt-1")
+        ])
+        consumer.process_batch([
+            make_event("test.a", "evt-1"), make_event("test.a", "evt-2"), make_event("test.b", "evt-2")
+        ])
+        assert counters() == {"test.a": (4, 2, 2), "test.b": (2, 2, 0)}
+
+        # Jumlah semua topic sama dengan counter global
+        with get_db_session() as db:
+            totals = read_stats_totals(db)
+        assert sum(received for received, _, _ in counters().values()) == totals["received"]
+        assert sum(duplicate for _, _, duplicate in counters().values()) == totals["duplicate_dropped"]
+
+    def test_prefiltered_duplicates_are_counted(self):
+        consumer = IdempotentConsumer(prefilter=DedupPreFilter(lru_size=1000, bloom_capacity=1000))
+        consumer.process_batch([make_event("test.a", f"evt-{i}") for i in range(5)])
+        # Semua duplikat dijawab pre-filter, tanpa insert
+        consumer.process_batch([make_event("test.a", f"evt-{i}") for i in range(5)])
+        assert counters() == {"test.a": (10, 5, 5)}
+
+    def test_one_row_per_topic_per_transaction(self, monkeypatch):
+        consumer = IdempotentConsumer()
+        statements = []
+        original = consumer.backend.topic_stats_statement
+        monkeypatch.setattr(consumer.backend, "topic_stats_statement",
+                            lambda rows: statements.append(rows) or original(rows))
+        # Tiga batch coalesced dalam satu transaksi
+        consumer.process_batches([
+            [make_event("test.b", "evt-1"), make_event("test.a", "evt-1")],
+            [make_event("test.a", "evt-2")],
+            [make_event("test.a", "evt-2"), make_event("test.b", "evt-2")],
+        ])
+        assert len(statements) == 1
+        assert [(row["topic"], row["received"], row["unique_processed"]) for row in statements[0]] == [
+            ("test.a", 3, 2), ("test.b", 2, 2)
+        ]
+        assert len({row["shard"] for row in statements[0]}) == 1
+
+    def test_backfill_existing_events(self):
+        IdempotentConsumer().process_batch([make_event("test.a", f"evt-{i}") for i in range(3)])
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM topic_stats"))
+        run_migrations(engine)
+        # Riwayat duplikat tidak bisa direkonstruksi dari processed_events
+        assert counters() == {"test.a": (3, 3, 0)}
+
+
+class TestTopicStatsEndpoint:
+    """GET /stats/topics sorting and limits."""
+
+    def setup_method(self):
+        consumer = IdempotentConsumer()
+        consumer.process_batch([make_event("test.busy", f"evt-{i}") for i in range(10)])
+        consumer.process_batch([make_event("test.retry", "evt-1")] * 6)
+        consumer.process_batch([make_event("test.last", "evt-1"), make_event("test.last", "evt-2")])
+
+    def test_sorted_by_received(self):
+        assert [row["topic"] for row in topic_stats()] == ["test.busy", "test.retry", "test.last"]
+
+    def test_sorted_by_duplicate_ratio(self):
+        rows = topic_stats(sort="duplicate_ratio", limit=1)
+        assert [(row["topic"], row["duplicate_ratio"]) for row in rows] == [("test.retry", round(5 / 6, 4))]
+
+    def test_sorted_by_last_event_at(self):
+        rows = topic_stats(sort="last_event_at")
+        assert rows[0]["topic"] == "test.last"
+        moments = [datetime.fromisoformat(row["last_event_at"].replace("Z", "+00:00")) for row in rows]
+        assert moments == sorted(moments, reverse=True)
+
+    @pytest.mark.parametrize("params", [{"sort": "topic"}, {"limit": 0}, {"limit": 1001}])
+    def test_invalid_parameters(self, params):
+        assert client.get("/stats/topics", params=params).status_code == 422
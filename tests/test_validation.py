@@ -11,7 +11,12 @@ import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator', 'src'))
 
-from app.models import EventModel, BatchEventModel
+import json
+from fastapi.testclient import TestClient
+
+import main
+from app.models import EventModel, BatchEventModel, parse_timestamp
+from app.validation import FastValidationError, validate_batch_json, validate_event_json
 
 
 class TestValidation:
@@ -116,3 +121,69 @@ class TestValidation:
                 payload={}
             )
             assert event.timestamp == ts
+
+
+class TestFastValidation:
+    """Fast-path validator (FAST_VALIDATION=true) must match EventModel behavior."""
+
+    def _body(self, **overrides):
+        event = {
+            "topic": "test.fast",
+            "event_id": "evt-001",
+            "timestamp": "2025-12-24T00:00:00Z",
+            "source": "test-source",
+            "payload": {"key": "value"}
+        }
+        event.update(overrides)
+        return json.dumps({"events": [event]}).encode()
+
+    def test_valid_batch(self):
+        """Valid batch yields records with the timestamp already parsed."""
+        records = validate_batch_json(self._body())
+        assert len(records) == 1
+        assert records[0].event_id == "evt-001"
+        assert records[0].event_time == parse_timestamp("2025-12-24T00:00:00Z")
+        assert records[0].model_dump()["timestamp"] == "2025-12-24T00:00:00Z"
+
+    def test_missing_required_field(self):
+        """Missing event_id is reported at the same location as BatchEventModel."""
+        body = json.loads(self._body())
+        del body["events"][0]["event_id"]
+        with pytest.raises(ValidationError) as exc_info:
+            validate_batch_json(json.dumps(body).encode())
+        assert exc_info.value.errors()[0]["loc"] == ("events", 0, "event_id")
+
+    def test_invalid_timestamp_message(self):
+        """Invalid timestamp keeps the EventModel error message."""
+        with pytest.raises(FastValidationError) as exc_info:
+            validate_batch_json(self._body(timestamp="not-a-valid-timestamp"))
+        error = exc_info.value.errors()[0]
+        assert error["loc"] == ("events", 0, "timestamp")
+        assert "timestamp must be valid ISO8601 format" in error["msg"]
+
+    def test_empty_fields_and_batch_rejected(self):
+        """Empty topic and empty batch are rejected like the Pydantic models."""
+        with pytest.raises(ValidationError):
+            validate_batch_json(self._body(topic=""))
+        with pytest.raises(ValidationError):
+            validate_batch_json(b'{"events": []}')
+        with pytest.raises(ValidationError):
+            validate_event_json(b'{"topic": "t"}')
+
+    def test_api_returns_422_in_fast_mode(self, monkeypatch):
+        """POST /publish returns the same 422 shape with FAST_VALIDATION enabled."""
+        client = TestClient(main.app)
+        for fast in (False, True):
+            monkeypatch.setattr(main, "FAST_VALIDATION", fast)
+            response = client.post("/publish", content=self._body(timestamp="bad"),
+                                   headers={"Content-Type": "application/json"})
+            assert response.status_code == 422
+            detail = response.json()["detail"][0]
+            assert detail["loc"] == ["body", "events", 0, "timestamp"]
+            assert "timestamp must be valid ISO8601 format" in detail["msg"]
+
+        monkeypatch.setattr(main, "FAST_VALIDATION", True)
+        response = client.post("/publish", content=self._body(),
+                               headers={"Content-Type": "application/json"})
+        assert response.status_code == 201
+        assert response.json()["details"]["processed"] == 1